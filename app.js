@@ -5,6 +5,13 @@ class BridgeSystem {
         this.currentSection = '1m-opening';
         this.levelBActive = false;
         this.navigationStack = []; // Track navigation history for breadcrumbs
+        this.manifest = null; // Table of contents when the server serves each item separately
+        this.editType = null; // 'section' or 'definition' while the add modal is open
+        this.pendingPatch = []; // JSON Patch operations not yet saved to the server
+        this.revision = null; // Server revision the loaded data reflects; edits are based on it
+        this.fragments = new WeakMap(); // Item -> server pre-rendered HTML; dropped when the item is replaced
+        this.events = null; // Server-Sent Events stream of changes made elsewhere
+        this.openDefinition = null; // Id of the definition in the floating panel
         this.data = {
             sections: {},
             definitions: {},
@@ -216,7 +223,7 @@ class BridgeSystem {
         }, {
             level: 'level-a',
             sectionId: sectionId,
-            title: this.data.sections[sectionId]?.title || sectionId
+            title: this.data.sections[sectionId]?.title || this.manifest?.sections?.[sectionId]?.title || sectionId
         }];
 
         // Update breadcrumb and back button for Level A
@@ -231,6 +238,16 @@ class BridgeSystem {
         const sectionData = this.data.sections[sectionId];
         if (sectionData) {
             this.displaySection(sectionData);
+        } else if (this.manifest?.sections?.[sectionId]) {
+            // Sharded mode: fetch the section the first time it is opened
+            this.displayLoadingMessage();
+            this.fetchItem('sections', sectionId)
+                .then(section => {
+                    if (this.currentSection === sectionId) {
+                        this.displaySection(section);
+                    }
+                })
+                .catch(error => this.showNotification(`Could not load section: ${error.message}`, 'error'));
         } else {
             this.displayLoadingMessage();
         }
@@ -331,6 +348,10 @@ class BridgeSystem {
     }
 
     generateSectionHTML(sectionData) {
+        if (this.fragments.has(sectionData)) {
+            return this.fragments.get(sectionData);
+        }
+
         const content = sectionData.content;
         if (!content) return '<div class="loading-message">No content available</div>';
 
@@ -380,7 +401,7 @@ class BridgeSystem {
                 const cellClass = row.cellType === 'opener' ? 'opener-cell' : 'responder-cell';
 
                 html.push('<tr>');
-                html.push(`<td class="bid-cell ${cellClass}">${this.convertBridgeNotation(row.bid)}</td>`);
+                html.push(`<td class="bid-cell ${cellClass}">${this.convertBridgeNotation(row.bid)}${this.frequencyBadge(row.frequency)}</td>`);
 
                 let description = row.description;
 
@@ -429,7 +450,7 @@ class BridgeSystem {
 
         // Render current row
         html.push('<tr>');
-        html.push(`<td class="bid-cell ${cellClass} ${indentClass}">${this.convertBridgeNotation(row.bid)}</td>`);
+        html.push(`<td class="bid-cell ${cellClass} ${indentClass}">${this.convertBridgeNotation(row.bid)}${this.frequencyBadge(row.frequency)}</td>`);
 
         let description = row.description;
 
@@ -533,7 +554,7 @@ class BridgeSystem {
                 // Convert bridge notation and apply cell styling
                 const convertedContent = this.convertBridgeNotation(cellContent);
                 const colspanAttr = colspan > 1 ? ` colspan="${colspan}"` : '';
-                html.push(`<td class="auction-cell ${cellClass}"${colspanAttr}>${convertedContent}</td>`);
+                html.push(`<td class="auction-cell ${cellClass}"${colspanAttr}>${convertedContent}${this.frequencyBadge(bid.frequency)}</td>`);
             }
 
             html.push('</tr>');
@@ -543,6 +564,16 @@ class BridgeSystem {
         return html.join('\n');
     }
 
+    frequencyBadge(frequency) {
+        // deal_simulator.py's share for a bid; one figure when it doesn't depend on vulnerability
+        const values = Object.entries(frequency || {});
+        if (values.length === 0) return '';
+        const text = values.length === 2 && values[0][1] !== values[1][1]
+            ? values.map(([vulnerability, share]) => `${vulnerability} ${share}%`).join(' / ')
+            : `${values[0][1]}%`;
+        return ` <span class="bid-frequency" title="Share of simulated deals reaching this point that make this bid">${text}</span>`;
+    }
+
     escapeRegExp(string) {
         return string.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
     }
@@ -604,7 +635,7 @@ class BridgeSystem {
     addTOCTooltips() {
         document.querySelectorAll('.toc-item').forEach(item => {
             const sectionId = item.dataset.section;
-            const sectionData = this.data.sections[sectionId];
+            const sectionData = this.data.sections[sectionId] || this.manifest?.sections?.[sectionId];
 
             if (sectionData && sectionData.subtitle) {
                 const fullDescription = `${sectionData.title}\n\n${sectionData.subtitle}`;
@@ -685,12 +716,19 @@ class BridgeSystem {
         if (contentType === 'sequence') {
             const sequence = this.data.sequences[contentId];
             if (!sequence) {
+                if (this.manifest?.sequences?.[contentId]) {
+                    this.fetchItem('sequences', contentId)
+                        .then(() => this.loadInLevelB(contentId, contentType))
+                        .catch(error => this.showNotification(`Could not load sequence: ${error.message}`, 'error'));
+                    return;
+                }
                 this.showMissingContentInLevelB('sequence', contentId);
                 return;
             }
 
             const html = this.generateSequenceHTML(sequence);
             this.showLevelB(sequence.title, html);
+            this.navigationStack[this.navigationStack.length - 1].sequenceId = contentId;
         }
     }
 
@@ -802,6 +840,10 @@ class BridgeSystem {
     }
 
     generateSequenceHTML(sequence) {
+        if (this.fragments.has(sequence)) {
+            return this.fragments.get(sequence);
+        }
+
         let html = [];
 
         if (sequence.auction) {
@@ -840,7 +882,7 @@ class BridgeSystem {
 
                         const bidClass = bid.type === 'opener-bid' ? 'opener-bid' : 'responder-bid';
                         html.push(`<div class="bid-header">`);
-                        html.push(`<span class="bid ${bidClass}">${this.convertBridgeNotation(bid.bid)}</span>`);
+                        html.push(`<span class="bid ${bidClass}">${this.convertBridgeNotation(bid.bid)}</span>${this.frequencyBadge(bid.frequency)}`);
 
                         if (bid.hcp) {
                             html.push(`<span class="hcp-range">${bid.hcp}</span>`);
@@ -867,15 +909,23 @@ class BridgeSystem {
     showFloatingDefinition(definitionId) {
         const definition = this.data.definitions[definitionId];
         if (!definition) {
+            if (this.manifest?.definitions?.[definitionId]) {
+                this.fetchItem('definitions', definitionId)
+                    .then(() => this.showFloatingDefinition(definitionId))
+                    .catch(error => this.showNotification(`Could not load definition: ${error.message}`, 'error'));
+                return;
+            }
             this.showMissingFloatingDefinition('definition', definitionId);
             return;
         }
 
         const html = this.generateDefinitionHTML(definition);
         this.displayFloatingDefinition(html);
+        this.openDefinition = definitionId;
     }
 
     showFloatingDefinitionByText(text) {
+        this.openDefinition = null;
         const definition = this.findDefinition(text);
         this.displayFloatingDefinition(definition);
     }
@@ -905,9 +955,14 @@ class BridgeSystem {
         definitionsPanel.style.display = 'none';
         overlay.style.display = 'none';
         closeBtn.style.display = 'none';
+        this.openDefinition = null;
     }
 
     generateDefinitionHTML(definition) {
+        if (this.fragments.has(definition)) {
+            return this.fragments.get(definition);
+        }
+
         let html = [`<h4>${definition.title}</h4>`];
 
         if (definition.category) {
@@ -1091,10 +1146,79 @@ class BridgeSystem {
             return;
         }
 
-        // Simple search implementation
-        // In a full implementation, this would search through all content
-        const results = this.searchContent(query);
-        this.displaySearchResults(results);
+        // Server-side index answers in O(matches); responses to stale keystrokes are dropped
+        const searchId = this.searchId = (this.searchId || 0) + 1;
+        if (this.looksLikeHand(query)) {
+            this.classifyHand(query)
+                .then(result => {
+                    if (searchId === this.searchId) {
+                        this.showHandClassification(result);
+                    }
+                })
+                .catch(() => {}); // Not 13 cards yet while the hand is being typed
+            return;
+        }
+        this.searchServer(query)
+            .catch(() => this.searchContent(query)) // No server (e.g. opened from file://)
+            .then(results => {
+                if (searchId === this.searchId) {
+                    this.displaySearchResults(results);
+                }
+            });
+    }
+
+    async searchServer(query) {
+        const response = await fetch(`api/search?q=${encodeURIComponent(query)}`);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        const data = await response.json();
+
+        return data.hits.map(hit => ({
+            type: hit.type,
+            id: hit.id,
+            title: this.data[`${hit.type}s`]?.[hit.id]?.title || this.manifest?.[`${hit.type}s`]?.[hit.id]?.title || hit.id,
+            snippet: hit.text,
+            bid: hit.bid,
+            highlights: hit.highlights
+        }));
+    }
+
+    looksLikeHand(query) {
+        // "♠A432 ♥2 ♦KJ987 ♣432" or "A432.2.KJ987.432"
+        const compact = query.replace(/\s+/g, '');
+        return /^([♠♥♦♣][2-9TJQKAX10-]*){2,4}$/i.test(compact) ||
+               /^[2-9TJQKAX10-]*(\.[2-9TJQKAX10-]*){3}$/i.test(compact);
+    }
+
+    async classifyHand(hand) {
+        const response = await fetch(`api/classify?hand=${encodeURIComponent(hand)}`);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        const data = await response.json();
+        return data.results[0];
+    }
+
+    showHandClassification(result) {
+        // The bids the hand makes, in the usual opener/responder colours
+        const hand = result.hand;
+        const shape = ['s', 'h', 'd', 'c'].map(suit => hand.lengths[suit]).join('-');
+        const html = [`<p>${hand.hcp} HCP, ${shape}${hand.balanced ? ', balanced' : ''}</p>`];
+        const groups = [['opening', 'Opening'], ['responses', 'Responses'], ['rebids', 'Rebids']];
+        for (const [key, label] of groups) {
+            if (result[key].length === 0) continue;
+            html.push(`<h4>${label}</h4>`);
+            html.push(this.generateBridgeTable(result[key].map(match => ({
+                bid: match.vulnerability ? `${match.bid} (${match.vulnerability})` : match.bid,
+                description: match.description,
+                cellType: match.player
+            }))));
+        }
+        if (html.length === 1) {
+            html.push('<p>No bid in the system matches this hand.</p>');
+        }
+        this.showLevelB(`Hand: ${hand.text}`, html.join('\n'));
     }
 
     searchContent(query) {
@@ -1164,6 +1288,7 @@ class BridgeSystem {
         const modal = document.getElementById('edit-modal');
         const title = document.getElementById('modal-title');
 
+        this.editType = type;
         title.textContent = type === 'section' ? 'Add New Section' : 'Add New Definition';
         modal.style.display = 'flex';
 
@@ -1177,19 +1302,37 @@ class BridgeSystem {
     }
 
     saveModalContent() {
-        const title = document.getElementById('content-title').value;
-        const content = document.getElementById('content-editor').innerHTML;
+        const title = document.getElementById('content-title').value.trim();
+        const content = document.getElementById('content-editor').innerText.trim();
 
-        if (!title.trim()) {
+        if (!title) {
             alert('Please enter a title');
             return;
         }
 
-        // Save the content (this would normally save to database)
-        console.log('Saving content:', { title, content });
+        const collection = this.editType === 'section' ? 'sections' : 'definitions';
+        const id = this.slugify(title);
+        if (this.data[collection][id] || this.manifest?.[collection]?.[id]) {
+            alert(`"${title}" already exists`);
+            return;
+        }
+
+        const item = collection === 'sections'
+            ? { id, title, order: Object.keys(this.manifest?.sections || this.data.sections).length + 1, content: { overview: content } }
+            : { id, title, category: 'custom', definition: content };
+        this.data[collection][id] = item;
+        this.pendingPatch.push({ op: 'add', path: `/${collection}/${this.escapePointer(id)}`, value: item });
 
         this.closeModal();
-        alert('Content saved successfully!');
+        this.saveChanges();
+    }
+
+    slugify(text) {
+        return text.toLowerCase().replace(/[^a-z0-9]+/g, '-').replace(/^-+|-+$/g, '') || 'untitled';
+    }
+
+    escapePointer(token) {
+        return token.replace(/~/g, '~0').replace(/\//g, '~1');
     }
 
     insertNotation(notation) {
@@ -1226,6 +1369,7 @@ class BridgeSystem {
                     try {
                         const data = JSON.parse(e.target.result);
                         this.data = { ...this.data, ...data };
+                        this.manifest = null; // Imported document is complete; nothing left to fetch
                         this.loadSection(this.currentSection);
                         alert('Data imported successfully!');
                     } catch (error) {
@@ -1239,8 +1383,10 @@ class BridgeSystem {
         input.click();
     }
 
-    exportData() {
-        const dataStr = JSON.stringify(this.data, null, 2);
+    async exportData() {
+        // In sharded mode only the items opened so far are in memory
+        const data = this.manifest ? await (await fetch('data.json')).json() : this.data;
+        const dataStr = JSON.stringify(data, null, 2);
         const dataBlob = new Blob([dataStr], { type: 'application/json' });
 
         const link = document.createElement('a');
@@ -1337,10 +1483,36 @@ class BridgeSystem {
         this.scrollToPanelIfMobile(panelId);
     }
 
-    saveChanges() {
-        // This would normally save to a database
-        console.log('Saving changes to database...');
-        alert('Changes saved successfully!');
+    async saveChanges() {
+        if (this.pendingPatch.length === 0) {
+            this.showNotification('No unsaved changes', 'info');
+            return;
+        }
+
+        // Everything queued goes in one patch, applied on the server all or nothing
+        const patch = this.pendingPatch;
+        this.pendingPatch = [];
+        try {
+            const base = this.revision !== null ? `?base=${this.revision}` : '';
+            const response = await fetch(`api/data${base}`, {
+                method: 'PATCH',
+                headers: { 'Content-Type': 'application/json-patch+json' },
+                body: JSON.stringify(patch)
+            });
+            const result = await response.json().catch(() => ({}));
+            if (response.status === 409) {
+                throw new Error(`the system was changed by someone else (now revision ${result.revision}); reload to see their changes`);
+            }
+            if (!response.ok) {
+                throw new Error(result.error || `HTTP ${response.status}`);
+            }
+            this.revision = result.revision;
+            this.showNotification(`Changes saved (revision ${result.revision})`, 'success');
+        } catch (error) {
+            // Keep the operations so the next save retries them
+            this.pendingPatch = patch.concat(this.pendingPatch);
+            this.showNotification(`Could not save changes: ${error.message}`, 'error');
+        }
     }
 
     displayLoadingMessage() {
@@ -1416,11 +1588,13 @@ class BridgeSystem {
 
     async loadSampleData() {
         try {
-            const response = await fetch('data.json');
-            if (response.ok) {
-                this.data = await response.json();
-            } else {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            if (!(await this.loadManifest())) {
+                const response = await fetch('data.json');
+                if (response.ok) {
+                    this.data = await response.json();
+                } else {
+                    throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                }
             }
         } catch (error) {
             console.warn('Primary data loading failed:', error.message);
@@ -1437,6 +1611,158 @@ class BridgeSystem {
 
         // Add tooltips to TOC items after data is loaded
         this.addTOCTooltips();
+
+        this.listenForUpdates();
+    }
+
+    listenForUpdates() {
+        // Changes saved by anyone else arrive as they happen, with only the items they touched
+        if (this.revision === null || this.events || !window.EventSource) {
+            return;
+        }
+        this.events = new EventSource('api/events');
+        this.events.addEventListener('revision', (e) => this.applyUpdate(JSON.parse(e.data)));
+    }
+
+    applyUpdate(update) {
+        if (update.revision === this.revision) {
+            return; // Already showing it, e.g. our own save
+        }
+        if (this.pendingPatch.length > 0) {
+            // Unsaved edits stay based on the old revision; saving them reports the conflict
+            this.showNotification(`The system was changed by someone else (now revision ${update.revision})`, 'warning');
+            return;
+        }
+        if (!update.changes || update.base !== this.revision) {
+            // Revisions missed in between (e.g. while disconnected): start again from the manifest
+            this.reloadData();
+            return;
+        }
+
+        const changed = { sections: new Set(), sequences: new Set(), definitions: new Set() };
+        for (const change of update.changes) {
+            const [key, id] = change.path.slice(1).split('/').map(token => token.replace(/~1/g, '/').replace(/~0/g, '~'));
+            if (id === undefined) {
+                // metadata, cross references, colours ...
+                if (change.op === 'remove') {
+                    delete this.data[key];
+                } else {
+                    this.data[key] = change.value;
+                }
+                continue;
+            }
+            changed[key]?.add(id);
+            if (this.manifest?.[key]) {
+                if (change.op === 'remove') {
+                    delete this.manifest[key][id];
+                } else {
+                    this.manifest[key][id] = change.entry;
+                }
+            }
+            if (change.op === 'remove') {
+                delete this.data[key][id];
+            } else if (!this.manifest || this.data[key][id]) {
+                // Items not fetched yet are fetched in their new version when first opened
+                this.data[key][id] = change.value;
+            }
+        }
+        this.revision = update.revision;
+        this.refreshPanels(changed);
+    }
+
+    async reloadData() {
+        if (await this.loadManifest()) {
+            this.refreshPanels(null);
+        }
+    }
+
+    async currentItem(collection, id) {
+        if (!this.data[collection][id] && this.manifest?.[collection]?.[id]) {
+            await this.fetchItem(collection, id);
+        }
+        return this.data[collection][id];
+    }
+
+    async refreshPanels(changed) {
+        // Re-render only the panels showing a changed item (all of them when changed is null)
+        const affected = (collection, id) => id && (!changed || changed[collection].has(id));
+        try {
+            if (affected('sections', this.currentSection)) {
+                const section = await this.currentItem('sections', this.currentSection);
+                if (section) {
+                    this.displaySection(section);
+                } else {
+                    this.goBackFromLevelA();
+                }
+            }
+
+            const levelB = this.levelBActive ? this.navigationStack[this.navigationStack.length - 1] : null;
+            if (levelB?.sequenceId && affected('sequences', levelB.sequenceId)) {
+                const sequence = await this.currentItem('sequences', levelB.sequenceId);
+                if (sequence) {
+                    const levelBContent = document.getElementById('level-b-content');
+                    levelBContent.innerHTML = this.generateSequenceHTML(sequence);
+                    this.bindColoredTextEvents(levelBContent);
+                    this.addTooltips(levelBContent);
+                } else {
+                    this.closeLevelB();
+                }
+            }
+
+            if (this.openDefinition && affected('definitions', this.openDefinition)) {
+                const definition = await this.currentItem('definitions', this.openDefinition);
+                if (definition) {
+                    this.displayFloatingDefinition(this.generateDefinitionHTML(definition));
+                } else {
+                    this.closeDefinitions();
+                }
+            }
+        } catch (error) {
+            this.showNotification(`Could not load the latest changes: ${error.message}`, 'error');
+        }
+
+        if (!changed || changed.sections.size > 0) {
+            this.addTOCTooltips();
+        }
+    }
+
+    async loadManifest() {
+        // Sharded mode: only the table of contents now, each item when it is first opened
+        try {
+            // Revision first: if the document changes in between, edits are rejected rather than lost
+            const revision = await fetch('api/revision');
+            const response = await fetch('api/manifest');
+            if (!revision.ok || !response.ok) {
+                return false;
+            }
+            this.revision = (await revision.json()).revision;
+            this.manifest = await response.json();
+        } catch (error) {
+            return false; // No server API (e.g. opened from file://) - use data.json
+        }
+
+        const { sections, sequences, definitions, ...rest } = this.manifest;
+        this.data = { ...rest, sections: {}, sequences: {}, definitions: {} };
+        return true;
+    }
+
+    async fetchItem(collection, id) {
+        const entry = this.manifest[collection][id];
+        // The pre-rendered fragment is optional: without it the item is rendered here
+        const fragment = entry.fragment
+            ? fetch(entry.fragment).then(response => response.ok ? response.text() : null).catch(() => null)
+            : Promise.resolve(null);
+        const response = await fetch(entry.url);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        const item = await response.json();
+        const html = await fragment;
+        if (html !== null) {
+            this.fragments.set(item, html);
+        }
+        this.data[collection][id] = item;
+        return item;
     }
 
     async getFallbackData() {
@@ -1467,7 +1793,7 @@ class BridgeSystem {
                                     {
                                         bid: '1c-1M',
                                         description: '5+, 4+M, up the line',
-                                        reference: 'opener-rebids-1cM',
+                                        reference: 'opener-rebids-1c1M',
                                         type: 'red-link'
                                     },
                                     {
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Auction prefix trie over a bridge system document
+
+Every bid that data.json describes - section table rows, sequence pages, the
+column-shifted rows of auction tables and the older categories/bids layout - is
+filed under its auction, one call (its bid_codec code) per trie level. Looking up an
+auction prefix returns what the system says about it and every continuation
+below it, in time proportional to the size of the answer.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from bid_codec import CODES, COVERS, NORMALIZE_CACHE_SIZE, TOKENS, normalize, normalize_strain, unpack
+from search_index import escape_pointer
+
+# "(non vul)", "(vul)", "when non vul", "non-vul" ...
+VUL_RE = re.compile(r'\(?\b(?:when\s+)?(non[\s-]?vul(?:nerable)?|nv|vul(?:nerable)?)\b\)?', re.IGNORECASE)
+
+STRAIN_ORDER = {'c': 0, 'd': 1, 'h': 2, 's': 3, 'n': 4, 'm': 5, 'om': 6, 'M': 7, 'OM': 8}
+
+# Trie edges: a call's code, or the text of a bid that isn't a call ("rest")
+Edge = Union[int, str]
+
+
+def normalize_vulnerability(text: Optional[str]) -> Optional[str]:
+    """'non vul' / 'non-vul' / 'nv' -> 'nv'; 'vul' -> 'vul'; anything else -> None"""
+    if not text:
+        return None
+    match = VUL_RE.search(text)
+    if not match:
+        return None
+    return 'nv' if match.group(1).lower().startswith('n') else 'vul'
+
+
+def split_calls(text: str) -> Optional[List[str]]:
+    """Split a run of calls ("1c1d1n", "1c-1d-1n", "1♣ 1♦") into normalized calls, or None if it isn't one"""
+    key = normalize(text)
+    return list(unpack(key)) if key is not None else None
+
+
+def parse_bid(text: str) -> Tuple[List[List[str]], Optional[str]]:
+    """Parse bid text into its alternative call sequences and a vulnerability qualifier
+
+    "1c3d/1c3M" -> [["1c", "3d"], ["1c", "3M"]]; "3c/d" -> [["3c"], ["3d"]];
+    "1c1d2n (non vul)" -> [["1c", "1d", "2n"]], "nv". Text that is not a call
+    ("rest", "3x if x = M") is kept verbatim as a single opaque call.
+    """
+    alternatives, vulnerability = _parse_bid(text)
+    return [list(calls) for calls in alternatives], vulnerability
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _parse_bid(text: str) -> Tuple[Tuple[Tuple[str, ...], ...], Optional[str]]:
+    vulnerability = normalize_vulnerability(text)
+    stripped = VUL_RE.sub('', text).strip().rstrip('?').strip()
+    alternatives = []
+    for part in stripped.split('/'):
+        part = part.strip()
+        if not part:
+            continue
+        calls = split_calls(part)
+        if calls is None and alternatives and re.fullmatch(r'(nt|om|OM|[cdhsnCDHSNMm])', part):
+            # "3c/d" shorthand: the level carries over from the previous alternative
+            previous = alternatives[-1]
+            calls = previous[:-1] + [previous[-1][0] + normalize_strain(part)]
+        alternatives.append(calls if calls is not None else [part])
+    return tuple(map(tuple, alternatives or [[stripped]])), vulnerability
+
+
+def call_sort_key(call: str):
+    """Order calls by level then strain; pass/double and opaque text last"""
+    if len(call) >= 2 and call[0] in '1234567' and call[1:] in STRAIN_ORDER:
+        return (0, int(call[0]), STRAIN_ORDER[call[1:]], call)
+    return (1, 0, 0, call)
+
+
+def call_covers(pattern: str, call: str) -> bool:
+    """True if a placeholder call such as '1M' stands for the concrete call ('1h', '1s')"""
+    return CODES.get(call, -1) in COVERS.get(CODES.get(pattern), ())
+
+
+def edge(call: str) -> Edge:
+    return CODES.get(call, call)
+
+
+# Trie edge -> call text (opaque text edges are their own text)
+EDGE_CALLS: Dict[Edge, str] = dict(enumerate(TOKENS))
+
+
+def edge_call(edge_: Edge) -> str:
+    return EDGE_CALLS.get(edge_, edge_)
+
+
+# Trie edges sort as their calls do
+EDGE_SORT_KEYS = [call_sort_key(token) for token in TOKENS]
+
+
+def edge_sort_key(edge_: Edge):
+    return EDGE_SORT_KEYS[edge_] if isinstance(edge_, int) else call_sort_key(edge_)
+
+
+def same_opening(first: str, opening: str) -> bool:
+    """True if a row's first call is the sequence's opening bid, allowing for placeholders (1m ~ 1c)"""
+    return first == opening or call_covers(first, opening) or call_covers(opening, first)
+
+
+class TrieNode:
+    def __init__(self):
+        self.children: Dict[Edge, 'TrieNode'] = {}
+        self.entries: List[Dict[str, Any]] = []
+
+
+class AuctionTrie:
+    def __init__(self):
+        self.root = TrieNode()
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> 'AuctionTrie':
+        """Build the trie from a parsed data.json document"""
+        trie = cls()
+        for section_id, section in document.get('sections', {}).items():
+            trie._add_content(section, [], f'/sections/{escape_pointer(section_id)}', 'section', section_id, None)
+        for sequence_id, sequence in document.get('sequences', {}).items():
+            base, vulnerability = [], normalize_vulnerability(sequence_id.rsplit('-', 1)[-1])
+            for call in sequence.get('auction', []):
+                alternatives, call_vul = parse_bid(call)
+                base += alternatives[0]
+                vulnerability = vulnerability or call_vul
+            pointer = f'/sequences/{escape_pointer(sequence_id)}'
+            trie.insert(base, {
+                'source': 'sequence', 'id': sequence_id, 'path': pointer,
+                'title': sequence.get('title'), 'vulnerability': vulnerability,
+            })
+            trie._add_content(sequence, base, pointer, 'sequence', sequence_id, vulnerability)
+        trie._sort(trie.root)
+        return trie
+
+    def _add_content(self, item, base, pointer, source, item_id, vulnerability):
+        content = item.get('content', {})
+        for i, section in enumerate(content.get('sections', [])):
+            section_pointer = f'{pointer}/content/sections/{i}'
+            if section.get('type') == 'auction_table' and isinstance(section.get('data'), dict):
+                self._add_auction_rows(section['data'].get('rows', []), base, f'{section_pointer}/data/rows',
+                                       source, item_id, vulnerability)
+            elif isinstance(section.get('data'), list):
+                self._add_table_rows(section['data'], base, f'{section_pointer}/data', source, item_id, vulnerability)
+        for key, subsection in content.get('subsections', {}).items():
+            self._add_table_rows(subsection.get('responses', []), base, f'{pointer}/content/subsections/{key}/responses',
+                                 source, item_id, vulnerability)
+        for key, category in item.get('categories', {}).items():
+            self._add_table_rows(category.get('bids', []), base, f'{pointer}/categories/{key}/bids',
+                                 source, item_id, vulnerability)
+
+    def _add_table_rows(self, rows, base, pointer, source, item_id, vulnerability):
+        """Table rows usually carry the full auction ("1c1d1n", "1c-1d-1n"); others continue the base auction"""
+        for j, row in enumerate(rows):
+            if not row.get('bid'):
+                continue
+            alternatives, row_vul = parse_bid(row['bid'])
+            row_vul = row_vul or normalize_vulnerability(row.get('vulnerability')) or vulnerability
+            entry = self._entry(source, item_id, f'{pointer}/{j}', row['bid'], row.get('description'),
+                                row_vul, row.get('cellType'))
+            references = [link['target'] for link in row.get('links', []) if link.get('target')]
+            if row.get('reference'):
+                references.append(row['reference'])
+            if references:
+                entry['references'] = references
+            for calls in alternatives:
+                if base and not same_opening(calls[0], base[0]):
+                    calls = base + calls
+                self.insert(calls, entry)
+            if row.get('children'):
+                self._add_table_rows(row['children'], base, f'{pointer}/{j}/children', source, item_id, vulnerability)
+
+    def _add_auction_rows(self, rows, base, pointer, source, item_id, vulnerability):
+        """Auction table rows shift right one column per call after the sequence's base auction"""
+        stack: List[List[List[str]]] = []  # per column: alternative call lists
+        for j, row in enumerate(rows):
+            cells = row.get('bids', [])
+            description = next((c.get('text') for c in cells if c.get('type') == 'description'), None)
+            for column, cell in enumerate(cells):
+                if cell.get('type') not in ('opener', 'responder') or not cell.get('text'):
+                    continue
+                alternatives, cell_vul = parse_bid(cell['text'])
+                del stack[column:]
+                while len(stack) < column:
+                    stack.append([[]])  # column with no call of its own
+                stack.append(alternatives)
+                entry = self._entry(source, item_id, f'{pointer}/{j}', cell['text'], description,
+                                    cell_vul or vulnerability, cell['type'])
+                for auction in expand(stack):
+                    self.insert(base + auction, entry)
+
+    @staticmethod
+    def _entry(source, item_id, pointer, bid, description, vulnerability, player):
+        entry = {'source': source, 'id': item_id, 'path': pointer, 'bid': bid,
+                 'description': description, 'vulnerability': vulnerability}
+        if player:
+            entry['player'] = player
+        return entry
+
+    def insert(self, calls: List[str], entry: Dict[str, Any]):
+        node = self.root
+        for call in calls:
+            node = node.children.setdefault(edge(call), TrieNode())
+        node.entries.append(entry)
+
+    def _sort(self, node: TrieNode):
+        node.children = dict(sorted(node.children.items(), key=lambda item: edge_sort_key(item[0])))
+        for child in node.children.values():
+            self._sort(child)
+
+    def find(self, calls: List[str]) -> List[Tuple[List[Edge], TrieNode]]:
+        """Nodes for an auction prefix, following placeholder branches ("1c1h" also reaches "1c1M")"""
+        frontier: List[Tuple[List[Edge], TrieNode]] = [([], self.root)]
+        for call in map(edge, calls):
+            next_frontier = []
+            for path, node in frontier:
+                exact = node.children.get(call)
+                if exact is not None:
+                    next_frontier.append((path + [call], exact))
+                for child_edge, child in node.children.items():
+                    if call in COVERS.get(child_edge, ()):
+                        next_frontier.append((path + [child_edge], child))
+            frontier = next_frontier
+        return frontier
+
+    def auctions(self) -> Iterator[Tuple[bytes, List[Dict[str, Any]]]]:
+        """(packed auction, entries) for every node below the root whose calls are all calls, in order"""
+        stack = [(b'', child_edge, child) for child_edge, child in reversed(self.root.children.items())
+                 if isinstance(child_edge, int)]
+        while stack:
+            prefix, child_edge, node = stack.pop()
+            key = prefix + bytes((child_edge,))
+            if node.entries:
+                yield key, node.entries
+            stack.extend((key, grandchild_edge, grandchild)
+                         for grandchild_edge, grandchild in reversed(node.children.items())
+                         if isinstance(grandchild_edge, int))
+
+    def lookup(self, prefix: str, vulnerability: Optional[str] = None,
+               max_depth: Optional[int] = None) -> Dict[str, Any]:
+        """Entries for an auction prefix plus all continuations below it (down to max_depth calls)"""
+        alternatives, prefix_vul = parse_bid(prefix) if prefix.strip() else ([[]], None)
+        calls = alternatives[0]
+        vulnerability = normalize_vulnerability(vulnerability) or prefix_vul
+
+        def visible(entries):
+            return [e for e in entries if vulnerability is None or e['vulnerability'] in (None, vulnerability)]
+
+        call_text = EDGE_CALLS.get
+        entries, continuations = [], []
+        for path, node in self.find(calls):
+            entries.extend(visible(node.entries))
+            path = [call_text(edge_, edge_) for edge_ in path]
+            stack = [(path + [call_text(edge_, edge_)], child, 1) for edge_, child in reversed(node.children.items())]
+            while stack:
+                auction, child, depth = stack.pop()
+                child_entries = visible(child.entries)
+                if child_entries:
+                    continuations.append({'auction': auction, 'depth': depth, 'entries': child_entries})
+                if max_depth is None or depth < max_depth:
+                    stack.extend((auction + [call_text(edge_, edge_)], grandchild, depth + 1)
+                                 for edge_, grandchild in reversed(child.children.items()))
+
+        return {'prefix': calls, 'vulnerability': vulnerability, 'entries': entries,
+                'continuations': continuations}
+
+
+def expand(stack: List[List[List[str]]]) -> List[List[str]]:
+    """Cartesian product of the alternatives in each column"""
+    auctions = [[]]
+    for alternatives in stack:
+        auctions = [auction + calls for auction in auctions for calls in alternatives]
+    return auctions
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Batch build of several bridge systems from a directory of source documents
+
+Each subdirectory of the source directory is one system and every .docx/.txt
+file in it one of its documents; a document directly in the source directory
+is a system of its own (and may not share its name with another document or
+a subdirectory). Documents are parsed in parallel in a process pool and
+merged into one data file per system. Merging always follows sorted document
+paths, never completion order, so a parallel build is byte-identical to a
+serial one.
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import docx_reader
+from build_cache import write_if_changed
+from line_parser import parse_lines
+from link_graph import check_links
+from parse_content import BridgeContentParser
+
+SOURCE_SUFFIXES = ('.docx', '.txt')
+
+
+def find_documents(source_dir: Path) -> Dict[str, List[Path]]:
+    """system name -> its source documents, both in sorted order
+
+    Raises ValueError if two sources would make the same system: foo.txt and
+    foo.docx, or foo.txt and a subdirectory foo/.
+    """
+    systems: Dict[str, List[Path]] = {}
+    sources: Dict[str, str] = {}  # system name -> the top-level file or subdirectory it comes from
+    for path in sorted(source_dir.rglob('*')):
+        if path.suffix.lower() not in SOURCE_SUFFIXES or path.name.startswith(('.', '~$')):
+            continue
+        relative = path.relative_to(source_dir)
+        if len(relative.parts) > 1:
+            system, source = relative.parts[0], relative.parts[0] + '/'
+        else:
+            system, source = path.stem, relative.parts[0]
+        if sources.setdefault(system, source) != source:
+            raise ValueError(f"{sources[system]} and {source} would both be system {system!r}")
+        systems.setdefault(system, []).append(path)
+    return dict(sorted(systems.items()))
+
+
+def parse_document(path: Path) -> Tuple[List[Tuple[str, Dict[str, Any]]], float]:
+    """Parse one document in a worker process; return its items and the seconds it took"""
+    start = time.perf_counter()
+    if path.suffix.lower() == '.docx':
+        items = list(docx_reader.parse_docx(path))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            items = list(parse_lines(f))
+    return items, time.perf_counter() - start
+
+
+def merge_system(name: str, documents: List[List[Tuple[str, Dict[str, Any]]]]) -> Dict[str, Any]:
+    """One system's data from its documents' items, in document order"""
+    parser = BridgeContentParser()
+    parser.data['metadata']['title'] = name
+    for items in documents:
+        for kind, item in items:
+            parser.add_item(kind, item)
+    # Each document numbers its sections from 1; number them across the whole system
+    for order, section in enumerate(parser.data['sections'].values(), 1):
+        section['order'] = order
+    parser.link_terms()
+    return parser.data
+
+
+def build(source_dir, output_dir, jobs=None, allow_dangling=False) -> bool:
+    """Parse every document under source_dir and write <output_dir>/<system>.json
+
+    Returns False, writing nothing, if two sources would make the same system
+    or any system has dangling link targets (unless allow_dangling).
+    """
+    source_dir, output_dir = Path(source_dir), Path(output_dir)
+    try:
+        systems = find_documents(source_dir)
+    except ValueError as e:
+        print(f"Build failed: {e}; nothing written")
+        return False
+    paths = [path for documents in systems.values() for path in documents]
+    if not paths:
+        print(f"No {'/'.join(SOURCE_SUFFIXES)} documents found in {source_dir}")
+        return True
+
+    started = time.perf_counter()
+    if jobs == 1:
+        results = [parse_document(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # map returns results in submission order whatever order they finish in
+            results = list(pool.map(parse_document, paths))
+    parsed = dict(zip(paths, results))
+
+    print(f"{'Document':<60} {'Items':>6} {'Time':>9}")
+    for path in paths:
+        items, seconds = parsed[path]
+        print(f"{str(path.relative_to(source_dir)):<60} {len(items):>6} {seconds * 1000:>7.1f}ms")
+
+    merged = {name: merge_system(name, [parsed[path][0] for path in documents])
+              for name, documents in systems.items()}
+    dangling = 0
+    for name, data in merged.items():
+        print(f"Checking links in {name}")
+        dangling += len(check_links(data))
+    if dangling and not allow_dangling:
+        print(f"Build failed: {dangling} dangling target(s); nothing written")
+        return False
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name, documents in systems.items():
+        data = merged[name]
+        output = output_dir / f'{name}.json'
+        written = write_if_changed(output, json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'))
+        print(f"{'Wrote' if written else 'Unchanged'} {output}: {len(data['sections'])} section(s), "
+              f"{len(data['sequences'])} sequence(s) from {len(documents)} document(s)")
+
+    parse_seconds = sum(seconds for _, seconds in results)
+    wall_seconds = time.perf_counter() - started
+    print(f"Parsed {len(paths)} document(s) in {wall_seconds:.2f}s "
+          f"({parse_seconds:.2f}s of parsing, {jobs or os.cpu_count()} worker(s))")
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build per-system data files from a directory of source documents')
+    parser.add_argument('source_dir', help='Directory of .docx/.txt documents (one subdirectory per system)')
+    parser.add_argument('--output', '-o', default='systems',
+                        help='Directory for the <system>.json files (default: systems)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes (default: one per CPU; 1 parses serially in this process)')
+    parser.add_argument('--allow-dangling', action='store_true',
+                        help='Report links, references and cross-references to missing ids without failing')
+    args = parser.parse_args()
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if not os.path.isdir(args.source_dir):
+        parser.error(f'{args.source_dir} is not a directory')
+    sys.exit(0 if build(args.source_dir, args.output, args.jobs, args.allow_dangling) else 1)
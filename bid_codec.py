@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Bid codec: calls as small integers, auctions as packed bytes
+
+Each of the 38 calls has a code in the order calls outrank each other: 1c = 0
+up to 7n = 34, then pass, double and redouble (35-37). The placeholder calls
+the notes use ("1M", "2om", "3x") have the codes after those. An auction
+packs into bytes, one code per call, so it hashes and compares like any
+short bytes value; slicing gives its prefixes and comparing two auctions
+orders them call by call.
+
+normalize() reads every notation the documents use ("1c1d1n", "1c-1d-1n",
+"1♣ 1♦ 1NT", "1C1NT") and is memoized, because the same few hundred bid
+texts are read over and over. expand_placeholders() turns an auction with
+M/m placeholders into the concrete auctions it stands for.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LEVELS = '1234567'
+STRAINS = 'cdhsn'
+BIDS = tuple(level + strain for level in LEVELS for strain in STRAINS)
+CALLS = BIDS + ('p', 'x', 'xx')  # the 38 calls; a call's code is its index
+PASS, DOUBLE, REDOUBLE = 35, 36, 37
+
+# Placeholder strains: the majors/minors (M, OM = the other major, m, om) and the unknowns x, y, z
+PLACEHOLDERS = ('m', 'om', 'M', 'OM', 'x', 'y', 'z')
+TOKENS = CALLS + tuple(level + strain for level in LEVELS for strain in PLACEHOLDERS)
+CODES = {token: code for code, token in enumerate(TOKENS)}
+
+# Placeholder strains and the concrete strains they range over (OM/om are the other one of the pair)
+PLACEHOLDER_GROUPS = (('M', 'OM', ('h', 's')), ('m', 'om', ('c', 'd')))
+
+# Placeholder call -> the concrete calls it stands for when looking an auction up ("1M" covers 1h and 1s)
+COVERS = {CODES[level + placeholder]: frozenset(CODES[level + strain] for strain in strains)
+          for level in LEVELS for placeholder, _, strains in PLACEHOLDER_GROUPS}
+
+# Codes of level + strain calls, concrete or M/m placeholders
+BID_CODES = frozenset(CODES[level + strain] for level in LEVELS for strain in (*STRAINS, *PLACEHOLDERS[:4]))
+
+# One call: level + strain (including placeholders), pass, double, redouble
+CALL_RE = re.compile(r'([1-7])(nt|om|OM|[cdhsnCDHSNMmxyz])|(pass|p|xx|x)(?![a-z])', re.IGNORECASE)
+
+# Suit symbols fold to the letters used in bids
+SUIT_LETTERS = str.maketrans({'♣': 'c', '♦': 'd', '♥': 'h', '♠': 's'})
+
+SEPARATOR_RE = re.compile(r'[\s\-–]')
+
+NORMALIZE_CACHE_SIZE = 8192
+
+
+def normalize_strain(strain: str) -> str:
+    if strain.lower() in ('n', 'nt'):
+        return 'n'
+    if strain in ('M', 'm', 'om', 'OM'):
+        return strain
+    return strain.lower()
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize(text: str) -> Optional[bytes]:
+    """Pack a run of calls in any notation ("1c1d1n", "1c-1d-1n", "1♣ 1♦ 1NT"); None if it isn't one"""
+    compact = SEPARATOR_RE.sub('', text.translate(SUIT_LETTERS))
+    codes = bytearray()
+    pos = 0
+    for match in CALL_RE.finditer(compact):
+        if match.start() != pos:
+            return None
+        if match.group(1):
+            codes.append(CODES[match.group(1) + normalize_strain(match.group(2))])
+        else:
+            word = match.group(3).lower()
+            codes.append(PASS if word in ('p', 'pass') else CODES[word])
+        pos = match.end()
+    if pos != len(compact) or not codes:
+        return None
+    return bytes(codes)
+
+
+def pack(calls: Iterable[str]) -> Optional[bytes]:
+    """Pack normalized calls (["1c", "1d"]); None if one of them isn't a call"""
+    try:
+        return bytes(CODES[call] for call in calls)
+    except KeyError:
+        return None
+
+
+def auction_key(auction) -> Optional[bytes]:
+    """The packed auction for a key, bid text or list of calls in any notation"""
+    if isinstance(auction, bytes):
+        return auction
+    if isinstance(auction, str):
+        return normalize(auction) if auction.strip() else b''
+    return normalize('-'.join(auction)) if auction else b''
+
+
+def unpack(key: bytes) -> Tuple[str, ...]:
+    return tuple(TOKENS[code] for code in key)
+
+
+def auction_text(key: bytes, separator: str = '-') -> str:
+    """Packed 1c 1d -> "1c-1d" """
+    return separator.join(TOKENS[code] for code in key)
+
+
+def is_bid(code: int) -> bool:
+    """True for a level and strain, counting the M/m placeholders (1M, 2om) but not unknowns (3x)"""
+    return code in BID_CODES
+
+
+def is_concrete(key: bytes) -> bool:
+    """True if every call is one of the 38 (no placeholders)"""
+    return all(code <= REDOUBLE for code in key)
+
+
+def is_legal(key: bytes) -> bool:
+    """Each bid outranks the one before and nothing follows a pass (the notes leave out the opponents' passes)"""
+    rank = -1
+    for i, code in enumerate(key):
+        if code == PASS:
+            return i == len(key) - 1
+        if code in (DOUBLE, REDOUBLE):
+            continue
+        if code > REDOUBLE or code <= rank:
+            return False
+        rank = code
+    return True
+
+
+def placeholder_bindings(key: bytes) -> List[Dict[str, str]]:
+    """Every concrete reading of the M/OM/m/om placeholders in an auction"""
+    strains = {TOKENS[code][1:] for code in key if code > REDOUBLE}
+    bindings: List[Dict[str, str]] = [{}]
+    for placeholder, other, concrete in PLACEHOLDER_GROUPS:
+        if placeholder in strains or other in strains:
+            bindings = [dict(binding, **{placeholder: strain, other: concrete[1 - i]})
+                        for binding in bindings for i, strain in enumerate(concrete)]
+    return bindings
+
+
+def bind(key: bytes, binding: Dict[str, str]) -> Optional[bytes]:
+    """The auction with placeholders bound, or None if one stays unbound ("4x")"""
+    if is_concrete(key):
+        return key
+    codes = bytearray()
+    for code in key:
+        if code > REDOUBLE:
+            token = TOKENS[code]
+            code = CODES.get(token[0] + binding.get(token[1:], token[1:]), -1)
+            if not 0 <= code < PASS:
+                return None
+        codes.append(code)
+    return bytes(codes)
+
+
+def expand_placeholders(key: bytes) -> List[Tuple[bytes, Dict[str, str]]]:
+    """Every concrete auction a placeholder auction stands for, with the binding that gives it
+
+    "1c1d1M" -> [(1c1d1h, {M: h, OM: s}), (1c1d1s, {M: s, OM: h})]; auctions with
+    calls no binding makes concrete ("4x") give nothing.
+    """
+    expanded = []
+    for binding in placeholder_bindings(key):
+        concrete = bind(key, binding)
+        if concrete is not None:
+            expanded.append((concrete, binding))
+    return expanded
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Content-hash build cache for incremental parsing
+
+Source documents are split into chunks (a heading and the bids under it). A
+chunk's parse depends only on its content and the small parser state at its
+start, so the cache maps a hash of both to the fragments the chunk produced and
+the state after it. Rebuilding after an edit re-parses only the chunks whose
+content or starting state changed; outputs are rewritten only when their bytes
+differ, so unchanged files keep their mtimes and ETags.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+from system_store import write_atomic
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_FILE = '.build_cache.json'
+
+# Modules whose code decides what a chunk parses to, the parsers' imports included; editing any of them
+# invalidates the cache
+PARSER_MODULES = ('line_parser.py', 'docx_reader.py', 'auction_trie.py', 'bid_codec.py', 'search_index.py',
+                  'build_cache.py')
+
+
+def parser_fingerprint() -> str:
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    base = Path(__file__).parent
+    for name in PARSER_MODULES:
+        digest.update((base / name).read_bytes())
+    return digest.hexdigest()
+
+
+def write_if_changed(path, data: bytes) -> bool:
+    """Atomically write data unless the file already holds exactly these bytes; return whether it was written"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    write_atomic(os.fspath(path), data.decode('utf-8'))
+    return True
+
+
+class BuildCache:
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        self.path = os.fspath(path)
+        self.fingerprint = parser_fingerprint()
+        self.entries: Dict[str, str] = {}  # chunk key -> serialized {'items', 'state'}
+        self.used: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if stored.get('fingerprint') == self.fingerprint:
+            self.entries = stored.get('entries', {})
+
+    def key(self, parser, state: Dict[str, Any], chunk: Any) -> str:
+        payload = json.dumps([type(parser).__name__, state, chunk], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def parse(self, parser, chunks: Iterable[Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield the items parser produces for chunks, reusing cached fragments for unchanged chunks
+
+        parser provides feed_chunk, checkpoint, state, load_state and close
+        (LineParser, DocxParser). Items are fragments; merge them by id.
+        """
+        for chunk in chunks:
+            key = self.key(parser, parser.state(), chunk)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                items = list(parser.feed_chunk(chunk)) + list(parser.checkpoint())
+                # Serialized now: the caller merges into (and so mutates) the items it is given
+                entry = json.dumps({'items': items, 'state': parser.state()}, ensure_ascii=False)
+            else:
+                self.hits += 1
+            self.used[key] = entry
+            cached = json.loads(entry)
+            parser.load_state(cached['state'])
+            for kind, item in cached['items']:
+                yield kind, item
+        yield from parser.close()
+
+    def save(self) -> bool:
+        """Write the entries used by this build (dropping stale ones) if anything changed"""
+        stored = {'fingerprint': self.fingerprint, 'entries': self.used}
+        return write_if_changed(self.path, json.dumps(stored, ensure_ascii=False).encode('utf-8'))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Content-Encoding helpers shared by the server and the static site export
+
+gzip always, brotli when the optional module is installed. Both are written
+with fixed settings so the same input always compresses to the same bytes.
+"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# Text assets worth compressing; tiny files are cheaper to send as-is
+COMPRESSIBLE_EXTENSIONS = {'.html', '.css', '.js', '.json', '.svg', '.txt', '.md'}
+MIN_COMPRESS_SIZE = 512
+
+# Content-Encoding -> sibling file suffix, in order of preference
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def compress_bytes(data, encoding):
+    """Compress data for the given Content-Encoding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the output byte-identical between runs
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def supported_encodings():
+    """Content-Encodings this process can produce"""
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+
+def is_compressible(path, size):
+    """True for text assets large enough to benefit from compression"""
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS and size >= MIN_COMPRESS_SIZE
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Deal simulator: how often each branch of the system comes up
+
+Random deals are bid by the system for an uncontested partnership, opener
+North and responder South. Each call is the most specific bid the hand
+classifier says the hand makes among the system's continuations (fewest
+(shape, HCP) classes admitted, then system order). The auction stops when
+nothing matches. Every auction reached is counted, separately for each
+vulnerability.
+
+Deals are dealt and bid in fixed-size chunks. Each chunk has its own random
+stream derived from (seed, chunk number), so a run is reproducible whatever
+the number of worker processes. With NumPy a chunk is dealt as one array and
+bid a node of the auction tree at a time; without it deals are shuffled and
+bid one by one. The two backends draw different deals.
+
+--write stores each bid's share (the percentage of deals reaching the
+previous call that continue with this one) in the bid's row as "frequency",
+which the page shows beside the bid.
+"""
+
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from bid_codec import auction_key, auction_text
+from hand_classifier import CARD_POINTS, RANKS, ConstraintTable, class_id, class_ids, numpy
+from json_patch import resolve
+
+DEFAULT_DEALS = 100_000
+CHUNK_DEALS = 20_000
+VULNERABILITIES = ('nv', 'vul')
+
+# Cards are 0-51: suit = card // 13 in hand order (spades first), rank = card % 13 from the ace down
+CARD_HCP = [CARD_POINTS.get(RANKS[card % 13], 0) for card in range(52)]
+
+Auction = bytes  # packed (bid_codec)
+
+
+class Bidder:
+    """Picks each call of a partnership auction at one vulnerability"""
+
+    def __init__(self, table: ConstraintTable, vulnerability: str):
+        self.table = table
+        self.vulnerability = vulnerability
+        self.rows: Dict[Auction, List[int]] = {}  # auction -> rows that apply at this vulnerability
+        self.children: Dict[Auction, List[Auction]] = {}  # auction -> next calls, most specific first
+        self._tables: Dict[Auction, Any] = {}
+        self._choices: Dict[Auction, Dict[int, Optional[Auction]]] = {}
+        specificity = table.class_counts()
+        for auction in table.by_auction:
+            rows = table.compatible(auction, vulnerability)
+            if rows:
+                self.rows[auction] = rows
+                self.children.setdefault(auction[:-1], []).append(auction)
+        for children in self.children.values():
+            children.sort(key=lambda auction: (sum(specificity[i] for i in self.rows[auction]),
+                                               min(self.rows[auction])))
+
+    def choice_table(self, auction: Auction):
+        """NumPy: for every (shape, HCP) class, the index of the call it makes after auction, or -1"""
+        table = self._tables.get(auction)
+        if table is None:
+            matrix = self.table.class_matrix
+            makes = numpy.stack([matrix[:, self.rows[child]].any(axis=1) for child in self.children[auction]], axis=1)
+            table = numpy.where(makes.any(axis=1), makes.argmax(axis=1), -1)
+            self._tables[auction] = table
+        return table
+
+    def choose(self, auction: Auction, hand_class: int) -> Optional[Auction]:
+        """The call a hand of this class makes after auction, or None"""
+        choices = self._choices.setdefault(auction, {})
+        if hand_class not in choices:
+            matched = set(self.table.class_rows(hand_class))
+            choices[hand_class] = next((child for child in self.children[auction]
+                                        if any(i in matched for i in self.rows[child])), None)
+        return choices[hand_class]
+
+
+_BIDDERS: List[Bidder] = []
+
+
+def _init_worker(document: Dict[str, Any]):
+    table = ConstraintTable.from_document(document)
+    _BIDDERS[:] = [Bidder(table, vulnerability) for vulnerability in VULNERABILITIES]
+
+
+def deal_classes(rng, deals: int):
+    """Opener's and responder's (shape, HCP) classes for a batch of random deals"""
+    deck = rng.permuted(numpy.tile(numpy.arange(52, dtype=numpy.int8), (deals, 1)), axis=1)
+    hands = []
+    for seat in range(2):
+        cards = deck[:, seat * 13:(seat + 1) * 13]
+        lengths = (cards[:, :, None] // 13 == numpy.arange(4)).sum(axis=1)
+        hcp = numpy.maximum(4 - cards % 13, 0).sum(axis=1)
+        hands.append(class_ids(lengths, hcp))
+    return hands
+
+
+def hand_class(cards: List[int]) -> int:
+    lengths = [0, 0, 0, 0]
+    for card in cards:
+        lengths[card // 13] += 1
+    return class_id(lengths, sum(CARD_HCP[card] for card in cards))
+
+
+def simulate_chunk(job: Tuple[int, int, int]) -> Dict[str, Dict[Auction, int]]:
+    """Deal and bid one chunk: (seed, chunk number, deals) -> vulnerability -> auction -> deals reaching it"""
+    seed, chunk, deals = job
+    counts: Dict[str, Dict[Auction, int]] = {bidder.vulnerability: {} for bidder in _BIDDERS}
+    if numpy is not None:
+        hands = deal_classes(numpy.random.default_rng([seed, chunk]), deals)
+        for bidder in _BIDDERS:
+            reached = counts[bidder.vulnerability]
+            stack = [(b'', numpy.arange(deals))]
+            while stack:
+                auction, dealt = stack.pop()
+                if auction not in bidder.children:
+                    continue
+                choice = bidder.choice_table(auction)[hands[len(auction) % 2][dealt]]
+                for k, child in enumerate(bidder.children[auction]):
+                    chosen = dealt[choice == k]
+                    if len(chosen):
+                        reached[child] = reached.get(child, 0) + len(chosen)
+                        stack.append((child, chosen))
+        return counts
+
+    rng = random.Random(f'{seed}:{chunk}')
+    deck = list(range(52))
+    for _ in range(deals):
+        rng.shuffle(deck)
+        hands = (hand_class(deck[:13]), hand_class(deck[13:26]))
+        for bidder in _BIDDERS:
+            reached = counts[bidder.vulnerability]
+            auction: Optional[Auction] = b''
+            while auction in bidder.children:
+                auction = bidder.choose(auction, hands[len(auction) % 2])
+                if auction is None:
+                    break
+                reached[auction] = reached.get(auction, 0) + 1
+    return counts
+
+
+def simulate(document: Dict[str, Any], deals: int = DEFAULT_DEALS, seed: int = 0, jobs=None) -> Dict[str, Any]:
+    """Bid deals random deals; return how many reached each auction at each vulnerability"""
+    jobs_list = [(seed, chunk, min(CHUNK_DEALS, deals - start))
+                 for chunk, start in enumerate(range(0, deals, CHUNK_DEALS))]
+    started = time.perf_counter()
+    if jobs == 1 or len(jobs_list) < 2:
+        _init_worker(document)
+        results = [simulate_chunk(job) for job in jobs_list]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(document,)) as pool:
+            results = list(pool.map(simulate_chunk, jobs_list))
+    counts: Dict[str, Dict[Auction, int]] = {vulnerability: {} for vulnerability in VULNERABILITIES}
+    for result in results:
+        for vulnerability, reached in result.items():
+            total = counts[vulnerability]
+            for auction, n in reached.items():
+                total[auction] = total.get(auction, 0) + n
+    # Reported by auction text ("1c-1d"), in auction order
+    for vulnerability in counts:
+        counts[vulnerability] = {auction_text(auction): n for auction, n in sorted(counts[vulnerability].items())}
+    return {'deals': deals, 'seed': seed, 'backend': 'numpy' if numpy is not None else 'python',
+            'seconds': round(time.perf_counter() - started, 3), 'counts': counts}
+
+
+def shares(result: Dict[str, Any], auctions: List[Auction], vulnerability: str) -> Optional[float]:
+    """Percentage of deals reaching the previous calls that continue with one of auctions"""
+    counts = result['counts'][vulnerability]
+    reached = sum(counts.get(auction_text(auction), 0) for auction in auctions)
+    parents = {auction[:-1] for auction in auctions}
+    before = sum(counts.get(auction_text(parent), 0) if parent else result['deals'] for parent in parents)
+    return round(100 * reached / before, 1) if before else None
+
+
+def clear_annotations(document: Dict[str, Any]):
+    stack: List[Any] = [document.get('sections', {}), document.get('sequences', {})]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            value.pop('frequency', None)
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+
+
+def annotation_target(document: Dict[str, Any], entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The row (or auction-table cell) an auction trie entry was filed from"""
+    row = resolve(document, entry['path'])
+    if not isinstance(row, dict):
+        return None
+    if isinstance(row.get('bids'), list):
+        return next((cell for cell in row['bids']
+                     if cell.get('text') == entry['bid'] and cell.get('type') == entry.get('player')), None)
+    return row
+
+
+def annotate(document: Dict[str, Any], result: Dict[str, Any]) -> int:
+    """Write each bid's share into its row as "frequency": {"nv": 38.1, "vul": 35.2}; return rows annotated"""
+    table = ConstraintTable.from_document(document)
+    auctions_by_target: Dict[int, Tuple[Dict[str, Any], Dict[str, List[Auction]]]] = {}
+    for row in table.rows:
+        for entry in row['entries']:
+            target = annotation_target(document, entry)
+            if target is None:
+                continue
+            _, by_vulnerability = auctions_by_target.setdefault(id(target), (target, {}))
+            for vulnerability in ([row['vulnerability']] if row['vulnerability'] else VULNERABILITIES):
+                auctions = by_vulnerability.setdefault(vulnerability, [])
+                if row['auction'] not in auctions:
+                    auctions.append(row['auction'])
+
+    clear_annotations(document)
+    annotated = 0
+    for target, by_vulnerability in auctions_by_target.values():
+        frequency = {}
+        for vulnerability in VULNERABILITIES:
+            share = shares(result, by_vulnerability.get(vulnerability, []), vulnerability) \
+                if vulnerability in by_vulnerability else None
+            if share is not None:
+                frequency[vulnerability] = share
+        if frequency:
+            target['frequency'] = frequency
+            annotated += 1
+    document.setdefault('metadata', {})['simulation'] = {
+        'deals': result['deals'], 'seed': result['seed'], 'backend': result['backend'],
+    }
+    return annotated
+
+
+def print_report(result: Dict[str, Any], depth: int):
+    for vulnerability in VULNERABILITIES:
+        print(f"\n{vulnerability}:")
+        for key, n in result['counts'][vulnerability].items():
+            auction = auction_key(key)
+            if len(auction) <= depth:
+                share = shares(result, [auction], vulnerability)
+                print(f"  {'  ' * (len(auction) - 1)}{key:24} {n:9} {share:5.1f}%")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from build_cache import write_if_changed
+    from system_store import format_document
+
+    parser = argparse.ArgumentParser(description='Simulate random deals to see how often each bid of the system comes up')
+    parser.add_argument('document', nargs='?', default='data.json', help='System document (default: data.json)')
+    parser.add_argument('--deals', '-n', type=int, default=DEFAULT_DEALS, help=f'Deals to bid (default: {DEFAULT_DEALS})')
+    parser.add_argument('--seed', '-s', type=int, default=0, help='Random seed; a seed and deal count always give '
+                                                                  'the same result (default: 0)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes (default: one per CPU; 1 runs in this process)')
+    parser.add_argument('--depth', type=int, default=3, help='Calls deep to print (default: 3)')
+    parser.add_argument('--write', action='store_true', help='Store the shares in the document beside each bid')
+    args = parser.parse_args()
+
+    if args.deals < 1:
+        parser.error('--deals must be at least 1')
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    with open(args.document, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    result = simulate(document, args.deals, args.seed, args.jobs)
+    print(f"Bid {result['deals']} deal(s) in {result['seconds']}s ({result['backend']}, seed {result['seed']})")
+    print_report(result, args.depth)
+    if args.write:
+        annotated = annotate(document, result)
+        write_if_changed(args.document, format_document(document).encode('utf-8'))
+        print(f"\nAnnotated {annotated} bid(s) in {args.document}")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+DOCX reader for the system notes source document
+
+Streams word/document.xml out of the .docx zip with incremental XML parsing:
+each top-level paragraph or table is yielded as soon as its closing tag is
+read and then dropped from the tree, so memory stays bounded by the largest
+table rather than the whole document. Paragraph styles and table structure
+(column spans, vertically merged cells) are kept, and parse_docx turns them
+into sections and sequences through the streaming line parser.
+"""
+
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from auction_trie import expand, normalize_vulnerability, parse_bid, same_opening
+from line_parser import LineParser, is_call, resolve_placeholders
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# Paragraph styles that start a new section
+TITLE_STYLES = {'Heading1', 'Title'}
+
+# A run of two or more calls in running text: "Responder rebids on 1c1d2h when non vul" -> 1c1d2h
+AUCTION_RUN_RE = re.compile(r'(?:[1-7](?:nt|om|OM|[cdhsnCDHSNMmxyz])){2,}')
+
+
+def element_text(element) -> str:
+    """Text of a paragraph, with tabs and line breaks kept"""
+    parts = []
+    for node in element.iter():
+        if node.tag == W + 't':
+            parts.append(node.text or '')
+        elif node.tag == W + 'tab':
+            parts.append('\t')
+        elif node.tag in (W + 'br', W + 'cr'):
+            parts.append('\n')
+        elif node.tag == W + 'noBreakHyphen':
+            parts.append('-')
+    return ''.join(parts)
+
+
+def paragraph_style(paragraph) -> Optional[str]:
+    style = paragraph.find(f'{W}pPr/{W}pStyle')
+    return style.get(W + 'val') if style is not None else None
+
+
+def table_rows(table) -> List[List[Dict[str, Any]]]:
+    """Rows of cells: {'text', 'span' (grid columns), 'merge' ('restart' | 'continue' | None)}"""
+    rows = []
+    for tr in table.findall(W + 'tr'):
+        cells = []
+        for tc in tr.findall(W + 'tc'):
+            span = tc.find(f'{W}tcPr/{W}gridSpan')
+            merge = tc.find(f'{W}tcPr/{W}vMerge')
+            paragraphs = (element_text(p).strip() for p in tc.iter(W + 'p'))
+            cells.append({
+                'text': '; '.join(text.rstrip(' ;') for text in paragraphs if text),
+                'span': int(span.get(W + 'val')) if span is not None else 1,
+                'merge': (merge.get(W + 'val') or 'continue') if merge is not None else None,
+            })
+        rows.append(cells)
+    return rows
+
+
+def iter_blocks(path) -> Iterator[Dict[str, Any]]:
+    """Yield {'type': 'paragraph', 'style', 'text'} and {'type': 'table', 'rows'} in document order"""
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as f:
+        depth = 0
+        body = None
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if element.tag == W + 'body':
+                    body = element
+                continue
+            depth -= 1
+            if depth != 2 or body is None:
+                continue
+            # A direct child of <w:body> is complete
+            if element.tag == W + 'p':
+                yield {'type': 'paragraph', 'style': paragraph_style(element), 'text': element_text(element).strip()}
+            elif element.tag == W + 'tbl':
+                yield {'type': 'table', 'rows': table_rows(element)}
+            body.clear()
+
+
+def resolve_merges(rows: List[List[Dict[str, Any]]]) -> List[List[str]]:
+    """Cell texts per row, with vertically merged continuation cells taking the text above them"""
+    above: Dict[int, str] = {}
+    resolved = []
+    for row in rows:
+        column, texts = 0, []
+        for cell in row:
+            text = above.get(column, '') if cell['merge'] == 'continue' else cell['text']
+            above[column] = text
+            texts.append(text)
+            column += cell['span']
+        resolved.append(texts)
+    return resolved
+
+
+def heading_auction(text: str, opening: Optional[str] = None) -> Optional[Tuple[List[str], Optional[str]]]:
+    """The auction a heading is about ("1c1d2n when non vul" -> ['1c', '1d', '2n'], 'nv'), if any
+
+    Placeholders the section's opening decides are bound: "1m1h1s" under a 1c opening is 1c1h1s.
+    """
+    runs = AUCTION_RUN_RE.findall(text)
+    if not runs:
+        return None
+    alternatives, _ = parse_bid(runs[-1])
+    return resolve_placeholders(alternatives[0], opening), normalize_vulnerability(text)
+
+
+class DocxParser:
+    """Turns document blocks into sections and sequences through a LineParser
+
+    Title-styled paragraphs start sections and other paragraphs are headings.
+    Table rows are bid cells followed by a description cell; bids in later
+    columns continue the auction in the columns before them, and rows that
+    don't start with a full auction continue the one the last heading names.
+    """
+
+    def __init__(self):
+        self.lines = LineParser()
+        self.context: Tuple[List[str], Optional[str]] = ([], None)
+
+    def feed_block(self, block: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        if block['type'] == 'paragraph':
+            text = block['text']
+            if not text:
+                return
+            if block['style'] in TITLE_STYLES:
+                self.context = ([], None)
+                yield from self.lines.feed_title(text)
+            else:
+                self.context = heading_auction(text, self.lines.opening) or self.context
+                self.lines.feed_heading(text)
+            return
+
+        for cells in resolve_merges(block['rows']):
+            if len(cells) < 2:
+                continue
+            bids = [text for text in cells[:-1] if text]
+            if bids:
+                yield from self._feed_row(bids, cells[-1])
+
+    def feed_chunk(self, blocks: List[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for block in blocks:
+            yield from self.feed_block(block)
+
+    def close(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        yield from self.lines.close()
+
+    def checkpoint(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        yield from self.lines.checkpoint()
+
+    def state(self) -> Dict[str, Any]:
+        return {'lines': self.lines.state(), 'context': [list(self.context[0]), self.context[1]]}
+
+    def load_state(self, state: Dict[str, Any]):
+        self.lines.load_state(state['lines'])
+        self.context = (state['context'][0], state['context'][1])
+
+    def _feed_row(self, bids: List[str], description: str):
+        base, vulnerability = self.context
+        columns = []
+        for text in bids:
+            alternatives, cell_vul = parse_bid(text)
+            if not all(calls and all(is_call(call) for call in calls) for calls in alternatives):
+                self.lines.feed_opaque(' '.join(bids), description)
+                return
+            columns.append(alternatives)
+            vulnerability = cell_vul or vulnerability
+
+        first = columns[0][0]
+        absolute = len(first) > 1 and (not base or same_opening(first[0], base[0]))
+        if not absolute:
+            columns.insert(0, [base])
+        if description or len(bids) > 1:
+            yield from self.lines.feed_bid(expand(columns), vulnerability, description)
+
+
+def docx_chunks(path) -> Iterator[List[Dict[str, Any]]]:
+    """Group document blocks into chunks, each starting at a non-empty paragraph"""
+    chunk: List[Dict[str, Any]] = []
+    for block in iter_blocks(path):
+        if chunk and block['type'] == 'paragraph' and block['text']:
+            yield chunk
+            chunk = []
+        chunk.append(block)
+    if chunk:
+        yield chunk
+
+
+def parse_docx(path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ('section' | 'sequence', item) pairs from a system notes .docx"""
+    parser = DocxParser()
+    for block in iter_blocks(path):
+        yield from parser.feed_block(block)
+    yield from parser.close()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Static site export for offline use
+
+Writes a bundle that needs no server and no data.json: one pre-rendered page
+per section, sequence and definition (the fragments.py markup inside the
+usual panels), content-hashed minified assets, a serialized search index that
+static_site.js queries in the browser, and .gz/.br variants of every
+compressible file. Pages work from file:// and from any static web server;
+the index is a script rather than JSON because file:// pages can't fetch.
+
+Pages are rendered in a process pool. Each page's inputs (its item, the shared
+layout and the renderer versions) are hashed and recorded in the bundle, so a
+re-export renders and writes only pages whose inputs changed and removes files
+left over from items that no longer exist.
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from build_cache import write_if_changed
+from compression import ENCODING_SUFFIXES, compress_bytes, is_compressible, supported_encodings
+from fragments import RENDER_VERSION, RENDERERS, convert_bridge_notation
+from search_index import COLLECTIONS, SearchIndex
+from shards import encode_json
+
+EXPORT_VERSION = 2
+STATE_FILE = '.export-state.json'
+SEARCH_INDEX_FILE = 'search-index.js'
+DEFAULT_OUTPUT_DIR = 'site'
+
+BASE_DIR = Path(__file__).parent
+
+CSS_TOKEN_RE = re.compile(r'/\*.*?\*/|(?P<string>"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', re.DOTALL)
+
+# Bundled assets: name in the bundle -> source file
+ASSETS = {'styles': 'styles.css', 'static': 'static_site.js'}
+
+WELCOME = ('<div class="welcome-message">Select a section from the Table of Contents '
+           'to begin exploring the Uma + PS Bridge System.</div>')
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{page_title}</title>
+<link rel="stylesheet" href="{root}{styles}">
+</head>
+<body class="static-site" data-root="{root}">
+<div class="header">
+<div class="header-content">
+<h1><a href="{root}index.html" style="color: inherit; text-decoration: none;">{site_title}</a></h1>
+<div class="header-controls">
+<div class="search-container">
+<input type="text" id="search-input" placeholder="Search bids, sequences..." autocomplete="off" />
+<div class="search-results" id="search-results"></div>
+</div>
+<span class="update-date">Last update: {last_update}</span>
+</div>
+</div>
+</div>
+<div class="main-container">
+<div class="panel toc-panel" id="toc-panel">
+<div class="panel-header"><h3>Contents</h3></div>
+<div class="panel-content" id="toc-content">
+{toc}
+</div>
+</div>
+<div class="panel content-panel level-a-panel" id="level-a-panel">
+<div class="panel-header"><div><h3 id="level-a-title">{heading}</h3></div></div>
+<div class="panel-content" id="level-a-content">
+{content}
+</div>
+</div>
+</div>
+<script src="{root}{search}"></script>
+<script src="{root}{static}"></script>
+</body>
+</html>
+"""
+
+
+def minify_css(text: str) -> str:
+    def squeeze(code):
+        code = re.sub(r'\s+', ' ', code)
+        return re.sub(r'\s*([{};,])\s*', r'\1', code)
+    # Comments go; quoted strings (content: "...", attribute selectors) are kept exactly
+    parts = []
+    position = 0
+    for match in CSS_TOKEN_RE.finditer(text):
+        parts.append(squeeze(text[position:match.start()]))
+        if match.group('string'):
+            parts.append(match.group('string'))
+        position = match.end()
+    parts.append(squeeze(text[position:]))
+    return ''.join(parts).replace(';}', '}').strip() + '\n'
+
+
+def minify_js(text: str) -> str:
+    # Conservative: drop indentation, blank lines and whole-line comments, never touch code within a line
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+def hashed_name(name: str, suffix: str, data: bytes) -> str:
+    return f'assets/{name}.{hashlib.sha256(data).hexdigest()[:10]}{suffix}'
+
+
+def page_name(item_id: str) -> str:
+    """File name for an item's page; quoted exactly as encodeURIComponent would"""
+    return urllib.parse.quote(item_id, safe="!*'()") + '.html'
+
+
+def page_href(collection: str, item_id: str) -> str:
+    return collection + '/' + urllib.parse.quote(page_name(item_id), safe="!*'()")
+
+
+def split_title(title: str, subtitle: str = '') -> Tuple[str, str]:
+    """Main title and subtitle as app.js shows them: "1♣ Opening: longer clubs..." splits at the colon"""
+    main, _, rest = title.partition(': ')
+    return main, rest or subtitle
+
+
+def build_assets(document: Dict[str, Any]) -> Dict[str, Tuple[str, bytes]]:
+    """Asset name -> (hashed path in the bundle, minified content)"""
+    assets = {}
+    for name, source in ASSETS.items():
+        text = (BASE_DIR / source).read_text(encoding='utf-8')
+        data = (minify_css(text) if source.endswith('.css') else minify_js(text)).encode('utf-8')
+        assets[name] = (hashed_name(name, Path(source).suffix, data), data)
+    # Content, not code: a fixed name, so an edit to one item doesn't change every page that loads it
+    compact = SearchIndex.from_document(document).to_compact()
+    assets['search'] = (SEARCH_INDEX_FILE, b'window.SEARCH_INDEX=' + encode_json(compact) + b';\n')
+    return assets
+
+
+def build_layout(document: Dict[str, Any], assets: Dict[str, Tuple[str, bytes]]) -> Dict[str, Any]:
+    """Everything a page shares with every other page"""
+    sections = sorted(document.get('sections', {}).items(), key=lambda entry: entry[1].get('order', 0))
+    metadata = document.get('metadata', {})
+    return {
+        'site_title': metadata.get('title', 'Uma + PS System'),
+        'last_update': metadata.get('lastUpdate', ''),
+        'toc': [(section_id, split_title(section.get('title', section_id))[0], section.get('title', section_id))
+                for section_id, section in sections],
+        'assets': {name: path for name, (path, _) in assets.items()},
+    }
+
+
+def render_page(job: Tuple[str, str, Any, Dict[str, Any]]) -> bytes:
+    """One page (run in a worker process): ('section' | 'sequence' | 'definition' | 'index', id, item, layout)"""
+    kind, item_id, item, layout = job
+    root = '' if kind == 'index' else '../'
+    toc = '\n'.join(
+        f'<a class="toc-item{" active" if section_id == item_id and kind == "section" else ""}" '
+        f'href="{root}{page_href("sections", section_id)}" title="{html.escape(title)}">{convert_bridge_notation(label)}</a>'
+        for section_id, label, title in layout['toc']
+    )
+    if kind == 'index':
+        heading, content, page_title = 'Contents', WELCOME, layout['site_title']
+    else:
+        content = RENDERERS[kind](item)
+        if kind == 'definition':
+            heading, page_title = 'Definitions', item.get('title', item_id)
+        else:
+            main, subtitle = split_title(item.get('title', item_id), item.get('subtitle', ''))
+            heading = f'<div class="title-main">{convert_bridge_notation(main)}</div>'
+            if subtitle:
+                heading += f'\n<div class="title-subtitle">{convert_bridge_notation(subtitle)}</div>'
+            page_title = main
+        page_title = f"{page_title} - {layout['site_title']}"
+    return PAGE_TEMPLATE.format(
+        page_title=html.escape(page_title), root=root, site_title=layout['site_title'], last_update=layout['last_update'],
+        toc=toc, heading=heading, content=content, **layout['assets'],
+    ).encode('utf-8')
+
+
+def page_key(job: Tuple[str, str, Any, Dict[str, Any]]) -> str:
+    """Hash of everything a page is rendered from"""
+    payload = [EXPORT_VERSION, RENDER_VERSION.decode(), *job]
+    return hashlib.sha256(encode_json(payload)).hexdigest()
+
+
+def write_bytes(path: Path, data: bytes):
+    tmp = path.with_name(f'{path.name}.tmp{os.getpid()}')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_output(output_dir: Path, relative: str, data: bytes) -> List[str]:
+    """Write a bundle file and its compressed variants; return every path written"""
+    path = output_dir / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_if_changed(path, data)
+    written = [relative]
+    if is_compressible(relative, len(data)):
+        for encoding in supported_encodings():
+            sibling = relative + ENCODING_SUFFIXES[encoding]
+            write_bytes(output_dir / sibling, compress_bytes(data, encoding))
+            written.append(sibling)
+    return written
+
+
+def export(document: Dict[str, Any], output_dir, jobs=None) -> Dict[str, int]:
+    """Export document as a static site under output_dir, re-rendering only changed pages"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state_path = output_dir / STATE_FILE
+    try:
+        previous = json.loads(state_path.read_text(encoding='utf-8'))
+        if previous.get('version') != EXPORT_VERSION:
+            previous = {}
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    previous_pages: Dict[str, str] = previous.get('pages', {})
+    previous_files: Dict[str, List[str]] = previous.get('files', {})
+
+    files: Dict[str, List[str]] = {}  # bundle file -> it and its compressed variants
+    assets = build_assets(document)
+    for path, data in assets.values():
+        # Content-addressed: an asset with this name already holds exactly this content
+        if path != SEARCH_INDEX_FILE and path in previous_files and (output_dir / path).exists():
+            files[path] = previous_files[path]
+        else:
+            files[path] = write_output(output_dir, path, data)
+
+    layout = build_layout(document, assets)
+    jobs_by_path = {'index.html': ('index', '', None, layout)}
+    for collection, kind in COLLECTIONS:
+        for item_id, item in document.get(collection, {}).items():
+            jobs_by_path[f'{collection}/{page_name(item_id)}'] = (kind, item_id, item, layout)
+
+    pages = {path: page_key(job) for path, job in jobs_by_path.items()}
+    stale = [path for path in jobs_by_path
+             if previous_pages.get(path) != pages[path] or not (output_dir / path).exists()]
+    for path in jobs_by_path:
+        if path not in stale:
+            files[path] = previous_files.get(path, [path])
+
+    started = time.perf_counter()
+    work = [jobs_by_path[path] for path in stale]
+    if jobs == 1 or len(work) < 2:
+        rendered = [render_page(job) for job in work]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            rendered = list(pool.map(render_page, work, chunksize=8))
+    for path, data in zip(stale, rendered):
+        files[path] = write_output(output_dir, path, data)
+    seconds = time.perf_counter() - started
+
+    removed = 0
+    for path, written in previous_files.items():
+        if path not in files:
+            for relative in written:
+                try:
+                    (output_dir / relative).unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+
+    state = {'version': EXPORT_VERSION, 'pages': pages, 'files': files}
+    write_if_changed(state_path, json.dumps(state, ensure_ascii=False, indent=1).encode('utf-8'))
+    return {'pages': len(pages), 'rendered': len(stale), 'removed': removed, 'milliseconds': round(seconds * 1000)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export the system as a static site that works offline')
+    parser.add_argument('document', nargs='?', default='data.json', help='Document to export (default: data.json)')
+    parser.add_argument('--output', '-o', default=DEFAULT_OUTPUT_DIR,
+                        help=f'Directory for the bundle (default: {DEFAULT_OUTPUT_DIR})')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes rendering pages (default: one per CPU; 1 renders serially)')
+    args = parser.parse_args()
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    with open(args.document, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    summary = export(document, args.output, args.jobs)
+    print(f"Exported {summary['pages']} page(s) to {args.output}: {summary['rendered']} rendered "
+          f"in {summary['milliseconds']}ms, {summary['pages'] - summary['rendered']} unchanged, "
+          f"{summary['removed']} stale file(s) removed")
+    print(f"Open {os.path.join(args.output, 'index.html')} in a browser; no server needed")
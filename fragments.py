@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Pre-rendered HTML fragments for sections, sequences and definitions
+
+A Python port of the app.js renderers (generateSectionHTML, generateSequenceHTML,
+generateDefinitionHTML and the bridge/auction tables they use), producing the
+same markup so the client can insert a fragment instead of building tables
+from JSON. Fragments depend only on the item, so they are cached by a hash of
+its content and an edit re-renders just the items it touched.
+
+Unlike app.js, links and suit symbols are only substituted in text, never
+inside tags, so a link target such as "responder-rebids-1c1d2c" keeps its
+"2c" rather than having a suit span written into the attribute.
+"""
+
+import hashlib
+import html
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from search_index import COLLECTIONS
+from shards import encode_json
+
+FRAGMENT_CACHE_SIZE = 2048
+
+# Part of every fragment's hash: bump when the markup changes so browsers don't keep old fragments
+RENDER_VERSION = b'2'
+
+# convertBridgeNotation: JavaScript \b is ASCII-only
+SUIT_PATTERNS = [
+    (re.compile(r'\b([1-7]?)c\b', re.ASCII), r'\1<span class="suit clubs">♣</span>'),
+    (re.compile(r'\b([1-7]?)d\b', re.ASCII), r'\1<span class="suit diamonds">♦</span>'),
+    (re.compile(r'\b([1-7]?)h\b', re.ASCII), r'\1<span class="suit hearts">♥</span>'),
+    (re.compile(r'\b([1-7]?)s\b', re.ASCII), r'\1<span class="suit spades">♠</span>'),
+    (re.compile(r'\b([1-7]?)n\b', re.ASCII | re.IGNORECASE), r'\1NT'),
+]
+
+TAG_RE = re.compile(r'(</?[a-zA-Z][^<>]*>)')
+
+# Colour annotations left in auction table headers: "(opener #d1fae5, responder #dbeafe)"
+HEADER_COLORS_RE = re.compile(r'\s*\(opener\s*#[a-f0-9]+,\s*responder\s*#[a-f0-9]+\)', re.IGNORECASE)
+
+LINK_CLASSES = {'green': 'green-text', 'red': 'red-text'}
+
+FREQUENCY_TITLE = 'Share of simulated deals reaching this point that make this bid'
+
+
+def in_text(markup: str, replace: Callable[[str], str]) -> str:
+    """Apply replace to the text between tags only"""
+    # The capturing split puts the tags at odd indexes
+    return ''.join(part if i % 2 else replace(part) for i, part in enumerate(TAG_RE.split(markup)))
+
+
+def convert_bridge_notation(text: str) -> str:
+    def convert(part):
+        for pattern, replacement in SUIT_PATTERNS:
+            part = pattern.sub(replacement, part)
+        return part
+    return in_text(text, convert)
+
+
+def notation(text: Any) -> str:
+    # Template literals print missing fields as "undefined"; the data always has the fields it renders
+    return convert_bridge_notation(text if isinstance(text, str) else str(text))
+
+
+def link_description(row: Dict[str, Any]) -> str:
+    description = row.get('description', '')
+    for link in row.get('links') or []:
+        color_class = LINK_CLASSES.get(link.get('type'), 'blue-text')
+        attribute = 'data-definition' if link.get('type') == 'green' else 'data-reference'
+        span = f'<span class="{color_class}" {attribute}="{link.get("target")}">{link["text"]}</span>'
+        description = in_text(description, lambda part: part.replace(link['text'], span))
+    return convert_bridge_notation(description)
+
+
+def frequency_badge(frequency: Optional[Dict[str, Any]]) -> str:
+    """deal_simulator.py's share for a bid; one figure when it doesn't depend on vulnerability"""
+    if not frequency:
+        return ''
+    values = list(frequency.items())
+    if len(values) == 2 and values[0][1] != values[1][1]:
+        text = ' / '.join(f'{vulnerability} {share:g}%' for vulnerability, share in values)
+    else:
+        text = f'{values[0][1]:g}%'
+    return f' <span class="bid-frequency" title="{FREQUENCY_TITLE}">{text}</span>'
+
+
+def bridge_table(rows: List[Dict[str, Any]], hierarchical: bool = False) -> str:
+    parts = ['<table class="bridge-table">']
+    if hierarchical:
+        for row in rows:
+            parts.extend(hierarchical_row(row))
+    else:
+        for row in rows:
+            cell_class = 'opener-cell' if row.get('cellType') == 'opener' else 'responder-cell'
+            parts.append('<tr>')
+            parts.append(f'<td class="bid-cell {cell_class}">{notation(row.get("bid"))}'
+                         f'{frequency_badge(row.get("frequency"))}</td>')
+            parts.append(f'<td class="description-cell {cell_class}">{link_description(row)}</td>')
+            parts.append('</tr>')
+    parts.append('</table>')
+    return '\n'.join(parts)
+
+
+def hierarchical_row(row: Dict[str, Any]) -> List[str]:
+    # Iterative pre-order walk over the row and its children
+    parts = []
+    stack = [row]
+    while stack:
+        row = stack.pop()
+        cell_class = 'opener-cell' if row.get('cellType') == 'opener' else 'responder-cell'
+        level = row.get('level') or 1
+        indent_class = f'indent-{level - 1}' if level > 1 else ''
+        description = row.get('description')
+        tooltip = f'title="{html.escape(description, quote=False)}"' if description and len(description) > 50 else ''
+        parts.append('<tr>')
+        parts.append(f'<td class="bid-cell {cell_class} {indent_class}">{notation(row.get("bid"))}'
+                     f'{frequency_badge(row.get("frequency"))}</td>')
+        parts.append(f'<td class="description-cell {cell_class} {indent_class} truncated-text" {tooltip}>'
+                     f'{link_description(row)}</td>')
+        parts.append('</tr>')
+        stack.extend(reversed(row.get('children') or []))
+    return parts
+
+
+def auction_table(auction: Dict[str, Any]) -> str:
+    parts = ['<table class="auction-table">']
+    max_cols = max(len(row['bids']) for row in auction['rows'])
+    parts.append('<colgroup>')
+    parts.extend('<col style="width:50px">' for _ in range(max_cols - 1))
+    parts.append('<col>')
+    parts.append('</colgroup>')
+
+    if auction.get('header'):
+        parts.append('<tr class="auction-header">')
+        header = HEADER_COLORS_RE.sub('', convert_bridge_notation(auction['header']))
+        parts.append(f'<td colspan="{max_cols}" class="auction-title">{header}</td>')
+        parts.append('</tr>')
+
+    for row in auction['rows']:
+        parts.append('<tr class="auction-row">')
+        col_count = 0
+        for cell in row['bids']:
+            if cell.get('type') == 'description':
+                break
+            col_count += 1
+        for cell in row['bids']:
+            cell_type = cell.get('type')
+            content = cell.get('text')
+            colspan = 1
+            cell_class = ''
+            if cell_type == 'opener':
+                cell_class = 'opener-cell'
+            elif cell_type == 'responder':
+                cell_class = 'responder-cell'
+            elif cell_type == 'description':
+                cell_class = 'description-cell'
+                colspan = max_cols - col_count
+            elif cell_type == 'empty':
+                cell_class = 'empty-cell'
+                content = ''
+            colspan_attribute = f' colspan="{colspan}"' if colspan > 1 else ''
+            parts.append(f'<td class="auction-cell {cell_class}"{colspan_attribute}>{notation(content)}'
+                         f'{frequency_badge(cell.get("frequency"))}</td>')
+        parts.append('</tr>')
+
+    parts.append('</table>')
+    return '\n'.join(parts)
+
+
+def content_sections(sections: List[Dict[str, Any]], heading: str) -> List[str]:
+    parts = []
+    for section in sections:
+        parts.append(f'<{heading}>{section.get("title")}</{heading}>')
+        if section.get('type') == 'auction_table' and section.get('data'):
+            parts.append(auction_table(section['data']))
+        elif section.get('type') in ('table', 'hierarchical_table') and section.get('data'):
+            parts.append(bridge_table(section['data'], section['type'] == 'hierarchical_table'))
+    return parts
+
+
+def render_section(section: Dict[str, Any]) -> str:
+    """generateSectionHTML"""
+    content = section.get('content')
+    if not content:
+        return '<div class="loading-message">No content available</div>'
+    return '\n'.join(content_sections(content.get('sections') or [], 'h4'))
+
+
+def render_sequence(sequence: Dict[str, Any]) -> str:
+    """generateSequenceHTML"""
+    parts = []
+    if sequence.get('auction'):
+        parts.append('<div class="auction-sequence">')
+        for index, bid in enumerate(sequence['auction']):
+            bid_class = 'opener-bid' if index % 2 == 0 else 'responder-bid'
+            parts.append(f'<span class="bid {bid_class}">{notation(bid)}</span>')
+        parts.append('</div>')
+
+    if (sequence.get('content') or {}).get('sections'):
+        parts.extend(content_sections(sequence['content']['sections'], 'h5'))
+
+    for category in (sequence.get('categories') or {}).values():
+        parts.append(f'<h5>{category.get("title")}</h5>')
+        if category.get('bids'):
+            parts.append('<div class="bid-list">')
+            for bid in category['bids']:
+                parts.append('<div class="bid-item">')
+                bid_class = 'opener-bid' if bid.get('type') == 'opener-bid' else 'responder-bid'
+                parts.append('<div class="bid-header">')
+                parts.append(f'<span class="bid {bid_class}">{notation(bid.get("bid"))}</span>'
+                             f'{frequency_badge(bid.get("frequency"))}')
+                if bid.get('hcp'):
+                    parts.append(f'<span class="hcp-range">{bid["hcp"]}</span>')
+                parts.append('</div>')
+                parts.append(f'<div class="bid-description">{notation(bid.get("description"))}</div>')
+                if bid.get('shape'):
+                    parts.append(f'<div class="shape-requirement">{bid["shape"]}</div>')
+                parts.append('</div>')
+            parts.append('</div>')
+    return '\n'.join(parts)
+
+
+def render_definition(definition: Dict[str, Any]) -> str:
+    """generateDefinitionHTML"""
+    parts = [f'<h4>{definition.get("title")}</h4>']
+    if definition.get('category'):
+        parts.append(f'<div class="definition-category">{definition["category"]}</div>')
+    if definition.get('definition'):
+        parts.append(f'<p class="definition-text">{notation(definition["definition"])}</p>')
+    if definition.get('meaning'):
+        parts.append(f'<p class="definition-meaning">{notation(definition["meaning"])}</p>')
+    for field in ('details', 'examples'):
+        if isinstance(definition.get(field), list):
+            parts.append(f'<ul class="definition-{field}">')
+            parts.extend(f'<li>{notation(item)}</li>' for item in definition[field])
+            parts.append('</ul>')
+    if definition.get('algorithm'):
+        parts.append('<div class="algorithm">')
+        for value in definition['algorithm'].values():
+            if isinstance(value, list):
+                parts.append('<ul>')
+                parts.extend(f'<li>{notation(item)}</li>' for item in value)
+                parts.append('</ul>')
+            else:
+                parts.append(f'<div class="algorithm-item">{notation(value)}</div>')
+        parts.append('</div>')
+    if definition.get('notes'):
+        parts.append(f'<div class="definition-notes">{notation(definition["notes"])}</div>')
+    return '\n'.join(parts)
+
+
+RENDERERS = {'section': render_section, 'sequence': render_sequence, 'definition': render_definition}
+
+
+class FragmentCache:
+    """Rendered fragments by (kind, content hash), least recently used dropped first"""
+
+    def __init__(self, size=FRAGMENT_CACHE_SIZE):
+        self.size = size
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[bytes, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, kind: str, body: bytes) -> Tuple[bytes, str]:
+        """(HTML, ETag) for an item serialized as body, rendered only if no item with the same content was"""
+        digest = hashlib.sha256(RENDER_VERSION + body).hexdigest()[:32]
+        key = (kind, digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = (RENDERERS[kind](json.loads(body)).encode('utf-8'), f'"{digest}"')
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry
+
+
+FRAGMENT_CACHE = FragmentCache()
+
+
+class Fragments:
+    def __init__(self, cache: FragmentCache = FRAGMENT_CACHE):
+        self.cache = cache
+        self.items: Dict[str, Tuple[str, bytes]] = {}  # id -> (kind, item as JSON)
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> 'Fragments':
+        """Index the document's items; each is rendered (or found in the cache) when first asked for
+
+        Items are serialized here, as the store builds the index under its lock,
+        so an edit made later can't change an item between hashing and rendering.
+        """
+        fragments = cls()
+        for collection, kind in COLLECTIONS:
+            for item_id, item in document.get(collection, {}).items():
+                if item_id not in fragments.items:
+                    fragments.items[item_id] = (kind, encode_json(item))
+        return fragments
+
+    def get(self, item_id: str) -> Optional[Tuple[bytes, str]]:
+        """(HTML, ETag) for a section, sequence or definition, or None if there is no such id"""
+        entry = self.items.get(item_id)
+        if entry is None:
+            return None
+        return self.cache.render(*entry)
+
+
+def export(document: Dict[str, Any], output_dir) -> Tuple[int, int]:
+    """Write <output_dir>/<id>.html for every item; return (written, unchanged)"""
+    from build_cache import write_if_changed
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    fragments = Fragments.from_document(document)
+    written = 0
+    for item_id in fragments.items:
+        body, _ = fragments.get(item_id)
+        written += write_if_changed(output_dir / f'{item_id}.html', body)
+    return written, len(fragments.items) - written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pre-render every section, sequence and definition to HTML')
+    parser.add_argument('document', nargs='?', default='data.json', help='Document to render (default: data.json)')
+    parser.add_argument('--output', '-o', default='fragments', help='Directory for <id>.html (default: fragments)')
+    args = parser.parse_args()
+
+    with open(args.document, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    written, unchanged = export(document, args.output)
+    print(f"Rendered {written + unchanged} fragment(s) to {args.output}: {written} written, {unchanged} unchanged")
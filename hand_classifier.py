@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+Hand classifier: which bids of the system a hand makes
+
+Every bid the auction trie knows is compiled into one row of a constraint
+table: an HCP range, a length range per suit, balanced or not, the length of
+the shortest suit and of the longest major/minor. Rows take their constraints
+from the hcp/shape fields when a row has them and from the description text
+otherwise ("12-14", "5+c, 4M", "5s4h/ 55", "no 4M", "bal", "Spl"); M/m
+placeholders are expanded into concrete auctions so "1c1d1M ... 4M" becomes
+1c1d1h with 4 hearts.
+A call that says nothing about the hand (a puppet, "to play") is narrowed to
+what the same player's later calls show, and every call inherits what the
+player's earlier calls in the auction promised.
+
+A hand is classified by its shape and HCP only, and there are just 560 shapes
+times 38 HCP counts, so the table is evaluated once per (shape, HCP) class:
+with NumPy for all classes at once, without it lazily per class. Classifying a
+batch of hands is then a lookup per hand (and one bincount for frequencies).
+"""
+
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from auction_trie import AuctionTrie, normalize_vulnerability
+from bid_codec import SUIT_LETTERS, auction_text, expand_placeholders, is_legal, unpack
+
+try:
+    import numpy
+except ImportError:  # optional: pip install numpy (batches then classify hand by hand)
+    numpy = None
+
+SUITS = ('s', 'h', 'd', 'c')  # hand order, as written: ♠ ♥ ♦ ♣
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+MAJORS = (0, 1)
+MINORS = (2, 3)
+CARD_POINTS = {'A': 4, 'K': 3, 'Q': 2, 'J': 1}
+RANKS = 'AKQJT98765432'
+MAX_HCP = 37
+HCP_LEVELS = MAX_HCP + 1
+
+# Every 13-card shape (spades, hearts, diamonds, clubs); a hand's class is (shape, HCP)
+SHAPES = [(s, h, d, 13 - s - h - d) for s in range(14) for h in range(14 - s) for d in range(14 - s - h)]
+SHAPE_IDS = {shape: i for i, shape in enumerate(SHAPES)}
+CLASS_COUNT = len(SHAPES) * HCP_LEVELS
+
+# ♠A432 ♥2 ♦KJ987 ♣432 (a missing suit is a void) or A432.2.KJ987.432 (spades first)
+HAND_SUIT_RE = re.compile(r'([♠♥♦♣])\s*([^♠♥♦♣]*)')
+HAND_SYMBOLS = {'♠': 's', '♥': 'h', '♦': 'd', '♣': 'c'}
+
+# Clause-level parsing of descriptions; suits are already folded to letters
+CLAUSE_RE = re.compile(r'[,;:()]')
+TOP_ALTERNATIVE_RE = re.compile(r'[;,]\s*or\b', re.IGNORECASE)
+ALTERNATIVE_RE = re.compile(r'\bor\b|(?<!\d)/|/(?!\s*\d)', re.IGNORECASE)
+# From these words on a clause is about other hands, later bidding or possibilities, not this hand
+QUALIFIER_RE = re.compile(r'\b(?:can|may|if|unless|subsequent(?:ly)?|rebids?|asks?|opener|responder|next|'
+                            r'partner|generally|usually)\b', re.IGNORECASE)
+NEGATION_RE = re.compile(r'\b(?:no|denies|deny|without)\s*(?:a\s+)?$', re.IGNORECASE)
+CALL_CONTEXT_RE = re.compile(r'\b(?:to|bid|bids|over|after|via|of|on|than)\s*$', re.IGNORECASE)
+# A length may follow another one directly: "5s4h", "5d4M"
+SHAPE_RE = re.compile(
+    r'(?:(?<![\w+<])|(?<=\d[cdhs]))(<\s*)?(\d{1,2})(\+)?\s*(-?\s*cards?\s+)?'
+    r'(OM|om|M|m|clubs?|diamonds?|hearts?|spades?|sp|[cdhs])(?![a-zA-Z])'
+)
+SUIT_WORDS = {'club': 'c', 'diamond': 'd', 'heart': 'h', 'spade': 's', 'sp': 's'}
+# Two lengths written together ("5s4h"), whose suits bare pairs in the same description refer to ("55/65")
+SUIT_PAIR_RE = re.compile(r'(?<![\w+<])\d([cdhs])\d([cdhs])(?![a-zA-Z])')
+BARE_PAIRS_RE = re.compile(r'(?<![\w+\-<./])([4-7][4-7](?:\s*/\s*[4-7][4-7])*)'
+                           r'(?![\w\-+/]|\s*(?:hands?|hcp|cards?)\b)', re.IGNORECASE)
+HCP_TERM = r'\d{1,2}(?:\s*[-–]\s*\d{1,2}|\+)?'
+HCP_RE = re.compile(rf'(?<![\w+\-/<.])(<\s*\d{{1,2}}|{HCP_TERM}(?:\s*/\s*{HCP_TERM})*)(?![\w\-/+]|\s*(?:losers?|cards?|keys?|tricks?)\b)(\s*hcp)?',
+                    re.IGNORECASE)
+HCP_LIST_RE = re.compile(r'(\d{1,2})(?:\s*[-–]\s*(\d{1,2})|(\+))?')
+# "Gd 8 – bad 11" is the range 8–11
+HCP_GRADE_RE = re.compile(r'\b(?:gd|good|bad|poor|weak|strong)\s+(?=\d)', re.IGNORECASE)
+BALANCED_RE = re.compile(r'(?<![-\w])(un)?bal(?:anced)?\b', re.IGNORECASE)
+SHORTNESS_RE = re.compile(r'\b(spl|splinter|stiff|sing|singleton|void|shortness)\b', re.IGNORECASE)
+
+
+class Constraint:
+    """What a call promises about the bidder's hand; ranges are inclusive"""
+
+    def __init__(self):
+        self.hcp = [0, MAX_HCP]
+        self.lengths = [[0, 13] for _ in SUITS]
+        self.balanced: Optional[bool] = None
+        self.shortest = [0, 4]  # length of the shortest suit
+        self.major = 0  # minimum length of the longer major
+        self.minor = 0
+
+    def copy(self) -> 'Constraint':
+        other = Constraint()
+        other.hcp = list(self.hcp)
+        other.lengths = [list(bounds) for bounds in self.lengths]
+        other.balanced = self.balanced
+        other.shortest = list(self.shortest)
+        other.major = self.major
+        other.minor = self.minor
+        return other
+
+    def constrained(self) -> bool:
+        return self != Constraint()
+
+    def __eq__(self, other):
+        return isinstance(other, Constraint) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def key(self):
+        return (tuple(self.hcp), tuple(map(tuple, self.lengths)), self.balanced,
+                tuple(self.shortest), self.major, self.minor)
+
+    def intersect(self, other: 'Constraint') -> 'Constraint':
+        """Both constraints at once (a hand that made both calls)"""
+        result = self.copy()
+        result.hcp = [max(self.hcp[0], other.hcp[0]), min(self.hcp[1], other.hcp[1])]
+        result.lengths = [[max(a[0], b[0]), min(a[1], b[1])] for a, b in zip(self.lengths, other.lengths)]
+        if result.balanced is None:
+            result.balanced = other.balanced
+        elif other.balanced is not None and other.balanced != result.balanced:
+            result.hcp = [1, 0]  # contradictory: matches nothing
+        result.shortest = [max(self.shortest[0], other.shortest[0]), min(self.shortest[1], other.shortest[1])]
+        result.major = max(self.major, other.major)
+        result.minor = max(self.minor, other.minor)
+        return result
+
+    def hull(self, other: 'Constraint') -> 'Constraint':
+        """Smallest constraint admitting either (alternatives: "12-14 or 18+")"""
+        result = self.copy()
+        result.hcp = [min(self.hcp[0], other.hcp[0]), max(self.hcp[1], other.hcp[1])]
+        result.lengths = [[min(a[0], b[0]), max(a[1], b[1])] for a, b in zip(self.lengths, other.lengths)]
+        result.balanced = self.balanced if self.balanced == other.balanced else None
+        result.shortest = [min(self.shortest[0], other.shortest[0]), max(self.shortest[1], other.shortest[1])]
+        result.major = min(self.major, other.major)
+        result.minor = min(self.minor, other.minor)
+        return result
+
+    def hull_stated(self, other: 'Constraint') -> 'Constraint':
+        """Hull, except that a side saying nothing about HCP ("4h, 3d, 5c") leaves the other's HCP range"""
+        result = self.hull(other)
+        if self.hcp == [0, MAX_HCP] or other.hcp == [0, MAX_HCP]:
+            result.hcp = list(other.hcp if self.hcp == [0, MAX_HCP] else self.hcp)
+        return result
+
+    def set_length(self, suit: int, low: int, high: int):
+        bounds = self.lengths[suit]
+        bounds[0], bounds[1] = max(bounds[0], low), min(bounds[1], high)
+
+    def matches(self, lengths: Sequence[int], hcp: int) -> bool:
+        return self.hcp[0] <= hcp <= self.hcp[1] and self.admits_shape(lengths)
+
+    def admits_shape(self, lengths: Sequence[int]) -> bool:
+        for length, (low, high) in zip(lengths, self.lengths):
+            if not low <= length <= high:
+                return False
+        shortest = min(lengths)
+        if not self.shortest[0] <= shortest <= self.shortest[1]:
+            return False
+        if self.balanced is not None and is_balanced(lengths) != self.balanced:
+            return False
+        return max(lengths[0], lengths[1]) >= self.major and max(lengths[2], lengths[3]) >= self.minor
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Only the constrained fields, e.g. {'hcp': [12, 14], 'balanced': True}"""
+        result: Dict[str, Any] = {}
+        if self.hcp != [0, MAX_HCP]:
+            result['hcp'] = self.hcp
+        lengths = {suit: bounds for suit, bounds in zip(SUITS, self.lengths) if bounds != [0, 13]}
+        if lengths:
+            result['lengths'] = lengths
+        if self.balanced is not None:
+            result['balanced'] = self.balanced
+        if self.shortest != [0, 4]:
+            result['shortest'] = self.shortest
+        if self.major:
+            result['major'] = self.major
+        if self.minor:
+            result['minor'] = self.minor
+        return result
+
+    def describe(self) -> str:
+        """"12-14 HCP, 5+c, 4h" style summary"""
+        parts = []
+        low, high = self.hcp
+        if (low, high) != (0, MAX_HCP):
+            parts.append(f'{low}+ HCP' if high == MAX_HCP else f'{low}-{high} HCP' if low else f'<{high + 1} HCP')
+        for suit, (low, high) in zip(SUITS, self.lengths):
+            if (low, high) == (0, 13):
+                continue
+            parts.append(f'{low}{suit}' if low == high else f'{low}+{suit}' if high == 13 else
+                         f'<{high + 1}{suit}' if not low else f'{low}-{high}{suit}')
+        if self.major:
+            parts.append(f'{self.major}+M')
+        if self.minor:
+            parts.append(f'{self.minor}+m')
+        if self.balanced is not None:
+            parts.append('balanced' if self.balanced else 'unbalanced')
+        if self.shortest[1] < 2:
+            parts.append('void' if self.shortest[1] == 0 else 'singleton or void')
+        elif self.shortest[0] >= 2 and not self.balanced:
+            parts.append('no singleton')
+        return ', '.join(parts)
+
+
+def is_balanced(lengths: Sequence[int]) -> bool:
+    """4333, 4432 and 5332"""
+    return min(lengths) >= 2 and max(lengths) <= 5 and sum(1 for length in lengths if length == 2) <= 1
+
+
+def parse_hand(text: str) -> Tuple[Tuple[int, int, int, int], int]:
+    """"♠A432 ♥2 ♦KJ987 ♣432" or "A432.2.KJ987.432" -> ((spades, hearts, diamonds, clubs), HCP)"""
+    text = text.strip()
+    if any(symbol in text for symbol in HAND_SYMBOLS):
+        holdings = {suit: '' for suit in SUITS}
+        for symbol, cards in HAND_SUIT_RE.findall(text):
+            holdings[HAND_SYMBOLS[symbol]] += cards
+    else:
+        parts = text.split('.')
+        if len(parts) != 4:
+            raise ValueError(f'Not a hand: {text!r} (write ♠A432 ♥2 ♦KJ987 ♣432 or A432.2.KJ987.432)')
+        holdings = dict(zip(SUITS, parts))
+
+    lengths, hcp = [], 0
+    for suit in SUITS:
+        cards = re.sub(r'[\s\-—–]', '', holdings[suit].upper()).replace('10', 'T')
+        if any(card not in RANKS + 'X' for card in cards):
+            raise ValueError(f'Unknown card in {suit}: {holdings[suit].strip()!r}')
+        ranks = cards.replace('X', '')
+        if len(set(ranks)) != len(ranks):
+            raise ValueError(f'Card repeated in {suit}: {holdings[suit].strip()!r}')
+        lengths.append(len(cards))
+        hcp += sum(CARD_POINTS.get(card, 0) for card in cards)
+    if sum(lengths) != 13:
+        raise ValueError(f'A hand has 13 cards, not {sum(lengths)}')
+    return tuple(lengths), hcp
+
+
+def parse_hcp(text: str) -> Optional[Tuple[int, int]]:
+    """"12-14" -> (12, 14); "18+" -> (18, 37); "18/19" -> (18, 19); "4-5/15+" -> (4, 37); "<10" -> (0, 9)"""
+    text = text.strip()
+    if text.startswith('<'):
+        return 0, int(text[1:].strip()) - 1
+    low, high = None, None
+    for match in HCP_LIST_RE.finditer(text):
+        first = int(match.group(1))
+        last = MAX_HCP if match.group(3) else int(match.group(2) or first)
+        if last < first:
+            return None
+        low = first if low is None else min(low, first)
+        high = last if high is None else max(high, last)
+    if low is None or high > MAX_HCP:
+        return None
+    return low, high
+
+
+def parse_clause(clause: str, binding: Dict[str, str], constraint: Constraint,
+                 pair: Optional[Tuple[str, str]] = None):
+    """Add what one clause ("5+c", "no 4M", "12-14", "bal") says to constraint
+
+    pair holds the suits of a "5s4h" elsewhere in the description; bare pairs of lengths
+    ("55/65") are lengths in those two suits, either way round.
+    """
+    for match in SHAPE_RE.finditer(clause):
+        less, count, plus, card, strain = match.groups()
+        count = int(count)
+        before = clause[:match.start()]
+        # "Puppet to 2d", "bid 3c": calls, not lengths; bare "3h" is as likely a call as a length
+        if CALL_CONTEXT_RE.search(before) or count > 13 or not (plus or less or card or count >= 4):
+            continue
+        strain = SUIT_WORDS.get(strain.lower().rstrip('s'), strain)
+        strain = binding.get(strain, strain) if strain in ('M', 'OM', 'm', 'om') else strain.lower() \
+            if strain.lower() in SUIT_INDEX else strain
+        negated = bool(NEGATION_RE.search(before))
+        if less:
+            low, high = 0, count - 1
+        elif negated:
+            low, high = 0, count - 1
+        else:
+            low, high = count, 13 if plus else count
+        if strain in SUIT_INDEX:
+            constraint.set_length(SUIT_INDEX[strain], low, high)
+        elif strain in ('M', 'OM', 'm', 'om'):
+            group = MAJORS if strain in ('M', 'OM') else MINORS
+            if high < 13 and not low:
+                # "no 4M": neither major has four
+                for suit in group:
+                    constraint.set_length(suit, 0, high)
+            elif group is MAJORS:
+                constraint.major = max(constraint.major, low)
+            else:
+                constraint.minor = max(constraint.minor, low)
+    text = HCP_GRADE_RE.sub('', SHAPE_RE.sub(' ', clause))
+
+    for match in BARE_PAIRS_RE.finditer(text):
+        if pair is None or CALL_CONTEXT_RE.search(text[:match.start()]) or NEGATION_RE.search(text[:match.start()]):
+            continue
+        counts = [int(c) for c in re.sub(r'\D', '', match.group(1))]
+        for strain in pair:
+            constraint.set_length(SUIT_INDEX[strain], min(counts), max(counts))
+    text = BARE_PAIRS_RE.sub(' ', text)
+
+    for match in HCP_RE.finditer(text):
+        if CALL_CONTEXT_RE.search(text[:match.start()]):
+            continue
+        term = match.group(1)
+        if not match.group(2) and not any(c in term for c in '-–+/<'):
+            continue  # a bare number ("64 hands", "Gd 8") is not an HCP range
+        bounds = parse_hcp(term)
+        if bounds:
+            constraint.hcp = [max(constraint.hcp[0], bounds[0]), min(constraint.hcp[1], bounds[1])]
+
+    for match in BALANCED_RE.finditer(clause):
+        if not clause[max(0, match.start() - 5):match.start()].lower().endswith('semi-'):
+            constraint.balanced = not match.group(1)
+    for match in SHORTNESS_RE.finditer(clause):
+        if NEGATION_RE.search(clause[:match.start()]):
+            constraint.shortest[0] = max(constraint.shortest[0], 2)
+        else:
+            constraint.shortest[1] = min(constraint.shortest[1], 0 if match.group(1).lower() == 'void' else 1)
+
+
+def parse_constraint(text: Optional[str], binding: Optional[Dict[str, str]] = None) -> Constraint:
+    """What a description promises; alternatives widen ("12-14 or 18+" is 12+), unknown words don't constrain"""
+    binding = binding or {}
+    result = None
+    text = (text or '').translate(SUIT_LETTERS)
+    pair = SUIT_PAIR_RE.search(text)
+    for alternative in TOP_ALTERNATIVE_RE.split(text):
+        constraint = Constraint()
+        for clause in CLAUSE_RE.split(alternative):
+            clause = QUALIFIER_RE.split(clause, 1)[0]
+            if not clause.strip():
+                continue
+            if ' with ' in clause and re.match(r'\s*(?:no|denies|without)\b', clause, re.IGNORECASE):
+                continue  # "denies 3h with side singleton": a compound denial
+            options = None
+            for option_text in ALTERNATIVE_RE.split(clause):
+                option = Constraint()
+                parse_clause(option_text, binding, option, pair.groups() if pair else None)
+                options = option if options is None else options.hull(option)
+            constraint = constraint.intersect(options)
+        result = constraint if result is None else result.hull(constraint)
+    return result or Constraint()
+
+
+def row_constraint(row: Dict[str, Any], binding: Dict[str, str]) -> Constraint:
+    """Structured hcp/shape fields when the row has them, the description otherwise"""
+    if row.get('hcp') or row.get('shape'):
+        constraint = Constraint()
+        bounds = parse_hcp(row['hcp']) if row.get('hcp') else None
+        if bounds:
+            constraint.hcp = list(bounds)
+        return constraint.intersect(parse_constraint(row.get('shape'), binding))
+    return parse_constraint(row.get('description'), binding)
+
+
+class ConstraintTable:
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []  # auction, vulnerability, player, own, constraint, entries
+        self.constraints: List[Constraint] = []
+        self.by_auction: Dict[bytes, List[int]] = {}  # packed auction -> rows
+        self._class_rows: Dict[int, Tuple[int, ...]] = {}  # lazily filled without NumPy
+        self.class_matrix = None  # NumPy: bool [CLASS_COUNT, rows]
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> 'ConstraintTable':
+        """Compile every bid of a parsed data.json document into the table"""
+        trie = AuctionTrie.from_document(document)
+        table = cls()
+        rows: Dict[Tuple[bytes, Optional[str]], Dict[str, Any]] = OrderedDict()
+        for key, entries in trie.auctions():
+            for entry in entries:
+                if 'bid' not in entry:
+                    continue  # a sequence's own title summarizes its page, it doesn't describe a call
+                for auction, binding in expand_placeholders(key):
+                    if not is_legal(auction):
+                        continue
+                    vulnerability = normalize_vulnerability(entry.get('vulnerability'))
+                    row = rows.setdefault((auction, vulnerability), {
+                        'auction': auction, 'vulnerability': vulnerability, 'entries': [], 'own': Constraint(),
+                    })
+                    row['entries'].append(entry)
+                    if not row['own'].constrained():
+                        row['own'] = row_constraint(table._source_row(document, entry), binding)
+        # Every prefix is a call too (the 1c opening itself has no row of its own)
+        auctions = {auction for auction, _ in rows}
+        for auction in list(auctions):
+            for n in range(1, len(auction)):
+                if auction[:n] not in auctions:
+                    auctions.add(auction[:n])
+                    rows[auction[:n], None] = {'auction': auction[:n], 'vulnerability': None,
+                                               'entries': [], 'own': Constraint()}
+        # Packed auctions sort call by call in the order calls outrank each other
+        table._compile(sorted(rows.values(), key=lambda row: (row['auction'], row['vulnerability'] or '')))
+        return table
+
+    @staticmethod
+    def _source_row(document, entry) -> Dict[str, Any]:
+        """The document row an entry was filed from, for its hcp/shape fields"""
+        value: Any = document
+        for part in entry['path'].split('/')[1:]:
+            part = part.replace('~1', '/').replace('~0', '~')
+            value = value[int(part)] if isinstance(value, list) else value.get(part, {})
+        if isinstance(value, dict) and 'bid' in value:
+            return value
+        return {'description': entry.get('description')}
+
+    def _compile(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        for i, row in enumerate(rows):
+            row['player'] = 'opener' if len(row['auction']) % 2 else 'responder'
+            self.by_auction.setdefault(row['auction'], []).append(i)
+
+        # A call that shows nothing definite shows what the same player's next calls say about the hand
+        shown = [row['own'] for row in rows]
+        next_calls: Dict[bytes, List[int]] = {}  # auction -> rows of the same player's next call after it
+        for j, row in enumerate(rows):
+            if len(row['auction']) > 2:
+                next_calls.setdefault(row['auction'][:-2], []).append(j)
+        for i in sorted(range(len(rows)), key=lambda i: -len(rows[i]['auction'])):
+            if shown[i].constrained():
+                continue
+            later = [shown[j] for j in next_calls.get(rows[i]['auction'], ()) if shown[j].constrained()]
+            for constraint in later:
+                shown[i] = constraint if shown[i] is rows[i]['own'] else shown[i].hull_stated(constraint)
+
+        # ... and everything the player's earlier calls promised
+        self.constraints = [None] * len(rows)
+        for i in sorted(range(len(rows)), key=lambda i: len(rows[i]['auction'])):
+            constraint = shown[i]
+            ancestors = self.compatible(rows[i]['auction'][:-2], rows[i]['vulnerability'])
+            if ancestors:
+                earlier = self.constraints[ancestors[0]]
+                for j in ancestors[1:]:
+                    earlier = earlier.hull(self.constraints[j])
+                constraint = constraint.intersect(earlier)
+            self.constraints[i] = constraint
+            rows[i]['constraint'] = constraint
+
+        if numpy is not None:
+            self.class_matrix = self._evaluate_classes()
+
+    def compatible(self, auction: bytes, vulnerability: Optional[str]) -> List[int]:
+        """Rows for an auction that apply at a vulnerability (all of them when it isn't known)"""
+        return [i for i in self.by_auction.get(auction, [])
+                if vulnerability is None or self.rows[i]['vulnerability'] in (None, vulnerability)]
+
+    def _evaluate_classes(self):
+        """Every row against every (shape, HCP) class at once: shape and HCP tests are independent"""
+        c = self.constraints
+        lengths = numpy.array(SHAPES, dtype=numpy.int8)[:, None, :]  # [shapes, 1, suits]
+        shortest = lengths.min(axis=2)
+        balanced = (shortest >= 2) & (lengths.max(axis=2) <= 5) & ((lengths == 2).sum(axis=2) <= 1)
+        major = lengths[:, :, list(MAJORS)].max(axis=2)
+        minor = lengths[:, :, list(MINORS)].max(axis=2)
+        len_min = numpy.array([[bounds[0] for bounds in x.lengths] for x in c], dtype=numpy.int8).reshape(-1, 4)
+        len_max = numpy.array([[bounds[1] for bounds in x.lengths] for x in c], dtype=numpy.int8).reshape(-1, 4)
+        bal = numpy.array([-1 if x.balanced is None else int(x.balanced) for x in c], dtype=numpy.int8)
+        shape_ok = ((lengths >= len_min) & (lengths <= len_max)).all(axis=2)  # [shapes, rows]
+        shape_ok &= (shortest >= numpy.array([x.shortest[0] for x in c])) & \
+            (shortest <= numpy.array([x.shortest[1] for x in c]))
+        shape_ok &= (bal < 0) | (balanced == (bal == 1))
+        shape_ok &= (major >= numpy.array([x.major for x in c])) & (minor >= numpy.array([x.minor for x in c]))
+
+        hcp = numpy.arange(HCP_LEVELS)[:, None]
+        hcp_ok = (hcp >= numpy.array([x.hcp[0] for x in c])) & (hcp <= numpy.array([x.hcp[1] for x in c]))
+        return (shape_ok[:, None, :] & hcp_ok[None, :, :]).reshape(CLASS_COUNT, len(c))
+
+    def class_rows(self, class_id: int) -> Tuple[int, ...]:
+        """Indexes of the rows a (shape, HCP) class matches"""
+        if self.class_matrix is not None:
+            return tuple(numpy.flatnonzero(self.class_matrix[class_id]).tolist())
+        rows = self._class_rows.get(class_id)
+        if rows is None:
+            lengths, hcp = SHAPES[class_id // HCP_LEVELS], class_id % HCP_LEVELS
+            rows = tuple(i for i, constraint in enumerate(self.constraints) if constraint.matches(lengths, hcp))
+            self._class_rows[class_id] = rows
+        return rows
+
+    def classify(self, hand, vulnerability: Optional[str] = None) -> Dict[str, Any]:
+        """Opening, responses and rebids a hand (text or (lengths, HCP)) makes"""
+        text = hand if isinstance(hand, str) else None
+        lengths, hcp = parse_hand(hand) if text is not None else (tuple(hand[0]), hand[1])
+        vulnerability = normalize_vulnerability(vulnerability)
+        result: Dict[str, Any] = {
+            'hand': {'lengths': dict(zip(SUITS, lengths)), 'hcp': hcp, 'balanced': is_balanced(lengths)},
+            'vulnerability': vulnerability, 'opening': [], 'responses': [], 'rebids': [],
+        }
+        if text is not None:
+            result['hand']['text'] = text
+        for i in self.class_rows(class_id(lengths, hcp)):
+            row = self.rows[i]
+            if vulnerability and row['vulnerability'] not in (None, vulnerability):
+                continue
+            group = 'opening' if len(row['auction']) == 1 else 'responses' if len(row['auction']) == 2 else 'rebids'
+            result[group].append(self.describe_row(i))
+        return result
+
+    def describe_row(self, i: int) -> Dict[str, Any]:
+        row = self.rows[i]
+        description = next((e['description'] for e in row['entries'] if e.get('description')), None)
+        return {
+            'auction': list(unpack(row['auction'])), 'bid': auction_text(row['auction']),
+            'vulnerability': row['vulnerability'], 'player': row['player'],
+            'description': description or row['constraint'].describe(),
+            'constraint': row['constraint'].to_dict(),
+            'sources': [{'id': e['id'], 'path': e['path']} for e in row['entries']],
+        }
+
+    def classify_batch(self, lengths, hcp) -> List[Tuple[int, ...]]:
+        """Row indexes each hand matches; lengths is [hands][spades, hearts, diamonds, clubs]"""
+        return [self.class_rows(i) for i in class_ids(lengths, hcp)]
+
+    def match_matrix(self, lengths, hcp):
+        """NumPy bool [hands, rows]: which rows each hand matches"""
+        if self.class_matrix is None:
+            raise RuntimeError('match_matrix needs NumPy; use classify_batch')
+        return self.class_matrix[class_ids(lengths, hcp)]
+
+    def row_counts(self, lengths, hcp) -> List[int]:
+        """How many of the hands match each row"""
+        ids = class_ids(lengths, hcp)
+        if self.class_matrix is not None:
+            histogram = numpy.bincount(ids, minlength=CLASS_COUNT)
+            return (histogram @ self.class_matrix).tolist()
+        counts = [0] * len(self.rows)
+        histogram: Dict[int, int] = {}
+        for class_id_ in ids:
+            histogram[class_id_] = histogram.get(class_id_, 0) + 1
+        for class_id_, n in histogram.items():
+            for i in self.class_rows(class_id_):
+                counts[i] += n
+        return counts
+
+    def class_counts(self) -> List[int]:
+        """How many (shape, HCP) classes each row admits: the fewer, the more specific the bid"""
+        if self.class_matrix is not None:
+            return self.class_matrix.sum(axis=0).tolist()
+        return [sum(1 for shape in SHAPES if constraint.admits_shape(shape)) *
+                max(0, min(constraint.hcp[1], MAX_HCP) - constraint.hcp[0] + 1) for constraint in self.constraints]
+
+    def summary(self) -> Dict[str, Any]:
+        constrained = sum(1 for constraint in self.constraints if constraint.constrained())
+        return {'rows': len(self.rows), 'constrained': constrained, 'vectorized': self.class_matrix is not None}
+
+
+def class_id(lengths: Sequence[int], hcp: int) -> int:
+    """(shape, HCP) class of a hand; ValueError unless the lengths add up to 13 and 0 <= HCP <= 37"""
+    shape = SHAPE_IDS.get(tuple(lengths))
+    if shape is None:
+        raise ValueError(f'Not a 13-card shape: {tuple(lengths)}')
+    if not 0 <= hcp <= MAX_HCP:
+        raise ValueError(f'HCP must be 0-{MAX_HCP}, not {hcp}')
+    return shape * HCP_LEVELS + hcp
+
+
+SHAPE_LOOKUP = None  # NumPy: [spades, hearts, diamonds] -> shape id
+
+
+def class_ids(lengths, hcp):
+    """(shape, HCP) class of every hand; a NumPy array when NumPy is available"""
+    global SHAPE_LOOKUP
+    if numpy is None:
+        return [class_id(hand, points) for hand, points in zip(lengths, hcp)]
+    if SHAPE_LOOKUP is None:
+        lookup = numpy.full((14, 14, 14), -1, dtype=numpy.int32)
+        for i, (s, h, d, _) in enumerate(SHAPES):
+            lookup[s, h, d] = i
+        SHAPE_LOOKUP = lookup
+    lengths, hcp = numpy.asarray(lengths), numpy.asarray(hcp)
+    if lengths.ndim != 2 or lengths.shape[1] != 4 or hcp.shape != lengths.shape[:1]:
+        raise ValueError('Give [hands][spades, hearts, diamonds, clubs] lengths and one HCP per hand')
+    # SHAPE_LOOKUP would read -1 (the last row) for a shape that isn't one
+    bad = numpy.flatnonzero((lengths < 0).any(axis=1) | (lengths.sum(axis=1) != 13))
+    if bad.size:
+        raise ValueError(f'Hand {bad[0]}: not a 13-card shape: {tuple(lengths[bad[0]].tolist())}')
+    bad = numpy.flatnonzero((hcp < 0) | (hcp > MAX_HCP))
+    if bad.size:
+        raise ValueError(f'Hand {bad[0]}: HCP must be 0-{MAX_HCP}, not {hcp[bad[0]]}')
+    return SHAPE_LOOKUP[lengths[:, 0], lengths[:, 1], lengths[:, 2]] * HCP_LEVELS + hcp
+
+
+def iter_hands(lines: Iterable[str]):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Show which bids of the system a hand makes')
+    parser.add_argument('hands', nargs='*', help='Hands like "♠A432 ♥2 ♦KJ987 ♣432" or A432.2.KJ987.432 '
+                                                 '(default: one per line on stdin)')
+    parser.add_argument('--document', '-d', default='data.json', help='System document (default: data.json)')
+    parser.add_argument('--vul', choices=['nv', 'vul'], help='Only bids for this vulnerability')
+    parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+    args = parser.parse_args()
+
+    with open(args.document, 'r', encoding='utf-8') as f:
+        table = ConstraintTable.from_document(json.load(f))
+    summary = table.summary()
+    print(f"{summary['rows']} bid(s), {summary['constrained']} with hand constraints"
+          f"{'' if summary['vectorized'] else ' (NumPy not installed: classes evaluated on demand)'}",
+          file=sys.stderr)
+
+    for hand in args.hands or iter_hands(sys.stdin):
+        try:
+            result = table.classify(hand, args.vul)
+        except ValueError as e:
+            print(f'{hand}: {e}', file=sys.stderr)
+            continue
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+            continue
+        shape = ''.join(str(n) for n in result['hand']['lengths'].values())
+        print(f"{hand}  ({result['hand']['hcp']} HCP, {shape})")
+        for group in ('opening', 'responses', 'rebids'):
+            for match in result[group]:
+                vul = f" ({match['vulnerability']})" if match['vulnerability'] else ''
+                label = group if group == 'opening' else group[:-1]
+                description = f": {match['description']}" if match['description'] else ''
+                print(f"  {label:9} {match['bid']}{vul}{description}")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+JSON Patch (RFC 6902) for bridge system documents
+
+Patches are applied in place, touching only the nodes they address. Each
+operation records its inverse so a failing patch is rolled back without
+copying the document, and callers can keep the inverse for undo. Values are
+copied as they enter and leave the document, so a patch or inverse kept by
+the caller never shares objects with the document a later patch edits.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+
+class JsonPatchError(ValueError):
+    """A patch is malformed or does not apply to the document"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Split a JSON Pointer (RFC 6901) into unescaped reference tokens"""
+    if not isinstance(pointer, str):
+        raise JsonPatchError(f'Pointer must be a string: {pointer!r}')
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise JsonPatchError(f'Pointer must start with "/": {pointer}')
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def format_pointer(tokens: List[str]) -> str:
+    return ''.join('/' + str(token).replace('~', '~0').replace('/', '~1') for token in tokens)
+
+
+def _array_index(container: list, token: str, pointer: str, allow_end: bool) -> int:
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise JsonPatchError(f'Invalid array index "{token}" in {pointer}')
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f'Array index out of range in {pointer}')
+    return index
+
+
+def resolve(document: Any, pointer: str) -> Any:
+    """Value at pointer"""
+    value = document
+    for token in parse_pointer(pointer):
+        if isinstance(value, dict):
+            if token not in value:
+                raise JsonPatchError(f'Path not found: {pointer}')
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_array_index(value, token, pointer, allow_end=False)]
+        else:
+            raise JsonPatchError(f'Path not found: {pointer}')
+    return value
+
+
+def _parent(document: Any, pointer: str) -> Tuple[Any, str]:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise JsonPatchError('Operations on the whole document are not supported')
+    return resolve(document, format_pointer(tokens[:-1])), tokens[-1]
+
+
+def _add(document, pointer, value) -> Dict[str, Any]:
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        if token in parent:
+            old = parent[token]
+            parent[token] = _deep_copy(value)
+            return {'op': 'replace', 'path': pointer, 'value': _deep_copy(old)}
+        parent[token] = _deep_copy(value)
+        return {'op': 'remove', 'path': pointer}
+    if isinstance(parent, list):
+        index = _array_index(parent, token, pointer, allow_end=True)
+        parent.insert(index, _deep_copy(value))
+        return {'op': 'remove', 'path': format_pointer(parse_pointer(pointer)[:-1] + [str(index)])}
+    raise JsonPatchError(f'Cannot add to a scalar at {pointer}')
+
+
+def _remove(document, pointer) -> Dict[str, Any]:
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f'Path not found: {pointer}')
+        old = parent.pop(token)
+    elif isinstance(parent, list):
+        old = parent.pop(_array_index(parent, token, pointer, allow_end=False))
+    else:
+        raise JsonPatchError(f'Path not found: {pointer}')
+    return {'op': 'add', 'path': pointer, 'value': _deep_copy(old)}
+
+
+def _replace(document, pointer, value) -> Dict[str, Any]:
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f'Path not found: {pointer}')
+    elif isinstance(parent, list):
+        token = _array_index(parent, token, pointer, allow_end=False)
+    else:
+        raise JsonPatchError(f'Path not found: {pointer}')
+    old = parent[token]
+    parent[token] = _deep_copy(value)
+    return {'op': 'replace', 'path': pointer, 'value': _deep_copy(old)}
+
+
+def check_operation(operation):
+    """Raise JsonPatchError unless an operation is well-formed (whether it applies is checked later)"""
+    if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+        raise JsonPatchError(f'Operation needs "op" and "path": {operation!r}')
+    op = operation['op']
+    if not isinstance(op, str):
+        raise JsonPatchError(f'"op" must be a string: {op!r}')
+    if not isinstance(operation['path'], str):
+        raise JsonPatchError(f'"path" must be a string: {operation["path"]!r}')
+    if op in ('add', 'replace', 'test') and 'value' not in operation:
+        raise JsonPatchError(f'"{op}" needs a "value"')
+    if op in ('move', 'copy'):
+        if 'from' not in operation:
+            raise JsonPatchError(f'"{op}" needs a "from"')
+        if not isinstance(operation['from'], str):
+            raise JsonPatchError(f'"from" must be a string: {operation["from"]!r}')
+
+
+def _apply_operation(document, operation) -> List[Dict[str, Any]]:
+    """Apply one operation; return the inverse operations in the order they must be undone"""
+    check_operation(operation)
+    op, path = operation['op'], operation['path']
+
+    if op == 'add':
+        return [_add(document, path, operation['value'])]
+    if op == 'remove':
+        return [_remove(document, path)]
+    if op == 'replace':
+        return [_replace(document, path, operation['value'])]
+    if op == 'test':
+        if resolve(document, path) != operation['value']:
+            raise JsonPatchError(f'Test failed at {path}')
+        return []
+    if op == 'copy':
+        value = resolve(document, operation['from'])
+        return [_add(document, path, value)]
+    if op == 'move':
+        source = operation['from']
+        if path != source and path.startswith(source + '/'):
+            raise JsonPatchError(f'Cannot move {source} into its own child {path}')
+        value = resolve(document, source)
+        undo_remove = _remove(document, source)
+        try:
+            undo_add = _add(document, path, value)
+        except JsonPatchError:
+            _undo(document, [undo_remove])
+            raise
+        return [undo_add, undo_remove]
+    raise JsonPatchError(f'Unknown operation "{op}"')
+
+
+def _deep_copy(value):
+    if isinstance(value, dict):
+        return {key: _deep_copy(child) for key, child in value.items()}
+    if isinstance(value, list):
+        return [_deep_copy(child) for child in value]
+    return value
+
+
+def _undo(document, inverse: List[Dict[str, Any]]):
+    for operation in inverse:
+        _apply_operation(document, operation)
+
+
+def apply_patch(document: Any, patch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply a patch in place, all or nothing; return the patch that undoes it"""
+    if not isinstance(patch, list):
+        raise JsonPatchError('A JSON Patch must be an array of operations')
+    for operation in patch:
+        check_operation(operation)
+    inverse: List[Dict[str, Any]] = []
+    try:
+        for operation in patch:
+            inverse[:0] = _apply_operation(document, operation)
+    except Exception:
+        # Whatever went wrong, the document is left as it was
+        _undo(document, inverse)
+        raise
+    return inverse
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Streaming parser for "auction: description" system notes
+
+Reads source text one line at a time and yields sections and sequences in the
+schema BridgeContentParser produces, each as soon as it is complete, so memory
+stays proportional to one section plus one sequence however long the notes are.
+
+    1 Club Opening {#1m-opening}: longer clubs or 44 in c and d   <- section title
+    Non support showing responses                                 <- heading
+    1c1d: Walsh; 5+, 7+d any; Opener Rebids                       <- bid line
+    1c1d2n (non vul): 18/19 bal; responder rebids over 1c1d2n     <- vulnerability qualifier
+
+Section titles carry an explicit id anchor ({#id}) or start with '#'. Bid lines
+at the depth of a section's first bid are its responses; deeper lines are filed
+into a sequence per parent auction ("opener-rebids-1c1d"). A trailing
+"Opener rebids ..." clause links the bid to the sequence of rebids after it.
+When the rebids after one auction are split across the notes, each run is
+yielded as a fragment with the same id for the caller to merge.
+"""
+
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from auction_trie import call_sort_key, parse_bid
+from bid_codec import CODES, TOKENS, expand_placeholders, is_concrete, pack, unpack
+
+# "<bid>: <description>"; the bid part holds no colon
+BID_LINE_RE = re.compile(r'^(?P<bid>[^:]+?)\s*:\s*(?P<description>.*)$')
+
+# Section title anchor: "1 Club Opening {#1m-opening}: ..."
+ANCHOR_RE = re.compile(r'\s*\{#(?P<id>[^}\s]+)\}')
+
+# Trailing clause pointing at the rebids that follow: "; Opener rebids on 1c2s", "rebids by responder ..."
+REBIDS_RE = re.compile(r'(?:^|[;,]|\s)\s*(?:(?P<player>opener|responder)\s+rebids|rebids\s+by\s+(?P<by>opener|responder))\b[^;]*$',
+                       re.IGNORECASE)
+
+# A point range standing as a word: "12-14", "18/19 bal", "4s 18+" (not the lengths in "4+c" or "5d4M")
+HCP_RE = re.compile(r'(?<![\w+/–-])(?P<low>\d{1,2})(?:\s*[-–/]\s*(?P<high>\d{1,2})|(?P<plus>\+))(?![\w+/–-])')
+
+# What a shape clause mentions: suit lengths ("5+c", "4M", "5s4h"), suit pairs ("c+h"), long suits,
+# balance and shortness
+SHAPE_RE = re.compile(r'\d\+?\s*(?:OM|[cdhsmM])(?![a-z])|\b[cdhs]\+[cdhs]\b|\blong\s+[cdhs]\b|'
+                      r'\b(?:bal|balanced|spl|splinter|sing|singleton|stiff|void)\b', re.IGNORECASE)
+
+# Clauses about other hands or possibilities rather than the shape this bid shows
+QUALIFIED_RE = re.compile(r'\b(?:can|may|if|unless)\b', re.IGNORECASE)
+
+# Shape words written out in the shape field, as the hand-written data had them
+SHAPE_WORDS = {'bal': 'balanced', 'spl': 'splinter'}
+
+# Lines continuing the previous description start in lower case or with punctuation
+CONTINUATION_START = tuple('(,;/&+–-')
+
+# Ids that links and cross-references use for sections whose notes carry no {#id} anchor
+SECTION_IDS = {'1-club-opening': '1m-opening'}
+
+VULNERABILITY_NAMES = {'nv': 'non-vul', 'vul': 'vul'}
+VULNERABILITY_SUFFIXES = {'nv': '-nv', 'vul': '-vul'}
+
+
+def slugify(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-') or 'general'
+
+
+def is_call(call: str) -> bool:
+    return call_sort_key(call)[0] == 0 or call in ('p', 'x', 'xx')
+
+
+def parse_bid_line(line: str) -> Optional[Tuple[List[List[str]], Optional[str], str]]:
+    """(alternatives, vulnerability, description) for a bid line, or None if the line isn't one"""
+    match = BID_LINE_RE.match(line)
+    if not match:
+        return None
+    alternatives, vulnerability = parse_bid(match.group('bid'))
+    if not all(calls and all(is_call(call) for call in calls) for calls in alternatives):
+        return None
+    return alternatives, vulnerability, match.group('description').strip()
+
+
+def resolve_placeholders(calls: List[str], opening: Optional[str]) -> List[str]:
+    """Bind the placeholders a section's opening decides: 1m1h1s in the 1c section is 1c1h1s
+
+    Calls no binding consistent with the opening pins down (1M after 1m) stay as written.
+    """
+    key = pack(calls)
+    if key is None or is_concrete(key) or opening not in CODES:
+        return calls
+    matches = [concrete for concrete, _ in expand_placeholders(key) if concrete[0] == CODES[opening]]
+    if not matches:
+        return calls
+    return [TOKENS[matches[0][i]] if all(match[i] == matches[0][i] for match in matches) else call
+            for i, call in enumerate(calls)]
+
+
+def player_for(depth: int) -> str:
+    """Who makes the depth-th call of an uncontested auction"""
+    return 'opener' if depth % 2 == 1 else 'responder'
+
+
+def format_bid(alternatives: List[List[str]]) -> str:
+    return '/'.join('-'.join(calls) for calls in alternatives)
+
+
+def clauses(description: str) -> Iterator[str]:
+    """The description's clauses, without a leading name ("Natural reverse: 5c" -> "5c")"""
+    for clause in re.split(r'[;,]', description):
+        name, colon, rest = clause.partition(':')
+        yield (rest if colon and not re.search(r'\d', name) else clause).strip()
+
+
+def extract_hcp(description: str) -> Optional[str]:
+    """The first point range of a description, written low-high ("18/19 bal" -> "18-19")"""
+    for clause in clauses(description):
+        if clause.isdigit() and len(clause) <= 2:
+            return clause
+        match = HCP_RE.search(clause)
+        if match:
+            return f"{match.group('low')}{'+' if match.group('plus') else '-' + match.group('high')}"
+    return None
+
+
+def extract_shape(description: str) -> Optional[str]:
+    """The clauses of a description that describe shape, without point ranges ("4d, 4+c, 12-14" -> "4d, 4+c")"""
+    parts = []
+    for clause in clauses(description):
+        if not SHAPE_RE.search(clause) or QUALIFIED_RE.search(clause):
+            continue
+        clause = HCP_RE.sub('', clause)
+        clause = re.sub(r'\b(bal|spl)\b', lambda match: SHAPE_WORDS[match.group(1).lower()], clause,
+                        flags=re.IGNORECASE)
+        parts.append(' '.join(clause.split()))
+    return ', '.join(parts) or None
+
+
+class LineParser:
+    def __init__(self):
+        self.section: Optional[Dict[str, Any]] = None
+        self.section_depth: Optional[int] = None
+        self.sequence: Optional[Dict[str, Any]] = None
+        self.sequence_key: Optional[Tuple[bytes, str]] = None  # (packed parent auction, id suffix)
+        self.heading: Optional[str] = None
+        self.last_row: Optional[Dict[str, Any]] = None
+        self.order = 0
+        self.opening: Optional[str] = None  # first call of the open section's first bid
+        self.qualified = set()  # packed auctions whose meaning depends on vulnerability
+
+    def feed(self, line: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Consume one source line; yield ('section' | 'sequence', item) for every item it completes"""
+        line = line.strip()
+        if not line:
+            return
+
+        bid = parse_bid_line(line)
+        if bid is not None:
+            yield from self.feed_bid(*bid)
+        elif ANCHOR_RE.search(line) or line.startswith('#'):
+            yield from self.feed_title(line.lstrip('#'))
+        elif self.last_row is not None and (line[0].islower() or line.startswith(CONTINUATION_START)):
+            self.last_row['description'] = f"{self.last_row['description']} {line}".strip()
+        else:
+            self.feed_heading(line)
+
+    def feed_title(self, text: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Start a new section ("Title {#id}: subtitle"), completing everything open"""
+        anchor = ANCHOR_RE.search(text)
+        yield from self._close_sequence()
+        yield from self._close_section()
+        self._open_section(ANCHOR_RE.sub('', text).strip(), anchor.group('id') if anchor else None)
+
+    def feed_heading(self, text: str):
+        """Group the bids that follow under a heading"""
+        self.heading = text.strip()
+        self.last_row = None
+
+    def feed_bid(self, alternatives: List[List[str]], vulnerability: Optional[str],
+                 description: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Add a bid given as its alternative call sequences"""
+        yield from self._add_bid(alternatives, vulnerability, description)
+
+    def feed_opaque(self, bid: str, description: str):
+        """Add a row whose bid is not a call sequence ("rest", "ask bid") to the open group"""
+        row = {'bid': bid, 'description': description.rstrip(' ;'), 'reference': None}
+        if self.sequence is not None:
+            group = self._group(self.sequence['categories'], 'bids', self.sequence['title'])
+        elif self.section is not None:
+            group = self._group(self.section['content']['subsections'], 'responses', self.section['title'])
+            row['type'] = 'terminal'
+        else:
+            return
+        group.append(row)
+        self.last_row = row
+
+    def feed_chunk(self, lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for line in lines:
+            yield from self.feed(line)
+
+    def close(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield whatever is still open at the end of the input"""
+        yield from self._close_sequence()
+        yield from self._close_section()
+
+    def checkpoint(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield the open section and sequence as fragments and carry on in empty copies of them
+
+        Afterwards state() is small and describes everything later lines depend on.
+        """
+        if self.sequence is not None:
+            yield 'sequence', self.sequence
+            self.sequence = dict(self.sequence, categories={})
+        if self.section is not None:
+            yield 'section', self.section
+            self.section = dict(self.section, content=dict(self.section['content'], subsections={}))
+        self.last_row = None
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serializable parser state (call right after checkpoint)"""
+        return {
+            'section': self.section,
+            'section_depth': self.section_depth,
+            'sequence': self.sequence,
+            'sequence_key': [*unpack(self.sequence_key[0]), self.sequence_key[1]]
+            if self.sequence_key is not None else None,
+            'heading': self.heading,
+            'order': self.order,
+            'opening': self.opening,
+            'qualified': sorted(list(unpack(key)) for key in self.qualified),
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        self.section = state['section']
+        self.section_depth = state['section_depth']
+        self.sequence = state['sequence']
+        key = state['sequence_key']
+        self.sequence_key = (pack(key[:-1]), key[-1]) if key is not None else None
+        self.heading = state['heading']
+        self.order = state['order']
+        self.opening = state['opening']
+        self.qualified = {pack(calls) for calls in state['qualified']}
+        self.last_row = None
+
+    def _open_section(self, text: str, section_id: Optional[str]):
+        title, _, subtitle = text.partition(':')
+        self.order += 1
+        self.section = {
+            'id': section_id or SECTION_IDS.get(slugify(title), slugify(title)),
+            'title': title.strip(),
+            'subtitle': subtitle.strip(),
+            'order': self.order,
+            'content': {'overview': text, 'subsections': {}}
+        }
+        self.section_depth = None
+        self.opening = None
+        self.heading = None
+        self.last_row = None
+
+    def _close_section(self):
+        if self.section is not None:
+            yield 'section', self.section
+            self.section = None
+
+    def _close_sequence(self):
+        if self.sequence is not None:
+            yield 'sequence', self.sequence
+            self.sequence = None
+            self.sequence_key = None
+
+    def _add_bid(self, alternatives, vulnerability, description):
+        calls = alternatives[0]
+        if vulnerability:
+            self.qualified.add(pack(self.resolve(calls)))
+
+        reference = None
+        description = description.rstrip(' ;')
+        link = REBIDS_RE.search(description)
+        if link:
+            description = description[:link.start()].rstrip(' ;,')
+            player = (link.group('player') or link.group('by')).lower()
+            reference = (f"{player}-rebids-{''.join(self.resolve(calls))}"
+                         f"{VULNERABILITY_SUFFIXES.get(vulnerability, '')}")
+
+        if self.section is not None and self.section_depth is None:
+            self.section_depth = len(calls)
+            self.opening = calls[0]
+
+        if self.section is not None and len(calls) == self.section_depth:
+            row = {'bid': format_bid(alternatives), 'description': description, 'reference': reference,
+                   'type': 'red-link' if reference else 'terminal'}
+            group = self._group(self.section['content']['subsections'], 'responses', self.section['title'])
+        else:
+            yield from self._sequence_for(calls[:-1], vulnerability)
+            row = {'bid': format_bid(alternatives)}
+            if vulnerability:
+                row['vulnerability'] = VULNERABILITY_NAMES[vulnerability]
+            row['description'] = description
+            row['reference'] = reference
+            hcp = extract_hcp(description)
+            if hcp:
+                row['hcp'] = hcp
+            shape = extract_shape(description)
+            if shape:
+                row['shape'] = shape
+            row['type'] = f'{player_for(len(calls))}-bid'
+            group = self._group(self.sequence['categories'], 'bids', self.sequence['title'])
+        group.append(row)
+        self.last_row = row
+
+    def resolve(self, calls: List[str]) -> List[str]:
+        """calls with the placeholders the open section's opening decides bound"""
+        return resolve_placeholders(calls, self.opening)
+
+    def _sequence_for(self, parent: List[str], vulnerability: Optional[str]):
+        """Make the sequence for rebids after parent the open one, closing the previous one if different"""
+        parent = self.resolve(parent)
+        packed = pack(parent)
+        suffix = VULNERABILITY_SUFFIXES.get(vulnerability, '') if packed in self.qualified else ''
+        key = (packed, suffix)
+        if key == self.sequence_key:
+            return
+        yield from self._close_sequence()
+        player = player_for(len(parent) + 1)
+        self.sequence = {
+            'id': f"{player}-rebids-{''.join(parent)}{suffix}",
+            'title': f"{player.capitalize()} rebids over {'-'.join(parent)}",
+            'auction': list(parent),
+            'player': player,
+            'categories': {}
+        }
+        self.sequence_key = key
+
+    def _group(self, groups: Dict[str, Any], field: str, default_title: str) -> List[Dict[str, Any]]:
+        title = self.heading or default_title
+        group = groups.setdefault(slugify(title), {'title': title, field: []})
+        return group[field]
+
+
+def starts_chunk(line: str) -> bool:
+    """True for title and heading lines, where the bids before and after can be parsed separately"""
+    line = line.strip()
+    return bool(line) and parse_bid_line(line) is None and not (line[0].islower() or line.startswith(CONTINUATION_START))
+
+
+def text_chunks(lines: Iterable[str]) -> Iterator[List[str]]:
+    """Group source lines into chunks, each starting at a title or heading"""
+    chunk: List[str] = []
+    for line in lines:
+        line = line.strip()
+        if chunk and starts_chunk(line):
+            yield chunk
+            chunk = []
+        if line:
+            chunk.append(line)
+    if chunk:
+        yield chunk
+
+
+def parse_lines(lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ('section' | 'sequence', item) pairs from an iterable of source lines (e.g. an open file)"""
+    parser = LineParser()
+    for line in lines:
+        yield from parser.feed(line)
+    yield from parser.close()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Cross-reference graph of a bridge system document
+
+cross_references entries, every links[*].target and every reference field are
+edges from the item they appear in to the id they name. The graph indexes them
+in both directions in one pass over the document, so "what points at
+artificial-reverse?" and "which targets don't exist?" are lookups, not scans.
+"""
+
+import json
+import sys
+from typing import Any, Dict, List
+
+from search_index import COLLECTIONS, escape_pointer
+
+
+class LinkGraph:
+    def __init__(self):
+        self.items: Dict[str, str] = {}  # id -> kind ('section', 'sequence', 'definition')
+        self.outgoing: Dict[str, List[Dict[str, Any]]] = {}
+        self.incoming: Dict[str, List[Dict[str, Any]]] = {}
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> 'LinkGraph':
+        """Collect every edge of a parsed data.json document"""
+        graph = cls()
+        for collection, kind in COLLECTIONS:
+            for item_id in document.get(collection, {}):
+                graph.items.setdefault(item_id, kind)
+
+        for collection, _ in COLLECTIONS:
+            for item_id, item in document.get(collection, {}).items():
+                graph._add_item(item_id, f'/{collection}/{escape_pointer(item_id)}', item)
+        for source, targets in document.get('cross_references', {}).items():
+            for i, target in enumerate(targets):
+                graph._add_edge(source, target, f'/cross_references/{escape_pointer(source)}/{i}', 'cross_reference')
+        return graph
+
+    def _add_item(self, item_id: str, pointer: str, item: Any):
+        # Iterative walk: the rows of a big sequence nest several levels deep
+        stack = [(pointer, item)]
+        while stack:
+            pointer, value = stack.pop()
+            if isinstance(value, dict):
+                if isinstance(value.get('reference'), str) and value['reference']:
+                    self._add_edge(item_id, value['reference'], f'{pointer}/reference', 'reference')
+                for i, link in enumerate(value.get('links') or []):
+                    if isinstance(link, dict) and link.get('target'):
+                        self._add_edge(item_id, link['target'], f'{pointer}/links/{i}/target', 'link',
+                                       link.get('type'), link.get('text'))
+                children = ((f'{pointer}/{escape_pointer(key)}', child) for key, child in value.items()
+                            if key != 'links')
+            elif isinstance(value, list):
+                children = ((f'{pointer}/{i}', child) for i, child in enumerate(value))
+            else:
+                continue
+            stack.extend(child for child in children if isinstance(child[1], (dict, list)))
+
+    def _add_edge(self, source: str, target: str, pointer: str, kind: str, link_type=None, text=None):
+        edge = {'source': source, 'target': target, 'kind': kind, 'pointer': pointer}
+        if link_type:
+            edge['type'] = link_type
+        if text:
+            edge['text'] = text
+        self.outgoing.setdefault(source, []).append(edge)
+        self.incoming.setdefault(target, []).append(edge)
+
+    def dangling(self) -> List[Dict[str, Any]]:
+        """Edges whose target is no section, sequence or definition, sorted by where they are written"""
+        edges = [edge for target, edges in self.incoming.items() if target not in self.items for edge in edges]
+        return sorted(edges, key=lambda edge: edge['pointer'])
+
+    def related(self, item_id: str) -> Dict[str, Any]:
+        """What an id links to and what links to it"""
+        return {
+            'id': item_id,
+            'kind': self.items.get(item_id),
+            'outgoing': [dict(edge, exists=edge['target'] in self.items) for edge in self.outgoing.get(item_id, [])],
+            'incoming': self.incoming.get(item_id, []),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'items': len(self.items),
+            'edges': sum(len(edges) for edges in self.outgoing.values()),
+            'dangling': self.dangling(),
+        }
+
+
+def check_links(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Print every dangling edge of a document and return them (empty when all targets exist)"""
+    dangling = LinkGraph.from_document(document).dangling()
+    for edge in dangling:
+        print(f"Dangling {edge['kind']} {edge['source']} -> {edge['target']} at {edge['pointer']}")
+    return dangling
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Check that every cross-reference, link and reference target exists')
+    parser.add_argument('document', nargs='?', default='data.json', help='Document to check (default: data.json)')
+    args = parser.parse_args()
+
+    with open(args.document, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    dangling = check_links(document)
+    print(f"{len(dangling)} dangling target(s) in {args.document}")
+    sys.exit(1 if dangling else 0)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Live updates for open pages over Server-Sent Events
+
+A page subscribes with GET /api/events and keeps the connection open. When
+the system it shows changes (an edit through the API, or the file replaced on
+disk) every subscriber receives one event with the new revision and the
+subtrees that changed, as JSON Patch operations on data.json:
+
+    id: 8
+    event: revision
+    data: {"revision": 8, "base": 7, "changes": [{"op": "replace", "path": "/sections/1m-opening", ...}]}
+
+base is the revision the changes apply to; a page at another revision
+reloads instead. The first event after subscribing has no changes and
+tells the page which revision the next diff will start from.
+
+Subscribed connections are handed over by the request handler and served
+from one thread with a selector: idle streams cost a socket and a buffer,
+not a worker. The same thread watches each subscribed system's file (one
+stat per poll) and sends a comment line now and then so proxies and dead
+peers show up.
+"""
+
+import json
+import os
+import queue
+import selectors
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Seconds between checks of the watched files
+POLL_INTERVAL = 1.0
+
+# Seconds between keep-alive comments on idle streams
+HEARTBEAT_INTERVAL = 20.0
+
+# Milliseconds a browser waits before reconnecting a dropped stream
+RETRY_MS = 3000
+
+# Open streams accepted at once, and unsent bytes a slow reader may fall behind by before it is dropped
+MAX_SUBSCRIBERS = 1000
+MAX_PENDING_BYTES = 4 * 1024 * 1024
+
+
+def format_event(payload: Dict[str, Any], event: str = 'revision') -> bytes:
+    """One Server-Sent Event; the revision doubles as the event id"""
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {payload['revision']}\nevent: {event}\ndata: {data}\n\n".encode('utf-8')
+
+
+class Subscriber:
+    def __init__(self, sock: socket.socket, channel: str):
+        self.sock = sock
+        self.channel = channel
+        self.pending = bytearray()
+        self.closed = False
+
+
+class Channel:
+    """The subscribers of one system and the last revision they were sent"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.subscribers = set()
+        self.stamp = None  # (st_mtime_ns, st_size) of the file at the last check
+        self.revision = None
+        self.shards = None  # Shards of that revision, the base of the next diff
+
+
+class LiveUpdates:
+    """Server-Sent Event streams of document changes, served from one selector thread
+
+    resolve(channel) gives the SystemStore a channel name stands for and raises
+    FileNotFoundError once the system is gone.
+    """
+
+    def __init__(self, resolve: Callable[[str], Any], poll_interval=POLL_INTERVAL,
+                 heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.resolve = resolve
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._wakeup_send.setblocking(False)
+        self._selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        self._arrivals = queue.SimpleQueue()  # subscribers handed over by request handlers
+        self._lock = threading.Lock()
+        self._notified = set()  # channels edited since the last poll
+        self._channels: Dict[str, Channel] = {}
+        self._count = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopped
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='bridge-events', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake()
+
+    def accepts(self) -> bool:
+        """False while MAX_SUBSCRIBERS streams are open"""
+        return self.running and self._count < MAX_SUBSCRIBERS
+
+    def subscribe(self, sock: socket.socket, channel: str):
+        """Take over a connection whose event-stream response headers have been sent"""
+        with self._lock:
+            self._count += 1
+        self._arrivals.put(Subscriber(sock, channel))
+        self._wake()
+
+    def notify(self, channel: str):
+        """A channel's document was edited: check it now rather than at the next poll"""
+        with self._lock:
+            self._notified.add(channel)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeup_send.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # already awake, or shutting down
+
+    def _run(self):
+        next_poll = next_heartbeat = time.monotonic()
+        while not self._stopped:
+            timeout = max(0.0, min(next_poll, next_heartbeat) - time.monotonic())
+            for key, mask in self._selector.select(timeout):
+                if key.fileobj is self._wakeup_recv:
+                    self._drain_wakeups()
+                    continue
+                subscriber = key.data
+                if mask & selectors.EVENT_READ and not subscriber.closed:
+                    self._read(subscriber)
+                if mask & selectors.EVENT_WRITE and not subscriber.closed:
+                    self._write(subscriber)
+            while True:
+                try:
+                    self._attach(self._arrivals.get_nowait())
+                except queue.Empty:
+                    break
+            now = time.monotonic()
+            with self._lock:
+                notified, self._notified = self._notified, set()
+            if now >= next_poll or notified:
+                for name in list(self._channels):
+                    self._poll(name, name in notified)
+                if now >= next_poll:
+                    next_poll = now + self.poll_interval
+            if now >= next_heartbeat:
+                for channel in list(self._channels.values()):
+                    for subscriber in list(channel.subscribers):
+                        self._send(subscriber, b': ping\n\n')
+                next_heartbeat = now + self.heartbeat_interval
+        for channel in list(self._channels.values()):
+            for subscriber in list(channel.subscribers):
+                self._drop(subscriber)
+
+    def _drain_wakeups(self):
+        try:
+            while self._wakeup_recv.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _attach(self, subscriber: Subscriber):
+        try:
+            subscriber.sock.setblocking(False)
+            self._selector.register(subscriber.sock, selectors.EVENT_READ, subscriber)
+        except (OSError, ValueError):
+            self._drop(subscriber)
+            return
+        channel = self._channels.get(subscriber.channel)
+        if channel is None:
+            try:
+                channel = self._snapshot(subscriber.channel)
+            except FileNotFoundError:
+                self._drop(subscriber)
+                return
+            self._channels[subscriber.channel] = channel
+        channel.subscribers.add(subscriber)
+        self._send(subscriber, f'retry: {RETRY_MS}\n'.encode('ascii') +
+                   format_event({'revision': channel.revision, 'base': None, 'changes': None}))
+
+    def _snapshot(self, name: str) -> Channel:
+        store = self.resolve(name)
+        channel = Channel(store.path)
+        channel.revision, channel.shards = store.revision_index('shards')
+        fs = os.stat(store.path)
+        channel.stamp = (fs.st_mtime_ns, fs.st_size)
+        return channel
+
+    def _poll(self, name: str, edited: bool):
+        """Send the changes since the last event if the channel's document has a new revision"""
+        channel = self._channels.get(name)
+        if channel is None:
+            return
+        try:
+            fs = os.stat(channel.path)
+            stamp = (fs.st_mtime_ns, fs.st_size)
+            if stamp == channel.stamp and not edited:
+                return
+            channel.stamp = stamp
+            revision, shards = self.resolve(name).revision_index('shards')
+        except FileNotFoundError:
+            for subscriber in list(channel.subscribers):
+                self._drop(subscriber)
+            return
+        if revision == channel.revision:
+            return
+        event = format_event({'revision': revision, 'base': channel.revision,
+                              'changes': channel.shards.changes(shards)})
+        channel.revision, channel.shards = revision, shards
+        for subscriber in list(channel.subscribers):
+            self._send(subscriber, event)
+
+    def _send(self, subscriber: Subscriber, data: bytes):
+        if len(subscriber.pending) + len(data) > MAX_PENDING_BYTES:
+            # Too far behind; it reconnects and starts again from the current revision
+            self._drop(subscriber)
+            return
+        subscriber.pending += data
+        self._write(subscriber)
+
+    def _write(self, subscriber: Subscriber):
+        try:
+            sent = subscriber.sock.send(subscriber.pending)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._drop(subscriber)
+            return
+        del subscriber.pending[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.pending else 0)
+        if self._selector.get_key(subscriber.sock).events != events:
+            self._selector.modify(subscriber.sock, events, subscriber)
+
+    def _read(self, subscriber: Subscriber):
+        # Clients send nothing after the request; readable means closed (or junk to discard)
+        try:
+            data = subscriber.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        if subscriber.closed:
+            return
+        subscriber.closed = True
+        try:
+            self._selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            subscriber.sock.close()
+        except OSError:
+            pass
+        with self._lock:
+            self._count -= 1
+        channel = self._channels.get(subscriber.channel)
+        if channel is not None:
+            channel.subscribers.discard(subscriber)
+            if not channel.subscribers:
+                # Nobody left to diff for; let the old revision's shards go
+                del self._channels[subscriber.channel]
@@ -6,12 +6,80 @@ Parses the Uma + PS System PDF content and converts it to structured JSON format
 for the interactive bridge reference system.
 """
 
+import functools
 import json
 import re
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, List, Any, Optional
+
+import docx_reader
+from build_cache import BuildCache, write_if_changed
+from line_parser import LineParser, parse_lines, text_chunks
+from link_graph import check_links
+from term_linker import TermLinker, iter_rows, link_document
+
+# A suit letter standing on its own ("5+ s", "4 H") becomes its symbol; letters inside words and bids stay
+SUIT_LETTER_RE = re.compile(r'\b[cdhsCDHS]\b')
+SUIT_SYMBOLS = {
+    'c': '♣', 'C': '♣',
+    'd': '♦', 'D': '♦',
+    'h': '♥', 'H': '♥',
+    's': '♠', 'S': '♠'
+}
+
+# Strings up to this length (bids, short descriptions) are memoized; they repeat throughout a system
+SUIT_CACHE_MAX_LENGTH = 64
+SUIT_CACHE_SIZE = 4096
+
+# Keys whose values are identifiers or styling, never display text
+SUIT_SKIP_KEYS = {'id', 'type', 'cellType', 'target', 'reference', 'category', 'player', 'definitions'}
+
+
+def _suit_symbol(match) -> str:
+    return SUIT_SYMBOLS[match.group()]
+
+
+@functools.lru_cache(maxsize=SUIT_CACHE_SIZE)
+def _convert_suits_cached(text: str) -> str:
+    return SUIT_LETTER_RE.sub(_suit_symbol, text)
+
+
+def convert_suits(text: str) -> str:
+    """Convert suit letters to Unicode symbols in one pass"""
+    if len(text) <= SUIT_CACHE_MAX_LENGTH:
+        return _convert_suits_cached(text)
+    return SUIT_LETTER_RE.sub(_suit_symbol, text)
+
+
+def convert_suits_tree(value: Any, skip_keys=SUIT_SKIP_KEYS) -> Any:
+    """Convert suit letters in every display string of a parsed data tree, in place
+
+    Dict keys and the values of skip_keys (ids, link targets, cell types) are left
+    alone. Walks the tree with an explicit stack, so each node is visited once and
+    deeply nested documents don't hit the recursion limit. Returns value.
+    """
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, child in node.items():
+                if key in skip_keys:
+                    continue
+                if isinstance(child, str):
+                    node[key] = convert_suits(child)
+                elif isinstance(child, (dict, list)):
+                    stack.append(child)
+        elif isinstance(node, list):
+            for i, child in enumerate(node):
+                if isinstance(child, str):
+                    node[i] = convert_suits(child)
+                elif isinstance(child, (dict, list)):
+                    stack.append(child)
+    return value
+
 
 class BridgeContentParser:
-    def __init__(self):
+    def __init__(self, build_cache: Optional[BuildCache] = None):
+        self.build_cache = build_cache  # reuse parses of unchanged source chunks when set
         self.data = {
             "metadata": {
                 "title": "Uma + PS System",
@@ -39,7 +107,7 @@ class BridgeContentParser:
 
         # 1 Club Opening content from PDF
         club_opening_content = """
-        1 Club Opening: longer clubs or 44 in c and d; denies 5M unless strong hands with 6+c and 5M
+        1 Club Opening {#1m-opening}: longer clubs or 44 in c and d; denies 5M unless strong hands with 6+c and 5M
 
         Non support showing responses
         1c1d: Walsh; 5+, 7+d any/ 4+d, no 4M; OR 5d4M, 4-5/15+ or 6d4M, 4-8/15+ ; Opener Rebids
@@ -125,101 +193,42 @@ class BridgeContentParser:
         self.parse_sequences(opener_rebids_content)
         self.parse_definitions(definitions_content)
 
+    def parse_stream(self, lines: Iterable[str]):
+        """Parse "auction: description" source lines (any iterable, e.g. an open file) into the data"""
+        if self.build_cache is not None:
+            items = self.build_cache.parse(LineParser(), text_chunks(lines))
+        else:
+            items = parse_lines(lines)
+        for kind, item in items:
+            self.add_item(kind, item)
+
+    def parse_docx(self, path: str):
+        """Parse sections and sequences from the source .docx (headings, tables of bids)"""
+        if self.build_cache is not None:
+            items = self.build_cache.parse(docx_reader.DocxParser(), docx_reader.docx_chunks(path))
+        else:
+            items = docx_reader.parse_docx(path)
+        for kind, item in items:
+            self.add_item(kind, item)
+
+    def add_item(self, kind: str, item: Dict[str, Any]):
+        """Store a parsed section or sequence; a later fragment with the same id extends the earlier one"""
+        collection = kind + 's'
+        existing = self.data[collection].get(item['id'])
+        if existing is None:
+            self.data[collection][item['id']] = item
+            return
+
+        if kind == 'section':
+            groups, existing_groups, field = item['content']['subsections'], existing['content']['subsections'], 'responses'
+        else:
+            groups, existing_groups, field = item['categories'], existing['categories'], 'bids'
+        for key, group in groups.items():
+            existing_groups.setdefault(key, {'title': group['title'], field: []})[field].extend(group[field])
+
     def parse_sections(self, content: str):
         """Parse main section content"""
-
-        # 1m opening section
-        section = {
-            "id": "1m-opening",
-            "title": "1 Club Opening",
-            "subtitle": "longer clubs or 44 in c and d; denies 5M unless strong hands with 6+c and 5M",
-            "order": 1,
-            "content": {
-                "overview": "1 Club Opening: longer clubs or 44 in c and d; denies 5M unless strong hands with 6+c and 5M",
-                "subsections": {
-                    "non-support-responses": {
-                        "title": "Non support showing responses",
-                        "responses": [
-                            {
-                                "bid": "1c-1d",
-                                "description": "Walsh: 5+, 7+d any/4+d, no 4M; OR 5d4M, 4-5/15+ or 6d4M, 4-8/15+",
-                                "reference": "opener-rebids-1c1d",
-                                "type": "red-link",
-                                "definitions": ["walsh"]
-                            },
-                            {
-                                "bid": "1c-1M",
-                                "description": "5+, 4+M, up the line",
-                                "reference": "opener-rebids-1cM",
-                                "type": "red-link"
-                            },
-                            {
-                                "bid": "1c-2h",
-                                "description": "Reverse Flannery: 5s4h/55/65, inv (Gd 8 – bad 11): (64 hands go via xyz)",
-                                "reference": "opener-rebids-1c2h",
-                                "type": "red-link",
-                                "definitions": ["reverse-flannery"]
-                            },
-                            {
-                                "bid": "1c-2n",
-                                "description": "10/11, no 4M generally denies 4d for 1d2n, nf",
-                                "reference": "opener-rebids-1c2n",
-                                "type": "red-link"
-                            },
-                            {
-                                "bid": "1c-3n",
-                                "description": "12-14, no 4M",
-                                "reference": None,
-                                "type": "terminal"
-                            }
-                        ]
-                    },
-                    "support-responses": {
-                        "title": "Responses with support for m",
-                        "responses": [
-                            {
-                                "bid": "1c-1n",
-                                "description": "4+c, no 4 card M",
-                                "reference": None,
-                                "type": "terminal"
-                            },
-                            {
-                                "bid": "1c-2s",
-                                "description": "5sp, 4+m, inv",
-                                "reference": "opener-rebids-1c2s",
-                                "type": "red-link"
-                            },
-                            {
-                                "bid": "1c-2c",
-                                "description": "Inverted minor: 10+",
-                                "reference": "opener-rebids-1c2c",
-                                "type": "red-link"
-                            },
-                            {
-                                "bid": "1c-3c",
-                                "description": "pre-empt/mixed no stiff",
-                                "reference": None,
-                                "type": "terminal"
-                            },
-                            {
-                                "bid": "1c-2d",
-                                "description": "Mixed with stiff",
-                                "reference": "opener-rebids-1c2d",
-                                "type": "red-link"
-                            },
-                            {
-                                "bid": "1c-3d/1c-3M",
-                                "description": "Spl, 12-14 or 18+, denies 4OM",
-                                "reference": None,
-                                "type": "terminal"
-                            }
-                        ]
-                    }
-                }
-            }
-        }
-
-        self.data["sections"]["1m-opening"] = section
+        self.parse_stream(content.splitlines())
 
         # Add placeholder sections for other main topics
         self.data["sections"]["1m-intervention"] = {
@@ -240,140 +249,7 @@ class BridgeContentParser:
 
     def parse_sequences(self, content: str):
         """Parse detailed sequence content"""
-
-        sequence = {
-            "id": "opener-rebids-1c1d",
-            "title": "Opener rebids over 1c-1d",
-            "auction": ["1c", "1d"],
-            "player": "opener",
-            "categories": {
-                "balanced": {
-                    "title": "Rebids to show balanced hands",
-                    "bids": [
-                        {
-                            "bid": "1c-1d-1n",
-                            "description": "12-14; can have 4M if < 5c",
-                            "reference": "responder-rebids-1c1d1n",
-                            "hcp": "12-14",
-                            "shape": "balanced",
-                            "type": "opener-bid"
-                        },
-                        {
-                            "bid": "1c-1d-2n",
-                            "vulnerability": "non-vul",
-                            "description": "18/19 bal",
-                            "reference": "responder-rebids-1c1d2n-nv",
-                            "hcp": "18-19",
-                            "shape": "balanced",
-                            "type": "opener-bid"
-                        }
-                    ]
-                },
-                "single-suiter-clubs": {
-                    "title": "Rebids to show single suiter clubs",
-                    "bids": [
-                        {
-                            "bid": "1c-1d-2c",
-                            "description": "4+c, 12-14",
-                            "reference": "responder-rebids-1c1d2c",
-                            "hcp": "12-14",
-                            "shape": "4+c",
-                            "type": "opener-bid"
-                        },
-                        {
-                            "bid": "1c-1d-3c",
-                            "description": "6+c, 15-17, nf",
-                            "reference": None,
-                            "hcp": "15-17",
-                            "shape": "6+c",
-                            "type": "opener-bid"
-                        },
-                        {
-                            "bid": "1c-1d-2n",
-                            "vulnerability": "vul",
-                            "description": "long c, 18+, no sing, gf",
-                            "reference": "responder-rebids-1c1d2n-vul",
-                            "hcp": "18+",
-                            "shape": "long c",
-                            "type": "opener-bid"
-                        }
-                    ]
-                },
-                "two-suiter": {
-                    "title": "Rebids to show 2 suiter: c + another",
-                    "bids": [
-                        {
-                            "bid": "1c-1d-1M",
-                            "description": "12-17, 5+c, 4M",
-                            "reference": "responder-rebids-1c1d1M",
-                            "hcp": "12-17",
-                            "shape": "5+c, 4M",
-                            "type": "opener-bid"
-                        },
-                        {
-                            "bid": "1c-1d-2h",
-                            "vulnerability": "non-vul",
-                            "description": "Artificial reverse: c+h/long c; f1",
-                            "reference": "responder-rebids-1c1d2h-nv",
-                            "hcp": "varies",
-                            "shape": "c+h/long c",
-                            "type": "opener-bid",
-                            "definitions": ["artificial-reverse"]
-                        },
-                        {
-                            "bid": "1c-1d-2h",
-                            "vulnerability": "vul",
-                            "description": "Natural reverse: 5c,4h; 18+, gf",
-                            "reference": "responder-rebids-1c1d2h-vul",
-                            "hcp": "18+",
-                            "shape": "5c,4h",
-                            "type": "opener-bid",
-                            "definitions": ["natural-reverse"]
-                        },
-                        {
-                            "bid": "1c-1d-2s",
-                            "description": "Natural reverse: 5c,4s 18+, gf",
-                            "reference": "responder-rebids-1c1d2s",
-                            "hcp": "18+",
-                            "shape": "5c,4s",
-                            "type": "opener-bid",
-                            "definitions": ["natural-reverse"]
-                        }
-                    ]
-                },
-                "diamond-support": {
-                    "title": "Rebids to show support for d",
-                    "bids": [
-                        {
-                            "bid": "1c-1d-2d",
-                            "description": "4d, 4+c, 12-14",
-                            "reference": None,
-                            "hcp": "12-14",
-                            "shape": "4d, 4+c",
-                            "type": "opener-bid"
-                        },
-                        {
-                            "bid": "1c-1d-3d",
-                            "description": "4d, 4+c, 15-17",
-                            "reference": None,
-                            "hcp": "15-17",
-                            "shape": "4d, 4+c",
-                            "type": "opener-bid"
-                        },
-                        {
-                            "bid": "1c-1d-3M",
-                            "description": "Spl for d, 18+; denies 4OM",
-                            "reference": None,
-                            "hcp": "18+",
-                            "shape": "splinter",
-                            "type": "opener-bid"
-                        }
-                    ]
-                }
-            }
-        }
-
-        self.data["sequences"]["opener-rebids-1c1d"] = sequence
+        self.parse_stream(content.splitlines())
 
     def parse_definitions(self, content: str):
         """Parse definitions and concepts"""
@@ -457,37 +333,45 @@ class BridgeContentParser:
 
         # Cross-references
         self.data["cross_references"] = {
-            "1c-opening": ["walsh", "reverse-flannery", "artificial-reverse", "natural-reverse"],
+            "1m-opening": ["walsh", "reverse-flannery", "artificial-reverse", "natural-reverse"],
             "opener-rebids": ["artificial-reverse", "natural-reverse", "super-splinter"],
-            "walsh": ["1c-1d-response"],
-            "artificial-reverse": ["opener-rebids-1c1d", "opener-rebids-1cM"],
-            "natural-reverse": ["opener-rebids-1c1d", "opener-rebids-1cM"]
+            "walsh": ["1m-opening"],
+            "artificial-reverse": ["opener-rebids-1c1d", "opener-rebids-1c1M"],
+            "natural-reverse": ["opener-rebids-1c1d", "opener-rebids-1c1M"]
         }
 
     def convert_suits(self, text: str) -> str:
         """Convert suit letters to Unicode symbols"""
-        replacements = {
-            'c': '♣', 'C': '♣',
-            'd': '♦', 'D': '♦',
-            'h': '♥', 'H': '♥',
-            's': '♠', 'S': '♠'
-        }
+        return convert_suits(text)
 
-        result = text
-        for old, new in replacements.items():
-            result = re.sub(rf'\b{old}\b', new, result)
+    def convert_suits_tree(self, value: Any = None) -> Any:
+        """Convert suit letters throughout a data tree in place (the parsed data by default)"""
+        return convert_suits_tree(self.data if value is None else value)
 
-        return result
+    def link_terms(self) -> int:
+        """Add links for the definition titles and sequence auctions found in descriptions
+
+        Each row also lists the definitions it links to under "definitions".
+        """
+        added = link_document(self.data)
+        for _, row in iter_rows(self.data):
+            definitions = [link['target'] for link in row.get('links', []) if link.get('type') == 'green']
+            if definitions:
+                row['definitions'] = list(dict.fromkeys(definitions))
+        return added
 
     def save_data(self, filename: str = "bridge_system_data.json"):
-        """Save the parsed data to JSON file"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
-        print(f"Data saved to {filename}")
+        """Save the parsed data to JSON file (left untouched if its content is unchanged)"""
+        data = json.dumps(self.data, indent=2, ensure_ascii=False).encode('utf-8')
+        if write_if_changed(filename, data):
+            print(f"Data saved to {filename}")
+        else:
+            print(f"Data unchanged: {filename}")
 
     def generate_html_content(self) -> str:
         """Generate HTML content for display"""
         html_parts = []
+        linker = TermLinker.from_document(self.data)
 
         for section_id, section in self.data["sections"].items():
             html_parts.append(f'<h3>{section["title"]}</h3>')
@@ -508,16 +392,13 @@ class BridgeContentParser:
                     bid = response["bid"]
                     desc = response["description"]
 
+                    # Link definition and sequence terms (and any links the data already has)
+                    desc = linker.markup(desc, exclude=section_id, existing=response.get("links", []))
+
                     # Add appropriate link styling
                     if response.get("type") == "red-link":
                         desc = f'<span class="red-text">{desc}</span>'
 
-                    # Add definition links
-                    if response.get("definitions"):
-                        for def_id in response["definitions"]:
-                            def_name = def_id.replace("-", " ").title()
-                            desc = desc.replace(def_name, f'<span class="green-text">{def_name}</span>')
-
                     html_parts.append(f'<li><strong>{bid}</strong>: {desc}</li>')
 
                 html_parts.append('</ul>')
@@ -526,16 +407,46 @@ class BridgeContentParser:
 
 
 def main():
-    parser = BridgeContentParser()
-    parser.parse_pdf_content()
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Parse the Uma + PS system notes into structured JSON')
+    arg_parser.add_argument('source', nargs='?',
+                            help='System notes .docx to parse (default: the text embedded in this script)')
+    arg_parser.add_argument('--output', '-o', default='structured_bridge_data.json',
+                            help='Structured data file to write (default: structured_bridge_data.json)')
+    arg_parser.add_argument('--preview', default='content_preview.html',
+                            help='HTML preview file to write (default: content_preview.html)')
+    arg_parser.add_argument('--incremental', '-i', action='store_true',
+                            help='Re-parse only source chunks that changed since the last incremental build')
+    arg_parser.add_argument('--cache', default='.build_cache.json',
+                            help='Build cache file for --incremental (default: .build_cache.json)')
+    arg_parser.add_argument('--allow-dangling', action='store_true',
+                            help='Report links, references and cross-references to missing ids without failing')
+    args = arg_parser.parse_args()
+
+    build_cache = BuildCache(args.cache) if args.incremental else None
+    parser = BridgeContentParser(build_cache)
+    if args.source:
+        parser.parse_docx(args.source)
+        parser.parse_definitions("")
+    else:
+        parser.parse_pdf_content()
+
+    added = parser.link_terms()
+    print(f"Linked {added} definition/sequence term(s)")
+    dangling = check_links(parser.data)
+    if dangling and not args.source:
+        # The embedded notes are an excerpt: their rebid links point at notes it leaves out
+        print(f"{len(dangling)} link(s) to notes outside the embedded excerpt")
+    elif dangling and not args.allow_dangling:
+        arg_parser.exit(1, f"Build failed: {len(dangling)} dangling target(s); nothing written\n")
 
     # Save the structured data
-    parser.save_data("structured_bridge_data.json")
+    parser.save_data(args.output)
 
     # Generate HTML preview
     html_content = parser.generate_html_content()
-    with open("content_preview.html", "w", encoding="utf-8") as f:
-        f.write(f"""
+    preview = f"""
         <!DOCTYPE html>
         <html>
         <head>
@@ -553,11 +464,16 @@ def main():
             {html_content}
         </body>
         </html>
-        """)
+        """
+    write_if_changed(args.preview, preview.encode('utf-8'))
+
+    if build_cache is not None:
+        build_cache.save()
+        print(f"Incremental build: {build_cache.misses} of {build_cache.hits + build_cache.misses} chunk(s) re-parsed")
 
     print("Content parsing complete!")
-    print("- Structured data: structured_bridge_data.json")
-    print("- HTML preview: content_preview.html")
+    print(f"- Structured data: {args.output}")
+    print(f"- HTML preview: {args.preview}")
 
 
 if __name__ == "__main__":
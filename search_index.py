@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Inverted index for full-text search over a bridge system document
+
+Every text field of every section, sequence and definition becomes one searchable
+unit addressed by a JSON Pointer. Queries match all of their words, each as a
+prefix of an indexed term, and return ranked hits with highlight offsets.
+"""
+
+import bisect
+import math
+import re
+from typing import Any, Dict, List, Tuple
+
+# Words, numbers, bids and ranges; hyphenated runs ("1c-1d-1n", "12-14") stay one term
+TOKEN_RE = re.compile(r'[0-9a-z]+(?:-[0-9a-z]+)*')
+
+# Suit symbols fold to the letters used in bids, keeping text offsets unchanged
+SUIT_LETTERS = str.maketrans({'♣': 'c', '♦': 'd', '♥': 'h', '♠': 's'})
+
+# Keys that hold ids, styling or link metadata rather than readable text
+SKIP_KEYS = {'id', 'type', 'cellType', 'target', 'reference', 'player', 'links', 'category', 'order'}
+
+# Relative weight of a match by the key of the field it occurs in
+FIELD_WEIGHTS = {'title': 3.0, 'bid': 2.0, 'header': 2.0, 'subtitle': 1.5}
+
+# Collections searched, in the order results of equal score are listed
+COLLECTIONS = [('sections', 'section'), ('sequences', 'sequence'), ('definitions', 'definition')]
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Split text into (term, start, end); terms are lowercase with suit symbols and hyphens folded"""
+    folded = text.translate(SUIT_LETTERS).lower()
+    if len(folded) != len(text):
+        # A case mapping changed the length; fold per character so offsets stay valid
+        folded = ''.join(c.lower() if len(c.lower()) == 1 else c for c in text.translate(SUIT_LETTERS))
+    return [(m.group().replace('-', ''), m.start(), m.end()) for m in TOKEN_RE.finditer(folded)]
+
+
+def escape_pointer(token: str) -> str:
+    """Escape one JSON Pointer reference token (RFC 6901)"""
+    return token.replace('~', '~0').replace('/', '~1')
+
+
+class SearchIndex:
+    def __init__(self):
+        self.fields: List[Dict[str, Any]] = []
+        self.postings: Dict[str, List[Tuple[int, int, int]]] = {}
+        self.terms: List[str] = []
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> 'SearchIndex':
+        """Build the index from a parsed data.json document"""
+        index = cls()
+        for collection, kind in COLLECTIONS:
+            for item_id, item in document.get(collection, {}).items():
+                index._add_value(kind, item_id, f'/{collection}/{escape_pointer(item_id)}', item, None, None)
+        index.terms = sorted(index.postings)
+        return index
+
+    def _add_value(self, kind, item_id, pointer, value, key, bid):
+        if isinstance(value, str):
+            if value.strip():
+                self._add_field(kind, item_id, pointer, key, value, bid)
+        elif isinstance(value, dict):
+            if isinstance(value.get('bid'), str):
+                bid = value['bid']
+            elif isinstance(value.get('bids'), list):
+                # Auction table row: the bid cells give context to the description cell
+                calls = [cell.get('text', '') for cell in value['bids']
+                         if isinstance(cell, dict) and cell.get('type') in ('opener', 'responder')]
+                bid = ' '.join(call for call in calls if call) or bid
+            for child_key, child in value.items():
+                if child_key in SKIP_KEYS:
+                    continue
+                self._add_value(kind, item_id, f'{pointer}/{escape_pointer(child_key)}', child, child_key, bid)
+        elif isinstance(value, list):
+            for i, child in enumerate(value):
+                self._add_value(kind, item_id, f'{pointer}/{i}', child, key, bid)
+
+    def _add_field(self, kind, item_id, pointer, key, text, bid):
+        field_idx = len(self.fields)
+        field = {'type': kind, 'id': item_id, 'path': pointer, 'field': key, 'text': text}
+        if bid and key != 'bid':
+            field['bid'] = bid
+        self.fields.append(field)
+        for term, start, end in tokenize(text):
+            self.postings.setdefault(term, []).append((field_idx, start, end))
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        """All indexed terms starting with prefix, found by binary search over the sorted vocabulary"""
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + '\uffff', lo)
+        return self.terms[lo:hi]
+
+    def search(self, query: str, limit: int = 20) -> Dict[str, Any]:
+        """Return fields matching every query word (as a prefix), best first"""
+        query_terms = list(dict.fromkeys(term for term, _, _ in tokenize(query)))
+        if not query_terms:
+            return {'query': query, 'total': 0, 'hits': []}
+
+        total_fields = len(self.fields) or 1
+        matched = None
+        scores: Dict[int, float] = {}
+        spans: Dict[int, List[Tuple[int, int]]] = {}
+
+        for query_term in query_terms:
+            term_fields = set()
+            for term in self._prefix_terms(query_term):
+                postings = self.postings[term]
+                idf = math.log(1 + total_fields / len(postings))
+                weight = idf * (2.0 if term == query_term else 1.0)
+                for field_idx, start, end in postings:
+                    if matched is not None and field_idx not in matched:
+                        continue
+                    term_fields.add(field_idx)
+                    scores[field_idx] = scores.get(field_idx, 0.0) + weight
+                    spans.setdefault(field_idx, []).append((start, end))
+            matched = term_fields
+            if not matched:
+                break
+
+        ranked = sorted(
+            matched,
+            key=lambda idx: (-scores[idx] * FIELD_WEIGHTS.get(self.fields[idx]['field'], 1.0), idx)
+        )
+
+        hits = []
+        for field_idx in ranked[:limit]:
+            hit = dict(self.fields[field_idx])
+            hit['score'] = round(scores[field_idx] * FIELD_WEIGHTS.get(hit['field'], 1.0), 3)
+            hit['highlights'] = merge_spans(spans[field_idx])
+            hits.append(hit)
+
+        return {'query': query, 'total': len(matched), 'hits': hits}
+
+    def to_compact(self) -> Dict[str, Any]:
+        """The index as plain lists, for clients that search without data.json (static_site.js)
+
+        fields are [kind, id, field key, text, bid] with kind and id as positions
+        in kinds and ids; postings[i] holds the flattened (field, start, end)
+        triples of terms[i].
+        """
+        kinds = [kind for _, kind in COLLECTIONS]
+        ids: Dict[str, int] = {}
+        fields = []
+        for field in self.fields:
+            id_index = ids.setdefault(field['id'], len(ids))
+            fields.append([kinds.index(field['type']), id_index, field['field'], field['text'], field.get('bid', '')])
+        return {
+            'version': 1,
+            'kinds': kinds,
+            'ids': list(ids),
+            'weights': FIELD_WEIGHTS,
+            'fields': fields,
+            'terms': self.terms,
+            'postings': [[value for posting in self.postings[term] for value in posting] for term in self.terms],
+        }
+
+
+def merge_spans(spans: List[Tuple[int, int]]) -> List[List[int]]:
+    """Sort and merge overlapping [start, end) highlight spans"""
+    merged: List[List[int]] = []
+    for start, end in sorted(set(spans)):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
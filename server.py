@@ -3,45 +3,822 @@
 Simple HTTP server for testing the Uma + PS Bridge System locally
 """
 
+import email.utils
+import hashlib
 import http.server
+import io
+import json
 import socketserver
 import os
 import sys
+import threading
+import urllib.parse
+from http import HTTPStatus
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from auction_trie import AuctionTrie
+from compression import ENCODING_SUFFIXES, compress_bytes, is_compressible, supported_encodings
+from fragments import Fragments
+from hand_classifier import ConstraintTable
+from json_patch import JsonPatchError
+from link_graph import LinkGraph
+from live_updates import LiveUpdates
+from search_index import SearchIndex
+from shards import Shards
+from system_diff import diff_documents, render_html
+from system_store import DEFAULT_SYSTEMS_BYTES, RevisionConflict, SystemRegistry, SystemStore, register_index
+
 # Get the directory where this script is located
 BASE_DIR = Path(__file__).parent.absolute()
 
+# Concurrency defaults for the thread pool server
+DEFAULT_WORKERS = 16
+DEFAULT_BACKLOG = 64
+DEFAULT_KEEPALIVE = 5  # seconds an idle keep-alive connection may hold a worker
+
+# Cache-Control per asset type. Content that changes with edits is always revalidated
+# (cheap thanks to ETags); code and styling may be reused for a few minutes.
+CACHE_CONTROL = {
+    '.html': 'no-cache',
+    '.json': 'no-cache',
+    '.js': 'public, max-age=300',
+    '.css': 'public, max-age=300',
+    '.png': 'public, max-age=86400',
+    '.jpg': 'public, max-age=86400',
+    '.svg': 'public, max-age=86400',
+    '.ico': 'public, max-age=86400',
+    '.woff2': 'public, max-age=86400',
+}
+DEFAULT_CACHE_CONTROL = 'no-cache'
+
+# In-memory asset cache limits
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+SENDFILE_THRESHOLD = 1024 * 1024  # larger files stay on disk and go out via sendfile
+
+# Largest request body accepted by the edit endpoints
+MAX_BODY_BYTES = 1024 * 1024
+DEFAULT_HISTORY_LIMIT = 50
+
+
+def content_etag(data):
+    """Strong ETag from the SHA-256 of the content"""
+    return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+
+def file_etag(f):
+    """Strong ETag for a file too large to hold in memory, hashed in chunks"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(64 * 1024), b''):
+        digest.update(chunk)
+    f.seek(0)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110 13.1.2)"""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    for candidate in if_none_match.split(','):
+        if candidate.strip().removeprefix('W/') == opaque:
+            return True
+    return False
+
+
+def precompress_assets(base_dir):
+    """Write .gz/.br siblings for compressible assets that lack a fresh one"""
+    built = 0
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
+        for name in files:
+            path = os.path.join(root, name)
+            fs = os.stat(path)
+            if not is_compressible(path, fs.st_size):
+                continue
+            data = None
+            for encoding in supported_encodings():
+                sibling = path + ENCODING_SUFFIXES[encoding]
+                if fresh_sibling(sibling, fs.st_mtime_ns):
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                tmp = f'{sibling}.tmp{os.getpid()}'
+                with open(tmp, 'wb') as f:
+                    f.write(compress_bytes(data, encoding))
+                os.replace(tmp, sibling)
+                built += 1
+    return built
+
+
+def fresh_sibling(sibling, source_mtime_ns):
+    """True if a precompressed sibling exists and is not older than its source"""
+    try:
+        return os.stat(sibling).st_mtime_ns >= source_mtime_ns
+    except OSError:
+        return False
+
+
+def accepted_encodings(accept_encoding):
+    """Parse Accept-Encoding into {coding: q}"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+class CachedAsset:
+    """One static file: its bytes, encoded variants and precomputed response headers"""
+
+    def __init__(self, path, fs, content_type, etag, data=None):
+        self.path = path
+        self.mtime_ns = fs.st_mtime_ns
+        self.mtime = fs.st_mtime
+        self.size = fs.st_size
+        self.content_type = content_type
+        self.etag = etag
+        self.data = data  # None for files served from disk via sendfile
+        self.compressible = is_compressible(path, fs.st_size)
+        self.cache_control = CACHE_CONTROL.get(os.path.splitext(path)[1].lower(), DEFAULT_CACHE_CONTROL)
+        self.last_modified = email.utils.formatdate(fs.st_mtime, usegmt=True)
+        self.variants = {}  # encoding -> compressed bytes
+        self._headers = {}
+
+    @property
+    def in_memory(self):
+        return self.data is not None
+
+    @property
+    def nbytes(self):
+        return (len(self.data) if self.data else 0) + sum(len(v) for v in self.variants.values())
+
+    def matches(self, fs):
+        return fs.st_mtime_ns == self.mtime_ns and fs.st_size == self.size
+
+    def etag_for(self, encoding):
+        if encoding is None:
+            return self.etag
+        # Each representation needs its own strong validator
+        return f'{self.etag[:-1]}-{ENCODING_SUFFIXES[encoding][1:]}"'
+
+    def validator_headers(self, encoding):
+        """Headers shared by 200 and 304 responses for one representation"""
+        headers = self._headers.get(encoding)
+        if headers is None:
+            headers = []
+            if self.compressible:
+                # Caches must key compressible assets on Accept-Encoding, even for identity responses
+                headers.append(("Vary", "Accept-Encoding"))
+            headers.append(("ETag", self.etag_for(encoding)))
+            headers.append(("Last-Modified", self.last_modified))
+            headers.append(("Cache-Control", self.cache_control))
+            self._headers[encoding] = headers
+        return headers
+
+
+class AssetCache:
+    """LRU cache of static files keyed by path, invalidated by mtime/size and capped by total bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, sendfile_threshold=SENDFILE_THRESHOLD):
+        self.max_bytes = max_bytes
+        self.sendfile_threshold = sendfile_threshold
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, content_type):
+        """Return a fresh CachedAsset for path, (re)loading it if the file changed; raises OSError"""
+        fs = os.stat(path)
+        with self._lock:
+            asset = self._entries.get(path)
+            if asset is not None and asset.matches(fs):
+                self._entries.move_to_end(path)
+                return asset
+
+        if fs.st_size > self.sendfile_threshold:
+            with open(path, 'rb') as f:
+                fs = os.fstat(f.fileno())
+                asset = CachedAsset(path, fs, content_type, file_etag(f))
+        else:
+            with open(path, 'rb') as f:
+                fs = os.fstat(f.fileno())
+                data = f.read()
+            asset = CachedAsset(path, fs, content_type, content_etag(data), data)
+
+        with self._lock:
+            self._discard(path)
+            self._entries[path] = asset
+            self.total_bytes += asset.nbytes
+            self._evict()
+        return asset
+
+    def encodings(self, asset):
+        """Encodings available for an asset: any we can produce for in-memory assets, else fresh siblings"""
+        available = []
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            if (asset.in_memory and encoding in supported_encodings()) or \
+                    fresh_sibling(asset.path + suffix, asset.mtime_ns):
+                available.append(encoding)
+        return available
+
+    def variant(self, asset, encoding):
+        """Compressed bytes for an in-memory asset, from a fresh sibling or compressed on the fly"""
+        data = asset.variants.get(encoding)
+        if data is not None:
+            return data
+
+        sibling = asset.path + ENCODING_SUFFIXES[encoding]
+        data = None
+        if fresh_sibling(sibling, asset.mtime_ns):
+            try:
+                with open(sibling, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                pass
+        if data is None:
+            data = compress_bytes(asset.data, encoding)
+
+        with self._lock:
+            if encoding not in asset.variants:
+                asset.variants[encoding] = data
+                if self._entries.get(asset.path) is asset:
+                    self.total_bytes += len(data)
+                    self._evict()
+        return data
+
+    def _discard(self, path):
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self.total_bytes -= old.nbytes
+
+    def _evict(self):
+        # Keep the most recently used entry even if it alone exceeds the cap
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self.total_bytes -= old.nbytes
+
+
+ASSET_CACHE = AssetCache()
+
+# The bridge system document and the indexes derived from it
+register_index('search', SearchIndex.from_document)
+register_index('auction', AuctionTrie.from_document)
+register_index('shards', Shards.from_document)
+register_index('graph', LinkGraph.from_document)
+register_index('fragments', Fragments.from_document)
+register_index('classifier', ConstraintTable.from_document)
+DATA_STORE = SystemStore(BASE_DIR / 'data.json')
+
+# Further systems, served under /systems/<name>/
+SYSTEMS = SystemRegistry(BASE_DIR / 'systems')
+
+
+def resolve_system(name):
+    """The store of a hosted system, or of data.json for the empty name"""
+    return SYSTEMS.get(name) if name else DATA_STORE
+
+
+# Event streams of edits to open pages
+LIVE_UPDATES = LiveUpdates(resolve_system)
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+MAX_CLASSIFY_HANDS = 100
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Pick the best Content-Encoding the client accepts from those available, or None for identity"""
+    if not accept_encoding or not available:
+        return None
+    accepted = accepted_encodings(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def not_modified_since(if_modified_since, mtime):
+    """True if the file has not changed since the If-Modified-Since date"""
+    try:
+        ims = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, IndexError, OverflowError, ValueError):
+        return False
+    if ims is None:
+        return False
+    return int(mtime) <= ims.timestamp()
+
+
+
+def split_system_path(path):
+    """/systems/<name>/<rest> -> (name, /<rest>); (None, path) for anything else"""
+    if not path.startswith('/systems/'):
+        return None, path
+    name, slash, rest = path[len('/systems/'):].partition('/')
+    return urllib.parse.unquote(name), slash + rest
+
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1 so browsers can reuse one connection for index.html, app.js, styles.css and data.json
+    protocol_version = "HTTP/1.1"
+    timeout = DEFAULT_KEEPALIVE
+
+    # Set correct MIME types
+    extensions_map = {
+        **http.server.SimpleHTTPRequestHandler.extensions_map,
+        '.js': 'application/javascript',
+        '.css': 'text/css',
+        '.json': 'application/json',
+    }
+
+    # /api/<name>[/<rest>] -> handler method
+    api_routes = {
+        'search': 'api_search',
+        'auction': 'api_auction',
+        'manifest': 'api_manifest',
+        'sections': 'api_section',
+        'sequences': 'api_sequence',
+        'definitions': 'api_definition',
+        'revision': 'api_revision',
+        'history': 'api_history',
+        'related': 'api_related',
+        'classify': 'api_classify',
+        'systems': 'api_systems',
+        'events': 'api_events',
+        'diff': 'api_diff',
+    }
+
+    # PATCH or POST /api/<name>[/<rest>] -> handler method for edits
+    api_write_routes = {
+        'data': 'api_patch_data',
+        'undo': 'api_undo',
+    }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=BASE_DIR, **kwargs)
 
+    def do_GET(self):
+        path = self.route()
+        if path is None:
+            return
+        if path.startswith('/api/'):
+            self.handle_api(self.api_routes, path)
+        elif path.startswith('/fragments/'):
+            self.send_fragment(urllib.parse.unquote(path[len('/fragments/'):]))
+        else:
+            super().do_GET()
+
+    def do_HEAD(self):
+        # The GET routes, answered with headers only (send_json_body leaves out the body)
+        path = self.route()
+        if path is None:
+            return
+        if path.startswith('/api/'):
+            self.handle_api(self.api_routes, path)
+        elif path.startswith('/fragments/'):
+            self.send_fragment(urllib.parse.unquote(path[len('/fragments/'):]))
+        else:
+            super().do_HEAD()
+
+    def do_PATCH(self):
+        path = self.route()
+        if path is None:
+            return
+        if path.startswith('/api/'):
+            self.handle_api(self.api_write_routes, path)
+        else:
+            self.send_error(HTTPStatus.METHOD_NOT_ALLOWED)
+
+    do_POST = do_PATCH
+
+    def do_OPTIONS(self):
+        # CORS preflight; the allowed methods and headers are added by end_headers
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def route(self):
+        """Pick the system the request is for; return the path within it, or None once answered with 404
+
+        /systems/<name>/<path> is <path> of the hosted system <name> (the page itself
+        is shared, so its relative URLs reach that system's API); anything else is data.json's.
+        """
+        name, path = split_system_path(urllib.parse.urlsplit(self.path).path)
+        self.channel = name or ''
+        try:
+            if name == '':
+                raise FileNotFoundError(name)
+            self.store = resolve_system(self.channel)
+        except FileNotFoundError:
+            self.send_error(HTTPStatus.NOT_FOUND, f"No such system: {name}")
+            return None
+        return path
+
+    def translate_path(self, path):
+        name, rest = split_system_path(urllib.parse.urlsplit(path).path)
+        if name is None:
+            return super().translate_path(path)
+        if rest == '/data.json':
+            return SYSTEMS.path(name)
+        return super().translate_path(rest)
+
+    def handle_api(self, routes, path):
+        """Dispatch /api/<name>[/<rest>] to the matching api_* method"""
+        name, _, rest = path[len('/api/'):].partition('/')
+        method = routes.get(name)
+        if method is None:
+            self.send_json({'error': f'Unknown API endpoint: {name}'}, HTTPStatus.NOT_FOUND)
+            return
+        params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        try:
+            getattr(self, method)(urllib.parse.unquote(rest), params)
+        except FileNotFoundError as e:
+            self.send_json({'error': f'System data not found: {e.filename}'}, HTTPStatus.NOT_FOUND)
+        except RevisionConflict as e:
+            self.send_json({'error': str(e), 'revision': e.revision}, HTTPStatus.CONFLICT)
+        except JsonPatchError as e:
+            self.send_json({'error': str(e)}, HTTPStatus.UNPROCESSABLE_ENTITY)
+        except ValueError as e:
+            self.send_json({'error': str(e)}, HTTPStatus.BAD_REQUEST)
+
+    def read_json_body(self):
+        """Parse the request body as JSON, bounded by MAX_BODY_BYTES"""
+        length = self.headers.get('Content-Length')
+        if length is None:
+            # Without a length the connection can't be reused; don't try to read to EOF
+            self.close_connection = True
+            raise ValueError('Content-Length is required')
+        length = int(length)
+        if not 0 <= length <= MAX_BODY_BYTES:
+            self.close_connection = True
+            raise ValueError(f'Request body must be at most {MAX_BODY_BYTES} bytes')
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def api_revision(self, rest, params):
+        """GET /api/revision - current revision of data.json, the base for the next edit"""
+        self.send_json({'revision': self.store.revision()})
+
+    def api_history(self, rest, params):
+        """GET /api/history[?limit=N] - recent edits, newest first"""
+        limit = int(params.get('limit', [DEFAULT_HISTORY_LIMIT])[0])
+        if limit < 1:
+            raise ValueError('limit must be at least 1')
+        self.send_json({'revision': self.store.revision(), 'edits': self.store.history(limit)})
+
+    def api_patch_data(self, rest, params):
+        """PATCH /api/data[?base=<revision>] - apply a JSON Patch (RFC 6902) to data.json; all operations or none"""
+        patch = self.read_json_body()
+        base = self.base_revision(params)
+        revision = self.store.apply_patch(patch, base)
+        LIVE_UPDATES.notify(self.channel)
+        self.send_json({'revision': revision, 'applied': len(patch)})
+
+    def api_undo(self, rest, params):
+        """POST /api/undo[/<revision>][?base=<revision>] - revert an edit (the latest by default) as a new revision"""
+        base = self.base_revision(params)
+        try:
+            revision = self.store.undo(int(rest) if rest else None, base)
+        except KeyError:
+            self.send_json({'error': f'No edit to undo{" at revision " + rest if rest else ""}'},
+                           HTTPStatus.NOT_FOUND)
+            return
+        LIVE_UPDATES.notify(self.channel)
+        self.send_json({'revision': revision})
+
+    @staticmethod
+    def base_revision(params):
+        """Revision the client's edit is based on (?base=N); without it the edit applies to the current revision"""
+        base = params.get('base', [None])[0]
+        return int(base) if base is not None else None
+
+    def api_search(self, rest, params):
+        """GET /api/search?q=<query>[&limit=N] - ranked full-text hits with highlight offsets"""
+        query = params.get('q', [''])[0]
+        limit = int(params.get('limit', [DEFAULT_SEARCH_LIMIT])[0])
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise ValueError(f'limit must be between 1 and {MAX_SEARCH_LIMIT}')
+        self.send_json(self.store.index('search').search(query, limit))
+
+    def api_auction(self, prefix, params):
+        """GET /api/auction/<prefix>[?vul=nv|vul][&depth=N] - what the system says about an auction and what follows"""
+        vulnerability = params.get('vul', [None])[0]
+        depth = params.get('depth', [None])[0]
+        max_depth = int(depth) if depth is not None else None
+        if max_depth is not None and max_depth < 1:
+            raise ValueError('depth must be at least 1')
+        self.send_json(self.store.index('auction').lookup(prefix, vulnerability, max_depth))
+
+    def api_related(self, item_id, params):
+        """GET /api/related[/<id>] - what an id links to and what links to it; without an id, the dangling targets"""
+        graph = self.store.index('graph')
+        if not item_id:
+            self.send_json(graph.summary())
+            return
+        if item_id not in graph.items and item_id not in graph.outgoing and item_id not in graph.incoming:
+            self.send_json({'error': f'Nothing is or links to {item_id}'}, HTTPStatus.NOT_FOUND)
+            return
+        self.send_json(graph.related(item_id))
+
+    def api_classify(self, rest, params):
+        """GET /api/classify?hand=<hand>[&hand=...][&vul=nv|vul] - the opening, responses and rebids each hand makes"""
+        hands = params.get('hand', [])
+        if not 1 <= len(hands) <= MAX_CLASSIFY_HANDS:
+            raise ValueError(f'Give between 1 and {MAX_CLASSIFY_HANDS} hand parameters')
+        vulnerability = params.get('vul', [None])[0]
+        table = self.store.index('classifier')
+        self.send_json({'results': [table.classify(hand, vulnerability) for hand in hands]})
+
+    def api_systems(self, rest, params):
+        """GET /api/systems - the systems hosted under /systems/<name>/ and which are loaded"""
+        self.send_json(SYSTEMS.summary())
+
+    def api_events(self, rest, params):
+        """GET /api/events - Server-Sent Events: the current revision, then each new one with the subtrees it changed"""
+        if not LIVE_UPDATES.accepts():
+            self.send_json({'error': 'Live updates are not available'}, HTTPStatus.SERVICE_UNAVAILABLE)
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")  # ask proxies not to hold events back
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        # The stream has no length; it ends when either side closes the connection,
+        # which from here on belongs to LIVE_UPDATES rather than to this worker
+        self.close_connection = True
+        self.server.handed_off.add(self.connection)
+        LIVE_UPDATES.subscribe(self.connection, self.channel)
+
+    def api_diff(self, rest, params):
+        """GET /api/diff?from=<revision>[&to=<revision>] or ?system=<name> [&format=html] - changes by ids and auctions"""
+        system = params.get('system', [None])[0]
+        start = params.get('from', [None])[0]
+        end = params.get('to', [None])[0]
+        if (system is None) == (start is None):
+            raise ValueError('Give either from=<revision> or system=<name>')
+        try:
+            revision, new = self.store.document_at(int(end) if end is not None else None)
+            if system is not None:
+                _, old = SYSTEMS.get(system).document_at()
+                title = f'Changes from {system} to revision {revision}'
+            else:
+                start_revision, old = self.store.document_at(int(start))
+                title = f'Changes from revision {start_revision} to {revision}'
+        except KeyError as e:
+            self.send_json({'error': f'Revision {e.args[0]} is not in the edit history'}, HTTPStatus.NOT_FOUND)
+            return
+        # The current revision's item hashes are already in the shards index
+        shards_revision, shards = self.store.revision_index('shards')
+        new_hashes = ({key: etag for key, (_, etag) in shards.resources.items()}
+                      if shards_revision == revision else None)
+        report = diff_documents(old, new, new_hashes=new_hashes)
+        if params.get('format', ['json'])[0] == 'html':
+            # Relative to .../api/diff, so a hosted system's page finds the shared stylesheet too
+            page = render_html(report, title, stylesheet='../styles.css')
+            self.send_json_body(page.encode('utf-8'), content_type="text/html; charset=utf-8")
+            return
+        self.send_json({'title': title, 'revision': revision, **report})
+
+    def api_manifest(self, rest, params):
+        """GET /api/manifest - metadata and a table of contents with one ETag per item"""
+        body, etag = self.store.index('shards').manifest
+        self.send_json_body(body, etag)
+
+    def api_section(self, section_id, params):
+        """GET /api/sections/<id>"""
+        self.send_shard('sections', section_id)
+
+    def api_sequence(self, sequence_id, params):
+        """GET /api/sequences/<id>"""
+        self.send_shard('sequences', sequence_id)
+
+    def api_definition(self, definition_id, params):
+        """GET /api/definitions/<id>"""
+        self.send_shard('definitions', definition_id)
+
+    def send_shard(self, collection, item_id):
+        """Send one item of the document with its own ETag"""
+        shard = self.store.index('shards').get(collection, item_id)
+        if shard is None:
+            self.send_json({'error': f'No such {collection[:-1]}: {item_id}'}, HTTPStatus.NOT_FOUND)
+            return
+        self.send_json_body(*shard)
+
+    def send_fragment(self, name):
+        """GET /fragments/<id>.html - a section, sequence or definition pre-rendered as app.js would"""
+        item_id, extension = os.path.splitext(name)
+        fragment = self.store.index('fragments').get(item_id) if extension == '.html' else None
+        if fragment is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "Fragment not found")
+            return
+        self.send_json_body(*fragment, content_type="text/html; charset=utf-8")
+
+    def send_json(self, payload, status=HTTPStatus.OK):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_json_body(body, status=status)
+
+    def send_json_body(self, body, etag=None, status=HTTPStatus.OK, content_type="application/json; charset=utf-8"):
+        """Send serialized JSON (or another body); with an ETag, answer a matching If-None-Match with 304"""
+        if etag and etag_matches(self.headers.get('If-None-Match', ''), etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
     def end_headers(self):
         # Add CORS headers for local development
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-
-        # Set correct MIME types
-        if self.path.endswith('.js'):
-            self.send_header('Content-Type', 'application/javascript')
-        elif self.path.endswith('.css'):
-            self.send_header('Content-Type', 'text/css')
-        elif self.path.endswith('.json'):
-            self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PATCH, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
 
         super().end_headers()
 
-def start_server(port=9999):
+    def send_head(self):
+        """Serve files with ETag/Last-Modified validators and answer conditional GETs with 304"""
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, 'index.html')
+            if not urllib.parse.urlsplit(self.path).path.endswith('/') or not os.path.isfile(index):
+                # Redirect to the slash URL or list the directory
+                return super().send_head()
+            path = index
+        if path.endswith('/'):
+            return super().send_head()
+
+        try:
+            asset = ASSET_CACHE.get(path, self.guess_type(path))
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        encoding = None
+        if asset.compressible:
+            encoding = negotiate_encoding(self.headers.get('Accept-Encoding'), ASSET_CACHE.encodings(asset))
+
+        if self.is_not_modified(asset.etag_for(encoding), asset.mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_headers(asset.validator_headers(encoding))
+            self.end_headers()
+            return None
+
+        if asset.in_memory:
+            body = asset.data if encoding is None else ASSET_CACHE.variant(asset, encoding)
+            f, length = io.BytesIO(body), len(body)
+        else:
+            try:
+                f = open(asset.path if encoding is None else asset.path + ENCODING_SUFFIXES[encoding], 'rb')
+            except OSError:
+                self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+                return None
+            length = os.fstat(f.fileno()).st_size
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", asset.content_type)
+        self.send_header("Content-Length", str(length))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_headers(asset.validator_headers(encoding))
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        if isinstance(source, io.BytesIO):
+            # Cached bytes go out in one write, no intermediate copy
+            outputfile.write(source.getbuffer())
+        else:
+            # Large files go from the page cache to the socket without passing through Python
+            outputfile.flush()
+            self.connection.sendfile(source)
+
+    def send_headers(self, headers):
+        for keyword, value in headers:
+            self.send_header(keyword, value)
+
+    def is_not_modified(self, etag, mtime):
+        """Evaluate If-None-Match, falling back to If-Modified-Since when no ETag was sent"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            return not_modified_since(if_modified_since, mtime)
+        return False
+
+
+class BridgeTCPServer(socketserver.TCPServer):
+    """TCP server whose handlers may hand a connection over instead of closing it (event streams)"""
+
+    allow_reuse_address = True
+
+    def __init__(self, *args, **kwargs):
+        self.handed_off = set()
+        super().__init__(*args, **kwargs)
+
+    def shutdown_request(self, request):
+        if request in self.handed_off:
+            self.handed_off.discard(request)
+            return
+        super().shutdown_request(request)
+
+
+class ThreadPoolHTTPServer(BridgeTCPServer):
+    """TCP server that hands each connection to a bounded pool of worker threads"""
+
+    def __init__(self, server_address, handler_class, workers=DEFAULT_WORKERS, backlog=DEFAULT_BACKLOG):
+        self.request_queue_size = backlog
+        self.workers = workers
+        # The semaphore keeps the accept loop from queueing more connections than there are
+        # workers; anything beyond that waits in the kernel listen backlog instead of in RAM.
+        self._slots = threading.BoundedSemaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bridge-http")
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            self._executor.submit(self._process_request_worker, request, client_address)
+        except RuntimeError:
+            # Executor already shut down
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SingleThreadedHTTPServer(BridgeTCPServer):
+    """Original one-request-at-a-time server, kept for debugging"""
+
+
+def start_server(port=9999, workers=DEFAULT_WORKERS, backlog=DEFAULT_BACKLOG,
+                 keepalive=DEFAULT_KEEPALIVE, single_threaded=False, precompress=True,
+                 cache_bytes=DEFAULT_CACHE_BYTES, systems_dir=None, systems_bytes=DEFAULT_SYSTEMS_BYTES):
     """Start a local HTTP server"""
 
     # Change to the base directory
     os.chdir(BASE_DIR)
 
-    with socketserver.TCPServer(("", port), CustomHTTPRequestHandler) as httpd:
+    if precompress:
+        built = precompress_assets(BASE_DIR)
+        print(f"Precompressed assets: {built} variant(s) written ({', '.join(supported_encodings())})")
+
+    CustomHTTPRequestHandler.timeout = keepalive
+    ASSET_CACHE.max_bytes = cache_bytes
+    if systems_dir is not None:
+        SYSTEMS.directory = os.path.abspath(systems_dir)
+    SYSTEMS.max_bytes = systems_bytes
+
+    if single_threaded:
+        # HTTP/1.0 closes every connection, so one client can never pin the only thread
+        CustomHTTPRequestHandler.protocol_version = "HTTP/1.0"
+        httpd = SingleThreadedHTTPServer(("", port), CustomHTTPRequestHandler)
+        mode = "single-threaded"
+    else:
+        httpd = ThreadPoolHTTPServer(("", port), CustomHTTPRequestHandler,
+                                     workers=workers, backlog=backlog)
+        mode = f"thread pool, {workers} workers, backlog {backlog}"
+
+    LIVE_UPDATES.start()
+    with httpd:
         print(f"Starting Uma + PS Bridge System server...")
-        print(f"Server running at: http://localhost:{port}")
+        print(f"Server running at: http://localhost:{port} ({mode})")
         print(f"Serving from: {BASE_DIR}")
+        print(f"Hosted systems: {SYSTEMS.directory} ({len(SYSTEMS.names())} under /systems/<name>/)")
         print("\nOpen your browser and navigate to:")
         print(f"  http://localhost:{port}")
         print("\nPress Ctrl+C to stop the server")
@@ -49,6 +826,9 @@ def start_server(port=9999):
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
+            LIVE_UPDATES.stop()
+            DATA_STORE.flush()
+            SYSTEMS.flush()
             print("\n\nServer stopped.")
             sys.exit(0)
 
@@ -58,6 +838,28 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Start Uma + PS Bridge System server')
     parser.add_argument('--port', '-p', type=int, default=9999,
                         help='Port to run the server on (default: 9999)')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help=f'Worker threads serving requests concurrently (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG,
+                        help=f'Listen backlog for connections waiting on a worker (default: {DEFAULT_BACKLOG})')
+    parser.add_argument('--keepalive', type=float, default=DEFAULT_KEEPALIVE,
+                        help=f'Seconds an idle keep-alive connection is held open (default: {DEFAULT_KEEPALIVE})')
+    parser.add_argument('--single-threaded', action='store_true',
+                        help='Serve one request at a time (previous behaviour)')
+    parser.add_argument('--no-precompress', action='store_true',
+                        help='Skip writing .gz/.br siblings at startup (compress on the fly instead)')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help='Memory cap for the in-process static asset cache in MB (default: 64)')
+    parser.add_argument('--systems-dir', default=None,
+                        help='Directory of <name>.json systems served under /systems/<name>/ (default: systems)')
+    parser.add_argument('--systems-mb', type=int, default=DEFAULT_SYSTEMS_BYTES // (1024 * 1024),
+                        help='Size of system files kept loaded at once in MB; the least recently used '
+                             f'are unloaded past it (default: {DEFAULT_SYSTEMS_BYTES // (1024 * 1024)})')
 
     args = parser.parse_args()
-    start_server(args.port)
\ No newline at end of file
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    start_server(args.port, workers=args.workers, backlog=args.backlog,
+                 keepalive=args.keepalive, single_threaded=args.single_threaded,
+                 precompress=not args.no_precompress, cache_bytes=args.cache_mb * 1024 * 1024,
+                 systems_dir=args.systems_dir, systems_bytes=args.systems_mb * 1024 * 1024)
\ No newline at end of file
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Per-item JSON resources for lazy loading of a bridge system document
+
+Splits data.json into a small manifest (metadata, colours, link types and a
+table of contents) plus one JSON resource per section, sequence and definition,
+each with its own content-hash ETag so clients fetch only what they open.
+The ETags also make comparing two revisions cheap: changes() lists the items
+and top-level values whose hashes differ.
+"""
+
+import hashlib
+import json
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+
+from json_patch import format_pointer
+
+# Sharded collections and the fields each one lists in the manifest
+SHARDED_COLLECTIONS = {
+    'sections': ('title', 'subtitle', 'order'),
+    'sequences': ('title', 'auction', 'player'),
+    'definitions': ('title', 'category'),
+}
+
+
+def encode_json(value: Any) -> bytes:
+    """Compact UTF-8 JSON, stable for identical input"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_etag(body: bytes) -> str:
+    """Strong ETag from the SHA-256 of a serialized resource"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class Shards:
+    def __init__(self):
+        self.manifest: Tuple[bytes, str] = (b'', '')
+        self.resources: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+        self.entries: Dict[Tuple[str, str], Dict[str, Any]] = {}  # manifest entry per item
+        self.fields: Dict[str, bytes] = {}  # serialized top-level values other than the collections
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> 'Shards':
+        """Serialize every section, sequence and definition and build the manifest that lists them"""
+        shards = cls()
+        manifest = {key: value for key, value in document.items() if key not in SHARDED_COLLECTIONS}
+        shards.fields = {key: encode_json(value) for key, value in manifest.items()}
+
+        for collection, listed_fields in SHARDED_COLLECTIONS.items():
+            toc = {}
+            for item_id, item in document.get(collection, {}).items():
+                body = encode_json(item)
+                etag = json_etag(body)
+                shards.resources[(collection, item_id)] = (body, etag)
+                entry = {field: item[field] for field in listed_fields if field in item}
+                entry['etag'] = etag
+                entry['url'] = f"api/{collection}/{urllib.parse.quote(item_id, safe='')}"
+                entry['fragment'] = f"fragments/{urllib.parse.quote(item_id, safe='')}.html"
+                toc[item_id] = entry
+                shards.entries[(collection, item_id)] = entry
+            manifest[collection] = toc
+
+        body = encode_json(manifest)
+        shards.manifest = (body, json_etag(body))
+        return shards
+
+    def get(self, collection: str, item_id: str) -> Optional[Tuple[bytes, str]]:
+        """(body, etag) for one item, or None if it does not exist"""
+        return self.resources.get((collection, item_id))
+
+    def changes(self, newer: 'Shards') -> List[Dict[str, Any]]:
+        """JSON Patch operations turning this document into newer, one per changed item or top-level value
+
+        Items are compared by ETag, so unchanged ones cost a dict lookup. Operations
+        on sections, sequences and definitions carry the item's new manifest entry.
+        """
+        operations = []
+        for key, body in newer.fields.items():
+            if self.fields.get(key) != body:
+                operations.append({'op': 'replace' if key in self.fields else 'add',
+                                   'path': format_pointer([key]), 'value': json.loads(body)})
+        operations.extend({'op': 'remove', 'path': format_pointer([key])}
+                          for key in self.fields if key not in newer.fields)
+        for (collection, item_id), (body, etag) in newer.resources.items():
+            old = self.resources.get((collection, item_id))
+            if old is None or old[1] != etag:
+                operations.append({'op': 'add' if old is None else 'replace',
+                                   'path': format_pointer([collection, item_id]), 'value': json.loads(body),
+                                   'entry': newer.entries[(collection, item_id)]})
+        operations.extend({'op': 'remove', 'path': format_pointer(list(key))}
+                          for key in self.resources if key not in newer.resources)
+        return operations
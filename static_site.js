@@ -0,0 +1,117 @@
+// Uma + PS Bridge System - client for the static export (export_site.py)
+// Pages are pre-rendered; this only follows coloured links and searches the
+// serialized index in window.SEARCH_INDEX, so it works from file:// with no server.
+
+(function () {
+    'use strict';
+
+    const root = document.body.dataset.root || '';
+    const index = window.SEARCH_INDEX;
+
+    // Same folding and terms as search_index.py: suit symbols as letters, hyphens dropped
+    const SUIT_LETTERS = { '♣': 'c', '♦': 'd', '♥': 'h', '♠': 's' };
+    const TOKEN_RE = /[0-9a-z]+(?:-[0-9a-z]+)*/g;
+    const RESULT_LIMIT = 20;
+
+    function pageUrl(collection, id) {
+        return `${root}${collection}/${encodeURIComponent(encodeURIComponent(id))}.html`;
+    }
+
+    function tokenize(text) {
+        const folded = text.replace(/[♣♦♥♠]/g, suit => SUIT_LETTERS[suit]).toLowerCase();
+        return Array.from(folded.matchAll(TOKEN_RE), match => match[0].replace(/-/g, ''));
+    }
+
+    function lowerBound(terms, value) {
+        let lo = 0;
+        let hi = terms.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (terms[mid] < value) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo;
+    }
+
+    function search(query) {
+        // Every query word must match a term as a prefix; scored as SearchIndex.search
+        const queryTerms = [...new Set(tokenize(query))];
+        if (!index || queryTerms.length === 0) {
+            return [];
+        }
+        const totalFields = index.fields.length || 1;
+        const scores = new Map();
+        let matched = null;
+
+        for (const queryTerm of queryTerms) {
+            const termFields = new Set();
+            const end = lowerBound(index.terms, queryTerm + '￿');
+            for (let t = lowerBound(index.terms, queryTerm); t < end; t++) {
+                const postings = index.postings[t];
+                const idf = Math.log(1 + totalFields / (postings.length / 3));
+                const weight = idf * (index.terms[t] === queryTerm ? 2.0 : 1.0);
+                for (let p = 0; p < postings.length; p += 3) {
+                    const field = postings[p];
+                    if (matched !== null && !matched.has(field)) {
+                        continue;
+                    }
+                    termFields.add(field);
+                    scores.set(field, (scores.get(field) || 0) + weight);
+                }
+            }
+            matched = termFields;
+            if (matched.size === 0) {
+                break;
+            }
+        }
+
+        const score = field => scores.get(field) * (index.weights[index.fields[field][2]] || 1.0);
+        return [...matched]
+            .sort((a, b) => score(b) - score(a) || a - b)
+            .slice(0, RESULT_LIMIT)
+            .map(field => {
+                const [kind, id, , text, bid] = index.fields[field];
+                return { kind: index.kinds[kind], id: index.ids[id], text, bid };
+            });
+    }
+
+    function showResults(results) {
+        const container = document.getElementById('search-results');
+        container.textContent = '';
+        for (const result of results) {
+            const link = document.createElement('a');
+            link.className = 'search-result';
+            link.href = pageUrl(`${result.kind}s`, result.id);
+            link.textContent = result.bid ? `${result.bid}: ${result.text}` : result.text;
+            container.appendChild(link);
+        }
+        container.style.display = results.length ? 'block' : 'none';
+    }
+
+    const input = document.getElementById('search-input');
+    input.addEventListener('input', () => showResults(search(input.value)));
+    input.addEventListener('keydown', event => {
+        const first = document.querySelector('#search-results .search-result');
+        if (event.key === 'Enter' && first) {
+            window.location.href = first.href;
+        } else if (event.key === 'Escape') {
+            input.value = '';
+            showResults([]);
+        }
+    });
+
+    // Red and blue text open the sequence, green text the definition
+    document.addEventListener('click', event => {
+        const target = event.target.closest('[data-reference], [data-definition]');
+        if (!target) {
+            return;
+        }
+        event.preventDefault();
+        window.location.href = target.dataset.definition
+            ? pageUrl('definitions', target.dataset.definition)
+            : pageUrl('sequences', target.dataset.reference);
+    });
+})();
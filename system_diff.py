@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Structural diff of two bridge system documents
+
+Compares what the documents say rather than how the files are laid out:
+sections, sequences and definitions are matched by id, and the bids inside
+an item by their normalized auction and vulnerability, so "1c-1d-1n",
+"1♣ 1♦ 1NT" and "1c1d1n" are the same bid and reordering rows changes no
+bid. The report lists added, removed and changed items, and for each
+changed item the bids that were added, removed or changed (with the fields
+that differ) and every other field that changed, by path: table titles and
+headers, group titles, the overview. An item whose fields and bids all
+match only had its rows moved, and says so.
+
+Every item is hashed once from its compact JSON (the same ETags the shards
+index serves, which callers may pass in); items whose hashes match are
+skipped without looking inside. Only changed items are broken into bid rows,
+matched by key and compared field by field only when they differ.
+"""
+
+import html
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from auction_trie import normalize_vulnerability, parse_bid
+from bid_codec import NORMALIZE_CACHE_SIZE
+from fragments import notation
+from json_patch import format_pointer
+from search_index import COLLECTIONS
+from shards import encode_json, json_etag
+
+STYLESHEET = Path(__file__).parent / 'styles.css'
+
+# Item fields holding bid rows; everything else is compared as the item's own fields
+ROW_CONTAINERS = ('content', 'categories')
+
+# Keys holding the rows of a table, of a section's subsection and of a sequence's category
+TABLE_ROWS = 'data'
+GROUP_ROWS = {'subsections': 'responses', 'categories': 'bids'}
+
+STATUSES = ('added', 'removed', 'changed')
+
+# Bid key: (normalized auction, vulnerability, occurrence of that auction in the item)
+RowKey = Tuple[str, Optional[str], int]
+
+
+def item_hashes(document: Dict[str, Any]) -> Dict[Tuple[str, str], str]:
+    """(collection, id) -> ETag of the item, as Shards computes it"""
+    return {(collection, item_id): json_etag(encode_json(item))
+            for collection, _ in COLLECTIONS for item_id, item in document.get(collection, {}).items()}
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def bid_auction(text: str) -> Tuple[str, Optional[str]]:
+    """Bid text -> (normalized auction, vulnerability); alternatives joined by "/" """
+    alternatives, vulnerability = parse_bid(text)
+    return '/'.join('-'.join(calls) for calls in alternatives), vulnerability
+
+
+class Row:
+    __slots__ = ('bid', 'description', 'player', 'path', 'value')
+
+    def __init__(self, bid, description, player, path, value):
+        self.bid = bid
+        self.description = description
+        self.player = player
+        self.path = path
+        self.value = value
+
+    def same(self, other: 'Row') -> bool:
+        """Equal apart from children, which are rows of their own"""
+        old, new = self.value, other.value
+        if 'children' in old or 'children' in new:
+            return changed_fields(old, new, ('children',)) == []
+        return old == new
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'bid': self.bid, 'description': self.description, 'player': self.player, 'path': self.path}
+
+
+def item_rows(item: Dict[str, Any], pointer: str) -> Dict[RowKey, Row]:
+    """The bid rows of a section or sequence by key"""
+    rows: Dict[RowKey, Row] = {}
+    for auction, vulnerability, row in walk_rows(item, pointer):
+        occurrence = 0
+        while (auction, vulnerability, occurrence) in rows:
+            occurrence += 1
+        rows[(auction, vulnerability, occurrence)] = row
+    return rows
+
+
+def walk_rows(item: Dict[str, Any], pointer: str) -> Iterator[Tuple[str, Optional[str], Row]]:
+    content = item.get('content') or {}
+    for i, table in enumerate(content.get('sections') or []):
+        data = table.get('data')
+        if table.get('type') == 'auction_table' and isinstance(data, dict):
+            yield from auction_rows(data.get('rows') or [], f'{pointer}/content/sections/{i}/data/rows')
+        elif isinstance(data, list):
+            yield from table_rows(data, f'{pointer}/content/sections/{i}/data')
+    for key, group in (content.get('subsections') or {}).items():
+        yield from table_rows(group.get('responses') or [], f'{pointer}/content/subsections{format_pointer([key])}/responses')
+    for key, group in (item.get('categories') or {}).items():
+        yield from table_rows(group.get('bids') or [], f'{pointer}/categories{format_pointer([key])}/bids')
+
+
+def table_rows(rows: List[Any], pointer: str) -> Iterator[Tuple[str, Optional[str], Row]]:
+    stack = [(rows, pointer)]
+    while stack:
+        rows, pointer = stack.pop()
+        for j, row in enumerate(rows):
+            if not isinstance(row, dict):
+                continue
+            if row.get('bid'):
+                auction, vulnerability = bid_auction(row['bid'])
+                vulnerability = vulnerability or normalize_vulnerability(row.get('vulnerability'))
+                player = row.get('cellType') or row.get('type')
+                yield auction, vulnerability, Row(row['bid'], row.get('description'), player, f'{pointer}/{j}', row)
+            if row.get('children'):
+                stack.append((row['children'], f'{pointer}/{j}/children'))
+
+
+def auction_rows(rows: List[Any], pointer: str) -> Iterator[Tuple[str, Optional[str], Row]]:
+    """Auction table rows: each call continues the calls in the columns to its left on earlier rows"""
+    columns: List[str] = []
+    for j, row in enumerate(rows):
+        cells = row.get('bids') or [] if isinstance(row, dict) else []
+        description = next((cell.get('text') for cell in cells if cell.get('type') == 'description'), None)
+        last = vulnerability = None
+        for column, cell in enumerate(cells):
+            if cell.get('type') not in ('opener', 'responder') or not cell.get('text'):
+                continue
+            del columns[column:]
+            columns.extend([''] * (column - len(columns)))
+            calls, vulnerability = bid_auction(cell['text'])
+            columns.append(calls)
+            last = cell
+        if last is not None:
+            auction = '-'.join(call for call in columns if call)
+            yield auction, vulnerability, Row(last['text'], description, last['type'], f'{pointer}/{j}', row)
+
+
+def changed_fields(old: Dict[str, Any], new: Dict[str, Any], skip=()) -> List[str]:
+    return [key for key in dict.fromkeys([*old, *new])
+            if key not in skip and old.get(key) != new.get(key)]
+
+
+def own_fields(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything in an item but its bid rows, by path: "title", "content/sections/0/title" ..."""
+    fields = {key: value for key, value in item.items() if key not in ROW_CONTAINERS}
+    content = item.get('content')
+    if isinstance(content, dict):
+        for key, value in content.items():
+            if key == 'sections' and isinstance(value, list):
+                for i, table in enumerate(value):
+                    table_fields(fields, ['content', 'sections', str(i)], table)
+            elif key in GROUP_ROWS and isinstance(value, dict):
+                group_fields(fields, ['content', key], value, GROUP_ROWS[key])
+            else:
+                fields[format_pointer(['content', key])[1:]] = value
+    elif 'content' in item:
+        fields['content'] = content
+    categories = item.get('categories')
+    if isinstance(categories, dict):
+        group_fields(fields, ['categories'], categories, GROUP_ROWS['categories'])
+    elif 'categories' in item:
+        fields['categories'] = categories
+    return fields
+
+
+def table_fields(fields: Dict[str, Any], path: List[str], table: Any):
+    """A table's title, type, auction table header ... without its rows"""
+    if not isinstance(table, dict):
+        fields[format_pointer(path)[1:]] = table
+        return
+    for key, value in table.items():
+        if key != TABLE_ROWS:
+            fields[format_pointer(path + [key])[1:]] = value
+    data = table.get(TABLE_ROWS)
+    if isinstance(data, dict):
+        fields.update((format_pointer(path + [TABLE_ROWS, key])[1:], value)
+                      for key, value in data.items() if key != 'rows')
+    elif data is not None and not isinstance(data, list):
+        fields[format_pointer(path + [TABLE_ROWS])[1:]] = data
+
+
+def group_fields(fields: Dict[str, Any], path: List[str], groups: Dict[str, Any], rows_key: str):
+    for key, group in groups.items():
+        if not isinstance(group, dict):
+            fields[format_pointer(path + [key])[1:]] = group
+            continue
+        fields.update((format_pointer(path + [key, field])[1:], value)
+                      for field, value in group.items() if field != rows_key)
+
+
+def diff_rows(old_rows: Dict[RowKey, Row], new_rows: Dict[RowKey, Row]) -> List[Dict[str, Any]]:
+    bids = []
+    for key, new in new_rows.items():
+        old = old_rows.get(key)
+        if old is None:
+            bids.append({'status': 'added', 'auction': key[0], 'vulnerability': key[1], **new.to_dict()})
+        elif not old.same(new):
+            fields = changed_fields(old.value, new.value, ('children',))
+            if 'bids' in fields and 'bid' not in new.value:
+                # An auction table row: name what changed in its cells
+                fields.remove('bids')
+                fields += [name for name, differs in (('bid', old.bid != new.bid),
+                                                      ('description', old.description != new.description))
+                           if differs] or ['cells']
+            bids.append({'status': 'changed', 'auction': key[0], 'vulnerability': key[1], 'fields': fields,
+                         'old': old.to_dict(), 'new': new.to_dict()})
+    bids.extend({'status': 'removed', 'auction': key[0], 'vulnerability': key[1], **old.to_dict()}
+                for key, old in old_rows.items() if key not in new_rows)
+    return bids
+
+
+def diff_item(collection: str, item_id: str, old: Optional[Dict[str, Any]],
+              new: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    pointer = format_pointer([collection, item_id])
+    status = 'added' if old is None else 'removed' if new is None else 'changed'
+    current = new if new is not None else old
+    entry = {'collection': collection, 'id': item_id, 'status': status, 'title': current.get('title')}
+    if collection == 'definitions':
+        if status == 'changed':
+            entry['fields'] = [{'field': key, 'old': old.get(key), 'new': new.get(key)}
+                               for key in changed_fields(old, new)]
+        return entry
+    old_rows = item_rows(old, pointer) if old is not None else {}
+    new_rows = item_rows(new, pointer) if new is not None else {}
+    entry['bids'] = diff_rows(old_rows, new_rows)
+    if status == 'changed':
+        old_fields, new_fields = own_fields(old), own_fields(new)
+        entry['fields'] = [{'field': key, 'old': old_fields.get(key), 'new': new_fields.get(key)}
+                           for key in changed_fields(old_fields, new_fields)]
+        if not entry['fields'] and not entry['bids']:
+            # Same fields and bids: what's left is the order of the rows
+            if list(old_rows) != list(new_rows):
+                entry['fields'].append({'field': 'row order', 'old': [row.bid for row in old_rows.values()],
+                                        'new': [row.bid for row in new_rows.values()]})
+            else:
+                entry['fields'] = [{'field': key, 'old': old.get(key), 'new': new.get(key)}
+                                   for key in changed_fields(old, new, own_fields(old))]
+    return entry
+
+
+def diff_documents(old: Dict[str, Any], new: Dict[str, Any],
+                   old_hashes: Optional[Dict[Tuple[str, str], str]] = None,
+                   new_hashes: Optional[Dict[Tuple[str, str], str]] = None) -> Dict[str, Any]:
+    """What changed from old to new: items, their bids and fields, and top-level values
+
+    old_hashes/new_hashes are item_hashes() of the documents when already known
+    (the shards index has them for the current revision).
+    """
+    old_hashes = old_hashes if old_hashes is not None else item_hashes(old)
+    new_hashes = new_hashes if new_hashes is not None else item_hashes(new)
+    items = []
+    for collection, _ in COLLECTIONS:
+        old_items, new_items = old.get(collection) or {}, new.get(collection) or {}
+        for item_id, item in new_items.items():
+            if old_hashes.get((collection, item_id)) != new_hashes[(collection, item_id)]:
+                items.append(diff_item(collection, item_id, old_items.get(item_id), item))
+        items.extend(diff_item(collection, item_id, item, None)
+                     for item_id, item in old_items.items() if item_id not in new_items)
+    collections = {collection for collection, _ in COLLECTIONS}
+    top_level = [key for key in changed_fields(old, new) if key not in collections]
+    return {'summary': summarize(items, top_level), 'items': items, 'top_level': top_level}
+
+
+def summarize(items: List[Dict[str, Any]], top_level: List[str]) -> Dict[str, Any]:
+    summary = {collection: dict.fromkeys(STATUSES, 0) for collection, _ in COLLECTIONS}
+    summary['bids'] = dict.fromkeys(STATUSES, 0)
+    summary['descriptions'] = 0
+    for item in items:
+        summary[item['collection']][item['status']] += 1
+        for bid in item.get('bids', ()):
+            summary['bids'][bid['status']] += 1
+            if bid['status'] == 'changed' and 'description' in bid['fields']:
+                summary['descriptions'] += 1
+    summary['top_level'] = len(top_level)
+    return summary
+
+
+def summary_line(report: Dict[str, Any]) -> str:
+    summary = report['summary']
+    parts = []
+    for collection, _ in COLLECTIONS:
+        counts = ', '.join(f'{count} {status}' for status, count in summary[collection].items() if count)
+        if counts:
+            parts.append(f'{collection}: {counts}')
+    bids = summary['bids']
+    parts.append(f"bids: {bids['added']} added, {bids['removed']} removed, {bids['changed']} changed "
+                 f"({summary['descriptions']} descriptions)")
+    if report['top_level']:
+        parts.append(f"also changed: {', '.join(report['top_level'])}")
+    return '; '.join(parts)
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ''
+    return html.escape(value if isinstance(value, str) else json.dumps(value, ensure_ascii=False), quote=False)
+
+
+def _bid_row(bid: Dict[str, Any]) -> str:
+    status = bid['status']
+    row = bid['new'] if status == 'changed' else bid
+    cell_class = 'opener-cell' if row.get('player') in ('opener', 'opener-bid') else 'responder-cell'
+    vulnerability = f' <span class="diff-vul">{bid["vulnerability"]}</span>' if bid['vulnerability'] else ''
+    if status == 'changed':
+        old = bid['old']
+        description = _text(row['description'])
+        if old['description'] != row['description']:
+            description = f'<del>{_text(old["description"])}</del> <ins>{description}</ins>'
+        bid_text = notation(_text(row['bid']))
+        if old['bid'] != row['bid']:
+            bid_text = f'<del>{notation(_text(old["bid"]))}</del> <ins>{bid_text}</ins>'
+        other = [field for field in bid['fields'] if field not in ('bid', 'description')]
+        if other:
+            description += f' <span class="diff-fields">{_text(", ".join(other))}</span>'
+    else:
+        bid_text, description = notation(_text(row['bid'])), _text(row['description'])
+    return (f'<tr class="diff-{status}"><td class="diff-status">{status}</td>'
+            f'<td class="bid-cell {cell_class}">{bid_text}{vulnerability}</td>'
+            f'<td class="description-cell {cell_class}">{notation(description)}</td></tr>')
+
+
+def render_html(report: Dict[str, Any], title: str = 'System changes', stylesheet: Optional[str] = None) -> str:
+    """The report as a page in the app's bid colours
+
+    stylesheet is the URL of styles.css; without it the stylesheet is inlined so the page stands alone.
+    """
+    if stylesheet is not None:
+        style = f'<link rel="stylesheet" href="{html.escape(stylesheet)}">'
+    else:
+        style = f'<style>\n{STYLESHEET.read_text(encoding="utf-8")}\n</style>'
+    parts = ['<!DOCTYPE html>', '<html lang="en">', '<head>', '<meta charset="UTF-8">',
+             f'<title>{html.escape(title)}</title>', style, '</head>',
+             '<body class="diff-report">', f'<h2>{html.escape(title)}</h2>',
+             f'<p class="diff-summary">{html.escape(summary_line(report))}</p>']
+    if not report['items'] and not report['top_level']:
+        parts.append('<p>No changes.</p>')
+    for item in report['items']:
+        parts.append(f'<section class="diff-item diff-{item["status"]}">')
+        parts.append(f'<h3><span class="diff-status">{item["status"]}</span> {item["collection"][:-1]} '
+                     f'<code>{html.escape(item["id"])}</code>: {notation(_text(item["title"]))}</h3>')
+        if item.get('fields'):
+            parts.append('<table class="bridge-table diff-fields-table">')
+            for field in item['fields']:
+                parts.append(f'<tr class="diff-changed"><td class="diff-status">{html.escape(field["field"])}</td>'
+                             f'<td class="description-cell"><del>{notation(_text(field["old"]))}</del></td>'
+                             f'<td class="description-cell"><ins>{notation(_text(field["new"]))}</ins></td></tr>')
+            parts.append('</table>')
+        if item.get('bids'):
+            parts.append('<table class="bridge-table diff-bids">')
+            parts.extend(_bid_row(bid) for bid in item['bids'])
+            parts.append('</table>')
+        parts.append('</section>')
+    if report['top_level']:
+        parts.append(f'<p class="diff-summary">Also changed: {html.escape(", ".join(report["top_level"]))}</p>')
+    parts.extend(['</body>', '</html>'])
+    return '\n'.join(parts)
+
+
+def load_document(path) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Compare two bridge system documents by ids and auctions')
+    parser.add_argument('old', help='The earlier document (e.g. an exported system)')
+    parser.add_argument('new', help='The later document')
+    parser.add_argument('--html', metavar='PATH', help='Write the report as a page in the app\'s bid colours')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    old_document, new_document = load_document(args.old), load_document(args.new)
+    started = time.perf_counter()
+    report = diff_documents(old_document, new_document)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"{summary_line(report)} ({elapsed_ms:.1f}ms)")
+        for item in report['items']:
+            print(f"  {item['status']:8} {item['collection'][:-1]} {item['id']}")
+            for field in item.get('fields', ()):
+                print(f"             {field['field']} changed")
+            for bid in item.get('bids', ()):
+                row = bid['new'] if bid['status'] == 'changed' else bid
+                detail = f" ({', '.join(bid['fields'])})" if bid['status'] == 'changed' else ''
+                vulnerability = f" [{bid['vulnerability']}]" if bid['vulnerability'] else ''
+                print(f"             {bid['status']:8} {row['bid']}{vulnerability}{detail}")
+    if args.html:
+        Path(args.html).write_text(render_html(report, f'{args.old} → {args.new}'), encoding='utf-8')
+        print(f"Report written to {args.html}")
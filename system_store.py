@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Loaded bridge system document with derived indexes
+
+Holds one parsed data.json in memory, reloads it when the file changes on disk
+and rebuilds the indexes derived from it (search, auction lookups, ...) lazily.
+Edits arrive as JSON Patches, are applied in memory and written back atomically,
+with bursts of edits coalesced into one write.
+
+Every accepted edit bumps the document's revision and is appended to a JSONL
+journal next to data.json before it is acknowledged. Each write of data.json is
+a snapshot recorded in the journal, and the first edit of a journal is preceded
+by one for the file as loaded; on startup only the edits after the last
+snapshot are replayed. The journal keeps each edit's inverse patch, which gives
+history and undo.
+"""
+
+import errno
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from json_patch import JsonPatchError, apply_patch
+
+# Edits arriving within this many seconds of each other share one write
+WRITE_DELAY = 0.2
+
+# Edits kept in the journal (and available to undo) when it is compacted
+HISTORY_LENGTH = 200
+
+# Journal lines that trigger compaction at the next snapshot
+COMPACT_AFTER = 1000
+
+# Scalar lists up to this many characters stay on one line, as in the hand-edited data.json
+INLINE_LIST_WIDTH = 80
+
+# Data files of hosted systems kept loaded at once, in bytes on disk
+DEFAULT_SYSTEMS_BYTES = 16 * 1024 * 1024
+
+# A hosted system's name is its file name without .json
+SYSTEM_NAME_RE = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]*')
+
+# name -> builder(document) for indexes derived from a system document
+INDEX_BUILDERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+
+def register_index(name: str, builder: Callable[[Dict[str, Any]], Any]):
+    """Register an index that SystemStore builds on demand from the current document"""
+    INDEX_BUILDERS[name] = builder
+
+
+class RevisionConflict(Exception):
+    """An edit was based on a revision other than the current one"""
+
+    def __init__(self, base: int, revision: int):
+        super().__init__(f'Edit is based on revision {base} but the document is at revision {revision}')
+        self.base = base
+        self.revision = revision
+
+
+def journal_path(path: str) -> str:
+    """data.json -> data.journal.jsonl"""
+    return os.path.splitext(path)[0] + '.journal.jsonl'
+
+
+def read_journal(path: str) -> Tuple[List[Dict[str, Any]], int]:
+    """Journal records in order and the byte length they span
+
+    A torn last line from an interrupted append ends the journal; everything
+    from it on is not counted in the length.
+    """
+    records, length = [], 0
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                length += len(line)
+    except FileNotFoundError:
+        pass
+    return records, length
+
+
+def _is_scalar(value) -> bool:
+    return not isinstance(value, (dict, list))
+
+
+def format_document(value: Any, level: int = 0) -> str:
+    """Serialize a document in the layout of the hand-edited data.json
+
+    Two-space indentation; link and auction-cell objects ({"text": ...}) and short
+    lists of scalars on one line, so rewriting the file after an edit only changes
+    the lines that were edited.
+    """
+    indent, closing = '  ' * (level + 1), '  ' * level
+    if isinstance(value, dict):
+        if not value:
+            return '{}'
+        if 'text' in value and all(_is_scalar(child) for child in value.values()):
+            return json.dumps(value, ensure_ascii=False)
+        items = (f'{indent}{json.dumps(key, ensure_ascii=False)}: {format_document(child, level + 1)}'
+                 for key, child in value.items())
+        return '{\n' + ',\n'.join(items) + f'\n{closing}}}'
+    if isinstance(value, list):
+        if not value:
+            return '[]'
+        if all(_is_scalar(child) for child in value):
+            inline = json.dumps(value, ensure_ascii=False)
+            if len(inline) <= INLINE_LIST_WIDTH:
+                return inline
+        items = (f'{indent}{format_document(child, level + 1)}' for child in value)
+        return '[\n' + ',\n'.join(items) + f'\n{closing}]'
+    return json.dumps(value, ensure_ascii=False)
+
+
+def write_atomic(path: str, text: str):
+    """Replace a file so readers see either the old or the new content, never a partial write"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class SystemStore:
+    def __init__(self, path, write_delay=WRITE_DELAY):
+        self.path = os.fspath(path)
+        self.journal_path = journal_path(self.path)
+        self.write_delay = write_delay
+        self._lock = threading.Lock()
+        self._document = None
+        self._stamp = None  # (st_mtime_ns, st_size) of the loaded file
+        self._indexes = {}
+        self._dirty = False  # in-memory edits not yet written
+        self._write_timer = None
+        self._revision = 0
+        self._history = deque(maxlen=HISTORY_LENGTH)  # recent edit records, oldest first
+        self._journal_lines = 0
+
+    def document(self) -> Dict[str, Any]:
+        """Return the parsed document, reloading it if the file changed since the last call"""
+        with self._lock:
+            return self._refresh()
+
+    def index(self, name: str):
+        """Return the named index for the current document, building it on first use"""
+        with self._lock:
+            return self._index(name)
+
+    def revision_index(self, name: str) -> Tuple[int, Any]:
+        """The current revision and the named index built from it, taken together"""
+        with self._lock:
+            index = self._index(name)
+            return self._revision, index
+
+    def revision(self) -> int:
+        """Current revision of the document"""
+        with self._lock:
+            self._refresh()
+            return self._revision
+
+    def apply_patch(self, patch: List[Dict[str, Any]], base: Optional[int] = None) -> int:
+        """Apply a JSON Patch on top of revision base (if given); return the new revision
+
+        Raises RevisionConflict if base is stale and JsonPatchError if the patch
+        does not apply; in both cases nothing changes.
+        """
+        with self._lock:
+            self._refresh()
+            if base is not None and base != self._revision:
+                raise RevisionConflict(base, self._revision)
+            return self._commit(patch, {})
+
+    def undo(self, revision: Optional[int] = None, base: Optional[int] = None) -> int:
+        """Revert one edit (the latest by default) as a new revision; return that revision"""
+        with self._lock:
+            self._refresh()
+            if base is not None and base != self._revision:
+                raise RevisionConflict(base, self._revision)
+            edits = [record for record in self._history if 'patch' in record]
+            if revision is not None:
+                edits = [record for record in edits if record['revision'] == revision]
+            if not edits:
+                raise KeyError(revision)
+            record = edits[-1]
+            return self._commit(record['inverse'], {'undo': record['revision']})
+
+    def document_at(self, revision: Optional[int] = None) -> Tuple[int, Dict[str, Any]]:
+        """(revision, copy of the document at that revision), the current one by default
+
+        Earlier revisions are rebuilt by undoing the edits made since, so they reach
+        back as far as the history does; KeyError for a revision before that (or
+        before the file was last replaced outside the server).
+        """
+        with self._lock:
+            self._refresh()
+            current = self._revision
+            target = current if revision is None else revision
+            edits = [record for record in self._history if record['revision'] > target]
+            if target > current or [record['revision'] for record in edits] != list(range(target + 1, current + 1)):
+                raise KeyError(revision)
+            document = json.loads(json.dumps(self._document))
+        for record in reversed(edits):
+            apply_patch(document, record['inverse'])
+        return target, document
+
+    def history(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recent edits, newest first, without their patch bodies"""
+        with self._lock:
+            self._refresh()
+            records = list(self._history)[::-1][:limit]
+        summary = []
+        for record in records:
+            entry = {key: value for key, value in record.items() if key not in ('patch', 'inverse')}
+            if 'patch' in record:
+                entry['paths'] = [operation.get('path') for operation in record['patch']]
+            summary.append(entry)
+        return summary
+
+    def flush(self):
+        """Write pending edits to disk now"""
+        with self._lock:
+            self._write_pending()
+
+    def unload(self):
+        """Write pending edits and drop the document and its indexes; the next call loads them again"""
+        with self._lock:
+            self._write_pending()
+            self._document = None
+            self._stamp = None
+            self._indexes = {}
+            self._history.clear()
+            self._journal_lines = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._document is not None
+
+    def _write_pending(self):
+        if self._write_timer is not None:
+            self._write_timer.cancel()
+            self._write_timer = None
+        if not self._dirty:
+            return
+        write_atomic(self.path, format_document(self._document))
+        fs = os.stat(self.path)
+        self._stamp = (fs.st_mtime_ns, fs.st_size)
+        self._dirty = False
+        self._snapshot()
+
+    def _index(self, name: str):
+        document = self._refresh()
+        index = self._indexes.get(name)
+        if index is None:
+            # Built under the lock so concurrent first requests share one build
+            index = INDEX_BUILDERS[name](document)
+            self._indexes[name] = index
+        return index
+
+    def _commit(self, patch, fields) -> int:
+        if not self._journal_lines:
+            # Baseline: data.json as loaded is the revision the first edits replay onto
+            self._append_journal({'revision': self._revision, 'snapshot': list(self._stamp)})
+        inverse = apply_patch(self._document, patch)
+        self._revision += 1
+        record = {'revision': self._revision, 'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                  **fields, 'patch': patch, 'inverse': inverse}
+        try:
+            self._append_journal(record)
+        except OSError:
+            # Not durable, so not accepted
+            apply_patch(self._document, inverse)
+            self._revision -= 1
+            raise
+        self._history.append(record)
+        self._indexes = {}
+        self._mark_dirty()
+        return self._revision
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if self._write_timer is None:
+            self._write_timer = threading.Timer(self.write_delay, self.flush)
+            self._write_timer.daemon = True
+            self._write_timer.start()
+
+    def _append_journal(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_lines += 1
+
+    def _snapshot(self):
+        """Record that data.json on disk now holds the current revision, compacting the journal when long"""
+        marker = {'revision': self._revision, 'snapshot': list(self._stamp)}
+        if self._journal_lines + 1 < COMPACT_AFTER:
+            self._append_journal(marker)
+            return
+        # Older edits are in the snapshot; keep only the recent ones for history and undo
+        records = list(self._history) + [marker]
+        write_atomic(self.journal_path, ''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in records))
+        self._journal_lines = len(records)
+
+    def _load(self, stamp):
+        """First load: data.json is the last snapshot; replay the journal edits made after it"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self._document = json.load(f)
+        self._stamp = stamp
+        records, length = read_journal(self.journal_path)
+        if records and os.path.getsize(self.journal_path) > length:
+            # Drop the torn tail so new records start on a line of their own
+            os.truncate(self.journal_path, length)
+        self._journal_lines = len(records)
+        if not records:
+            return
+        snapshots = [i for i, record in enumerate(records) if 'snapshot' in record]
+        last = snapshots[-1] if snapshots else -1
+        self._history.extend(record for record in records if 'patch' in record)
+        if last < 0:
+            # Edits journalled before data.json was first written: it still holds the revision before them
+            base = records[0]['revision'] - 1
+        elif tuple(records[last]['snapshot']) == stamp:
+            base = records[last]['revision']
+        else:
+            base = None
+        if base is not None:
+            try:
+                self._revision = self._replay(base, records[last + 1:])
+            except JsonPatchError:
+                base = None
+        if base is None:
+            # data.json was replaced outside the server; it starts a new revision
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._document = json.load(f)
+            self._history.clear()
+            self._revision = records[-1]['revision'] + 1
+            self._append_journal({'revision': self._revision, 'snapshot': list(stamp), 'external': True})
+        elif self._revision != base:
+            self._mark_dirty()
+
+    def _replay(self, base: int, records: List[Dict[str, Any]]) -> int:
+        """Apply journalled edits after revision base to the loaded document; return the last revision"""
+        revision = base
+        for record in records:
+            if 'patch' in record:
+                apply_patch(self._document, record['patch'])
+                revision = record['revision']
+        return revision
+
+    def _refresh(self) -> Dict[str, Any]:
+        if self._dirty:
+            # Unwritten edits are newer than anything on disk
+            return self._document
+        fs = os.stat(self.path)
+        stamp = (fs.st_mtime_ns, fs.st_size)
+        if self._stamp is None:
+            self._load(stamp)
+        elif stamp != self._stamp:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._document = json.load(f)
+            self._stamp = stamp
+            self._revision += 1
+            # The inverses of earlier edits apply to the old document, not this one
+            self._history.clear()
+            if self._journal_lines:
+                self._append_journal({'revision': self._revision, 'snapshot': list(stamp), 'external': True})
+        else:
+            return self._document
+        self._indexes = {}
+        return self._document
+
+
+class SystemRegistry:
+    """Systems kept as <name>.json files in one directory (as batch_build writes them), loaded on demand
+
+    Each system gets a SystemStore of its own, so it reloads when its file
+    changes, and its first load and index builds happen under its own lock:
+    concurrent first requests for a system wait for one load while other
+    systems keep serving. Loaded systems are tracked least recently used first
+    and weighted by the size of their files; past max_bytes the least recently
+    used are unloaded (pending edits written first) and load again when next
+    asked for.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_SYSTEMS_BYTES, write_delay=WRITE_DELAY):
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self.write_delay = write_delay
+        self._lock = threading.Lock()
+        self._stores: Dict[str, SystemStore] = {}
+        self._loaded: 'OrderedDict[str, int]' = OrderedDict()  # name -> file size, least recently used first
+        self._loaded_bytes = 0
+
+    def path(self, name: str) -> str:
+        """The data file of a system; FileNotFoundError for names that can't be one"""
+        if not SYSTEM_NAME_RE.fullmatch(name) or name.endswith('.journal'):
+            raise FileNotFoundError(errno.ENOENT, 'No such system', name)
+        return os.path.join(self.directory, name + '.json')
+
+    def names(self) -> List[str]:
+        try:
+            files = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.json')] for name in files
+                      if name.endswith('.json') and SYSTEM_NAME_RE.fullmatch(name[:-len('.json')])
+                      and not name.endswith('.journal.json'))
+
+    def get(self, name: str) -> SystemStore:
+        """The store of a system, marked as just used; FileNotFoundError if there is no such system"""
+        path = self.path(name)
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            self._forget(name)
+            raise
+        with self._lock:
+            store = self._stores.get(name)
+            if store is None:
+                store = self._stores[name] = SystemStore(path, self.write_delay)
+            self._loaded_bytes += size - self._loaded.pop(name, 0)
+            self._loaded[name] = size
+            victims = []
+            while self._loaded_bytes > self.max_bytes and len(self._loaded) > 1:
+                victim, victim_size = self._loaded.popitem(last=False)
+                self._loaded_bytes -= victim_size
+                victims.append(self._stores[victim])
+        # Outside the registry lock: unloading waits only for requests in flight on that system
+        for victim in victims:
+            victim.unload()
+        return store
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = dict(self._loaded)
+            loaded_bytes = self._loaded_bytes
+        systems = []
+        for name in self.names():
+            store = self._stores.get(name)
+            systems.append({'name': name, 'url': f'systems/{name}/',
+                            'loaded': name in loaded and store is not None and store.loaded,
+                            'bytes': loaded.get(name)})
+        return {'systems': systems, 'loaded_bytes': loaded_bytes, 'max_bytes': self.max_bytes}
+
+    def flush(self):
+        """Write pending edits of every system"""
+        with self._lock:
+            stores = list(self._stores.values())
+        for store in stores:
+            store.flush()
+
+    def _forget(self, name: str):
+        """Drop a system whose file is gone"""
+        with self._lock:
+            self._loaded_bytes -= self._loaded.pop(name, 0)
+            store = self._stores.pop(name, None)
+        if store is not None:
+            store.unload()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Term linker for bridge system text
+
+An Aho-Corasick automaton built once from every definition title (green links)
+and every sequence auction (blue links) finds all occurrences of all terms in
+one pass over a text. Matches must stand as whole words; overlapping matches
+are resolved leftmost-longest, so each character is linked at most once.
+"""
+
+import html
+import json
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from auction_trie import parse_bid
+from bid_codec import auction_text, is_bid, pack
+
+# Suit symbols fold to the letters used in bids, keeping text offsets unchanged
+SUIT_LETTERS = str.maketrans({'♣': 'c', '♦': 'd', '♥': 'h', '♠': 's'})
+
+# Row fields whose text is linked, per schema: table rows, section responses, sequence bids
+LINKED_FIELDS = ('description',)
+
+
+def fold(text: str) -> str:
+    """Lowercase with suit symbols as letters, one character per character"""
+    folded = text.translate(SUIT_LETTERS).lower()
+    if len(folded) != len(text):
+        folded = ''.join(c.lower() if len(c.lower()) == 1 else c for c in text.translate(SUIT_LETTERS))
+    return folded
+
+
+def compact_auction(calls: List[str]) -> Optional[str]:
+    """["1c", "1d", "2n (non vul)"] -> "1c1d2n"; None if a call isn't a plain level + strain"""
+    key = b''
+    for call in calls:
+        packed = pack(parse_bid(call)[0][0])
+        if not packed or not all(is_bid(code) for code in packed):
+            return None
+        key += packed
+    return fold(auction_text(key, ''))
+
+
+class TermLinker:
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]  # state -> indexes of terms ending here
+        self.terms: List[Tuple[str, str, str]] = []  # (term, link type, target)
+        self.lengths: List[int] = []
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> 'TermLinker':
+        """Terms for definition titles and ids (green) and unambiguous sequence auctions (blue)"""
+        linker = cls()
+        for definition_id, definition in document.get('definitions', {}).items():
+            names = {definition.get('title', ''), definition_id.replace('-', ' ')}
+            for name in sorted(name for name in names if name):
+                linker.add(name, 'green', definition_id)
+
+        auctions: Dict[str, List[str]] = {}
+        for sequence_id, sequence in document.get('sequences', {}).items():
+            auction = compact_auction(sequence.get('auction', []))
+            if auction and len(sequence.get('auction', [])) > 1:
+                auctions.setdefault(auction, []).append(sequence_id)
+        for auction, sequence_ids in auctions.items():
+            if len(sequence_ids) == 1:  # 1c1d2n is both the -nv and the -vul page: no single target
+                linker.add(auction, 'blue', sequence_ids[0])
+        linker.build()
+        return linker
+
+    def add(self, term: str, link_type: str, target: str):
+        folded = fold(term)
+        state = 0
+        for char in folded:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        if not any(self.terms[i][2] == target for i in self.output[state]):
+            self.output[state].append(len(self.terms))
+            self.terms.append((term, link_type, target))
+            self.lengths.append(len(folded))
+
+    def build(self):
+        """Compute failure links breadth-first; call once after adding all terms"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                if state:  # children of the root fail back to the root
+                    fallback = self.fail[state]
+                    while fallback and char not in self.goto[fallback]:
+                        fallback = self.fail[fallback]
+                    self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Every whole-word occurrence of every term as (start, end, term index), in one pass"""
+        folded = fold(text)
+        state = 0
+        for end, char in enumerate(folded, 1):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for term_index in self.output[state]:
+                start = end - self.lengths[term_index]
+                if (start == 0 or not folded[start - 1].isalnum()) and (end == len(folded) or not folded[end].isalnum()):
+                    yield start, end, term_index
+
+    def spans(self, text: str, exclude: Optional[str] = None,
+              taken: List[Tuple[int, int]] = ()) -> List[Tuple[int, int, str, str]]:
+        """Non-overlapping (start, end, link type, target) spans, leftmost-longest first
+
+        Matches pointing at exclude (the item the text belongs to) or overlapping
+        a taken span are skipped.
+        """
+        candidates = sorted(self.matches(text), key=lambda match: (match[0], match[0] - match[1]))
+        spans = []
+        position = 0
+        for start, end, term_index in candidates:
+            _, link_type, target = self.terms[term_index]
+            if start < position or target == exclude:
+                continue
+            if any(start < taken_end and taken_start < end for taken_start, taken_end in taken):
+                continue
+            spans.append((start, end, link_type, target))
+            position = end
+        return spans
+
+    def links(self, text: str, exclude: Optional[str] = None,
+              existing: List[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+        """Links for text in the data.json form ({text, type, target}), keeping existing ones first"""
+        taken = [(start, end) for start, end, _, _ in existing_spans(text, existing)]
+        found = [{'text': text[start:end], 'type': link_type, 'target': target}
+                 for start, end, link_type, target in self.spans(text, exclude, taken)]
+        return list(existing) + found
+
+    def markup(self, text: str, exclude: Optional[str] = None, existing: List[Dict[str, Any]] = ()) -> str:
+        """HTML for text with every link wrapped in its <span class="{type}-text">"""
+        spans = existing_spans(text, existing)
+        spans += self.spans(text, exclude, [(start, end) for start, end, _, _ in spans])
+        parts = []
+        position = 0
+        for start, end, link_type, _ in sorted(spans):
+            parts.append(html.escape(text[position:start], quote=False))
+            parts.append(f'<span class="{link_type}-text">{html.escape(text[start:end], quote=False)}</span>')
+            position = end
+        parts.append(html.escape(text[position:], quote=False))
+        return ''.join(parts)
+
+
+def existing_spans(text: str, links: List[Dict[str, Any]]) -> List[Tuple[int, int, str, str]]:
+    """Spans of the given links' texts, first non-overlapping occurrence of each"""
+    spans = []
+    for link in links:
+        start = text.find(link['text']) if link.get('text') else -1
+        while start >= 0 and any(start < end and begin < start + len(link['text']) for begin, end, _, _ in spans):
+            start = text.find(link['text'], start + 1)
+        if start >= 0:
+            spans.append((start, start + len(link['text']), link.get('type', 'green'), link.get('target')))
+    return spans
+
+
+def iter_rows(document: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(owning item id, row) for every row with linkable text, in either document schema"""
+    for collection in ('sections', 'sequences'):
+        for item_id, item in document.get(collection, {}).items():
+            content = item.get('content', {})
+            for section in content.get('sections', []):
+                if isinstance(section.get('data'), list):
+                    for row in section['data']:
+                        yield item_id, row
+            for subsection in content.get('subsections', {}).values():
+                for row in subsection.get('responses', []):
+                    yield item_id, row
+            for category in item.get('categories', {}).values():
+                for row in category.get('bids', []):
+                    yield item_id, row
+
+
+def link_document(document: Dict[str, Any], linker: Optional[TermLinker] = None) -> int:
+    """Add links for every term found in row descriptions, keeping existing links; return how many were added"""
+    linker = linker or TermLinker.from_document(document)
+    added = 0
+    for item_id, row in iter_rows(document):
+        text = ' '.join(row[field] for field in LINKED_FIELDS if isinstance(row.get(field), str))
+        if not text:
+            continue
+        existing = row.get('links', [])
+        links = linker.links(text, exclude=item_id, existing=existing)
+        if len(links) > len(existing):
+            added += len(links) - len(existing)
+            row['links'] = links
+    return added
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from build_cache import write_if_changed
+    from system_store import format_document
+
+    parser = argparse.ArgumentParser(description='Add definition and sequence links to a data.json document')
+    parser.add_argument('document', nargs='?', default='data.json', help='Document to link (default: data.json)')
+    parser.add_argument('--write', action='store_true', help='Save the added links (default: only report them)')
+    args = parser.parse_args()
+
+    with open(args.document, 'r', encoding='utf-8') as f:
+        text = f.read()
+    document = json.loads(text)
+    added = link_document(document)
+    print(f"{added} link(s) to add in {args.document}")
+    if args.write and added:
+        write_if_changed(args.document, format_document(document).encode('utf-8'))
+        print(f"Saved {args.document}")
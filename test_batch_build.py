@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for building a directory of system documents (batch_build.py)
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from batch_build import build, find_documents
+
+OPENING = """\
+1 Club Opening {#1m-opening}: longer clubs or 44 in c and d
+
+Non support showing responses
+1c1d: Walsh; 5+, 7+d any/ 4+d, no 4M; Opener Rebids
+1c2n: 10/11, no 4M generally denies 4d for 1d2n, nf
+"""
+
+REBIDS = """\
+Rebids by opener
+1. Opener rebids over 1c1d
+
+Rebids to show bal hands
+1c1d1n: 12-14; can have 4M if < 5c
+1c1d2n (non vul): 18/19 bal
+1c1d2n (vul): long c, 18+, no sing, gf
+"""
+
+
+def make_sources(directory, files):
+    for name, text in files.items():
+        path = Path(directory, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+
+
+def read_outputs(directory):
+    return {name: Path(directory, name).read_bytes() for name in sorted(os.listdir(directory))}
+
+
+def test_parallel_build_matches_serial():
+    directory = tempfile.mkdtemp()
+    try:
+        source = os.path.join(directory, 'source')
+        make_sources(source, {'club/1-opening.txt': OPENING, 'club/2-rebids.txt': REBIDS,
+                              'other/notes.txt': OPENING + REBIDS, 'single.txt': REBIDS})
+        serial, parallel = os.path.join(directory, 'serial'), os.path.join(directory, 'parallel')
+        assert build(source, serial, jobs=1)
+        assert build(source, parallel, jobs=2)
+        outputs = read_outputs(serial)
+        assert list(outputs) == ['club.json', 'other.json', 'single.json'], list(outputs)
+        assert outputs == read_outputs(parallel)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_name_clash_is_reported():
+    for files in ({'foo.txt': OPENING, 'foo/rebids.txt': REBIDS},
+                  {'foo.txt': OPENING, 'foo.docx': ''}):
+        directory = tempfile.mkdtemp()
+        try:
+            source, output = os.path.join(directory, 'source'), os.path.join(directory, 'output')
+            make_sources(source, files)
+            try:
+                find_documents(Path(source))
+            except ValueError as e:
+                assert "'foo'" in str(e), e
+            else:
+                raise AssertionError(f'{sorted(files)} merged into one system')
+            assert not build(source, output, jobs=1)
+            assert not os.path.exists(output)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✓ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"✗ {name}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests that simulated bid frequencies are plausible for the system in data.json (deal_simulator.py)
+
+The shares are what --write stores beside each bid, so a classifier row that
+compiles to the wrong hands shows up here as a share far outside its range.
+"""
+import copy
+import json
+import os
+import sys
+
+from bid_codec import auction_key
+from deal_simulator import annotate, shares, simulate
+
+DOCUMENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.json')
+DEALS = 20_000
+
+# Percentage of deals reaching the previous calls that continue with these, (low, high)
+PLAUSIBLE = [
+    (['1c'], (25, 45)),  # 12+ HCP opens 1c: the system has no other opening
+    (['1c-1h', '1c-1s'], (30, 70)),  # a four-card major is the most common response
+    (['1c-1d'], (3, 30)),  # Walsh: diamonds without a major
+    (['1c-2h'], (0.3, 4)),  # Reverse Flannery: 5s4h/55/65 and 8-11 HCP
+    (['1c-2n'], (1, 10)),  # 10/11 without a major
+]
+
+_result = None
+
+
+def load():
+    with open(DOCUMENT_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def result():
+    global _result
+    if _result is None:
+        _result = simulate(load(), DEALS, seed=0, jobs=1)
+    return _result
+
+
+def test_shares_are_plausible():
+    for keys, (low, high) in PLAUSIBLE:
+        for vulnerability in ('nv', 'vul'):
+            share = shares(result(), [auction_key(key) for key in keys], vulnerability)
+            assert share is not None and low <= share <= high, f'{"/".join(keys)} ({vulnerability}): {share}%'
+
+
+def test_annotate_stores_the_shares():
+    document = load()
+    assert annotate(document, result()) > 0
+    rows = [row for group in document['sections']['1m-opening']['content']['sections']
+            for row in group.get('data', []) if row.get('bid') == '1c2h']
+    assert rows and all(0.3 <= row['frequency']['nv'] <= 4 for row in rows), rows
+    # Annotating again replaces the shares rather than adding to them
+    annotated = copy.deepcopy(document)
+    annotate(document, result())
+    assert document == annotated
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✓ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"✗ {name}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for compiling bid descriptions into hand constraints (hand_classifier.py)
+"""
+import sys
+
+from hand_classifier import ConstraintTable, parse_constraint
+
+# The 1c responses as the notes write them
+RESPONSES = [
+    ('1c-1d', 'Walsh; 5+, 7+d any/ 4+d, no 4M; OR 5d4M, 4-5/15+ or 6d4M, 4-8/15+'),
+    ('1c-1M', '5+, 4+M, up the line'),
+    ('1c-2h', 'Reverse Flannery: 5s4h/ 55/65, inv (Gd 8 – bad 11): (64 hands go via xyz)'),
+    ('1c-2n', '10/11, no 4M generally denies 4d for 1d2n, nf'),
+    ('1c-3n', '12-14, no 4M'),
+    ('1c-1n', '4+c, no 4 card M'),
+    ('1c-2s', '5sp, 4+m, inv'),
+    ('1c-2c', 'Inverted minor: 10+'),
+]
+DOCUMENT = {'sections': {'1m-opening': {'id': '1m-opening', 'title': '1 Club Opening', 'content': {
+    'subsections': {'responses': {'title': 'Responses', 'responses': [
+        {'bid': bid, 'description': description, 'reference': None, 'type': 'terminal'}
+        for bid, description in RESPONSES]}}}}}}
+
+
+def responses(table, hand):
+    return {match['bid'] for match in table.classify(hand)['responses']}
+
+
+def test_spade_abbreviation():
+    assert parse_constraint('5sp, 4+m, inv').to_dict() == {'lengths': {'s': [5, 5]}, 'minor': 4}
+    assert parse_constraint('4 card h, 5 sp, gf').to_dict() == {'lengths': {'s': [5, 5], 'h': [4, 4]}}
+
+
+def test_compact_shapes():
+    assert parse_constraint('5c5d, slammish').to_dict() == {'lengths': {'d': [5, 5], 'c': [5, 5]}}
+    flannery = parse_constraint(RESPONSES[2][1]).to_dict()
+    assert flannery == {'hcp': [8, 11], 'lengths': {'s': [5, 6], 'h': [4, 6]}}, flannery
+    # Without a "5s4h" to name the suits a bare pair says nothing; "64 hands" is not a shape clause
+    assert parse_constraint('55, slammish').to_dict() == {}
+    assert parse_constraint('5s4h; 64 hands go via xyz').to_dict() == {'lengths': {'s': [5, 5], 'h': [4, 4]}}
+
+
+def test_known_hands():
+    table = ConstraintTable.from_document(DOCUMENT)
+    # 4 spades and 5 diamonds: neither the spade-heart nor the spade-minor invitation
+    offered = responses(table, '♠A432 ♥2 ♦KJ987 ♣432')
+    assert '1c-2h' not in offered and '1c-2s' not in offered, offered
+    assert '1c-1d' in offered, offered
+    assert '1c-2h' in responses(table, '♠KQ862 ♥AJ93 ♦32 ♣42')
+    offered = responses(table, '♠KQ862 ♥32 ♦A2 ♣J942')
+    assert '1c-2s' in offered and '1c-2h' not in offered, offered
+    offered = responses(table, '♠K32 ♥Q32 ♦AJ2 ♣K432')
+    assert offered >= {'1c-3n', '1c-1n', '1c-2c'} and not offered & {'1c-1h', '1c-1s', '1c-2h', '1c-2s'}, offered
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✓ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"✗ {name}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for JSON Patch application and rollback (json_patch.py)
+"""
+import copy
+import sys
+
+from json_patch import JsonPatchError, apply_patch
+
+DOCUMENT = {'metadata': {'title': 'Uma + PS System'}, 'sections': {'a': {'bids': ['1c', '1d']}}}
+
+
+def expect_error(document, patch):
+    """The patch is rejected with JsonPatchError and the document is left as it was"""
+    before = copy.deepcopy(document)
+    try:
+        apply_patch(document, patch)
+    except JsonPatchError:
+        pass
+    else:
+        raise AssertionError(f'{patch!r} applied')
+    assert document == before, document
+
+
+def test_operations_and_inverse():
+    document = copy.deepcopy(DOCUMENT)
+    patch = [
+        {'op': 'add', 'path': '/metadata/author', 'value': 'PS'},
+        {'op': 'replace', 'path': '/metadata/title', 'value': 'New'},
+        {'op': 'add', 'path': '/sections/a/bids/-', 'value': '1h'},
+        {'op': 'remove', 'path': '/sections/a/bids/0'},
+        {'op': 'copy', 'from': '/sections/a', 'path': '/sections/b'},
+        {'op': 'move', 'from': '/metadata/author', 'path': '/sections/b/author'},
+        {'op': 'test', 'path': '/sections/b/bids', 'value': ['1d', '1h']},
+    ]
+    inverse = apply_patch(document, patch)
+    assert document == {'metadata': {'title': 'New'},
+                        'sections': {'a': {'bids': ['1d', '1h']}, 'b': {'bids': ['1d', '1h'], 'author': 'PS'}}}
+    apply_patch(document, inverse)
+    assert document == DOCUMENT
+
+
+def test_failing_operation_rolls_back():
+    document = copy.deepcopy(DOCUMENT)
+    expect_error(document, [{'op': 'add', 'path': '/metadata/zzz', 'value': 1},
+                            {'op': 'remove', 'path': '/metadata/missing'}])
+    expect_error(document, [{'op': 'add', 'path': '/metadata/zzz', 'value': 1},
+                            {'op': 'test', 'path': '/metadata/title', 'value': 'Other'}])
+    expect_error(document, [{'op': 'move', 'from': '/sections', 'path': '/sections/a/x'}])
+
+
+def test_malformed_operations_change_nothing():
+    document = copy.deepcopy(DOCUMENT)
+    for bad in ({'op': 'move', 'from': '/metadata/zzz', 'path': 5},
+                {'op': 'copy', 'from': 5, 'path': '/metadata/y'},
+                {'op': 'add', 'path': None, 'value': 1},
+                {'op': ['add'], 'path': '/metadata/y', 'value': 1},
+                {'op': 'add', 'path': '/metadata/y'},
+                {'op': 'frobnicate', 'path': '/metadata/y'},
+                'add'):
+        expect_error(document, [{'op': 'add', 'path': '/metadata/zzz', 'value': 1}, bad])
+    expect_error(document, {'op': 'add', 'path': '/metadata/zzz', 'value': 1})
+
+
+def test_values_are_not_shared():
+    document = copy.deepcopy(DOCUMENT)
+    value = {'a': 1}
+    patch = [{'op': 'add', 'path': '/metadata/x', 'value': value}]
+    apply_patch(document, patch)
+    document['metadata']['x']['a'] = 2
+    assert value == {'a': 1}
+    inverse = apply_patch(document, [{'op': 'remove', 'path': '/metadata/x'}])
+    apply_patch(document, inverse)
+    document['metadata']['x']['a'] = 3
+    assert inverse[0]['value'] == {'a': 2}
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✓ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"✗ {name}: {e}")
+    sys.exit(1 if failed else 0)
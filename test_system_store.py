@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for edits that must survive restarts and undo (system_store.py, json_patch.py)
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from json_patch import JsonPatchError
+from system_store import SystemStore, journal_path, read_journal
+
+DOCUMENT = {'metadata': {'title': 'Old title'}, 'sections': {}, 'sequences': {}, 'definitions': {}}
+
+
+def make_system(directory):
+    path = os.path.join(directory, 'data.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(DOCUMENT, f)
+    return path
+
+
+def test_crash_before_first_write_replays_journal():
+    """Edits acknowledged before the first write of data.json are replayed on restart"""
+    directory = tempfile.mkdtemp()
+    try:
+        path = make_system(directory)
+        store = SystemStore(path, write_delay=60)
+        revision = store.apply_patch([{'op': 'replace', 'path': '/metadata/title', 'value': 'New title'}])
+        # The process dies here: the write is still pending and data.json has the old title
+        store._write_timer.cancel()
+        restarted = SystemStore(path, write_delay=60)
+        assert restarted.revision() == revision
+        assert restarted.document()['metadata']['title'] == 'New title'
+        assert [entry['revision'] for entry in restarted.history()] == [revision]
+        restarted.flush()
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f)['metadata']['title'] == 'New title'
+        # And again after that write: nothing replayed twice
+        again = SystemStore(path, write_delay=60)
+        assert again.revision() == revision
+        assert again.document()['metadata']['title'] == 'New title'
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_crash_after_write_replays_later_edits():
+    directory = tempfile.mkdtemp()
+    try:
+        path = make_system(directory)
+        store = SystemStore(path, write_delay=60)
+        store.apply_patch([{'op': 'add', 'path': '/metadata/a', 'value': 1}])
+        store.flush()
+        revision = store.apply_patch([{'op': 'add', 'path': '/metadata/b', 'value': 2}])
+        store._write_timer.cancel()
+        restarted = SystemStore(path, write_delay=60)
+        assert restarted.revision() == revision
+        assert restarted.document()['metadata'] == {'title': 'Old title', 'a': 1, 'b': 2}
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_history_does_not_share_values_with_document():
+    """A later edit of a value doesn't change an earlier edit's patch or inverse"""
+    directory = tempfile.mkdtemp()
+    try:
+        path = make_system(directory)
+        store = SystemStore(path, write_delay=60)
+        added = store.apply_patch([{'op': 'add', 'path': '/metadata/x', 'value': {'a': 1}}])
+        store.apply_patch([{'op': 'remove', 'path': '/metadata/x'}])
+        store.undo()
+        store.apply_patch([{'op': 'replace', 'path': '/metadata/x/a', 'value': 99}])
+        assert store.document_at(added)[1]['metadata']['x'] == {'a': 1}
+        assert store.document()['metadata']['x'] == {'a': 99}
+        store.flush()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_rejected_patch_changes_nothing():
+    directory = tempfile.mkdtemp()
+    try:
+        path = make_system(directory)
+        store = SystemStore(path, write_delay=60)
+        try:
+            store.apply_patch([{'op': 'add', 'path': '/metadata/zzz', 'value': 1},
+                               {'op': 'move', 'from': '/metadata/zzz', 'path': 5}])
+        except JsonPatchError:
+            pass
+        else:
+            raise AssertionError('malformed patch applied')
+        assert store.revision() == 0
+        assert 'zzz' not in store.document()['metadata']
+        assert not [record for record in read_journal(journal_path(path))[0] if 'patch' in record]
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_outside_replace_clears_undo():
+    directory = tempfile.mkdtemp()
+    try:
+        path = make_system(directory)
+        store = SystemStore(path, write_delay=60)
+        store.apply_patch([{'op': 'add', 'path': '/metadata/x', 'value': 1}])
+        store.flush()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(DOCUMENT, metadata={'title': 'Replaced', 'padding': 'changes the size'}), f)
+        assert store.document()['metadata']['title'] == 'Replaced'
+        assert store.history() == []
+        try:
+            store.undo()
+        except KeyError:
+            pass
+        else:
+            raise AssertionError('undo applied an edit of the replaced document')
+        assert os.path.exists(journal_path(path))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✓ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"✗ {name}: {e}")
+    sys.exit(1 if failed else 0)